@@ -344,9 +344,13 @@ class VM(APIBase):
 
     @api.logged(on="api.virt")
     @api.method
-    def getStats(self):
+    def getStats(self, groups=None):
         """
         Obtain statistics of the specified VM
+
+        :param groups: optional list of stats groups to compute (cpu,
+                       network, disks, balloon, tuneio, memory). By default
+                       all groups are computed.
         """
         # for backward compatibility reasons, we need to
         # do the instance check before to run the hooks.
@@ -358,7 +362,7 @@ class VM(APIBase):
             return response.error('hookError',
                                   'Hook error: ' + str(e))
 
-        stats = vm.getStats().copy()
+        stats = vm.getStats(groups).copy()
         stats = hooks.after_get_vm_stats([stats])[0]
         return {'status': doneCode, 'statsList': [stats]}
 
@@ -727,6 +731,13 @@ class VM(APIBase):
             'ioTunePolicyList': self.vm.io_tune_policy()
         }
 
+    @api.logged(on="api.virt")
+    @api.method
+    def getStatsHistory(self, resolution=None):
+        return {
+            'statsHistory': self.vm.stats_history(resolution)
+        }
+
     @api.logged(on="api.virt")
     @api.method
     def setCpuTunePeriod(self, period):
@@ -1335,14 +1346,21 @@ class Global(APIBase):
         return response.success()
 
     @api.logged(on="api.host")
-    def getCapabilities(self):
+    def getCapabilities(self, since=None):
         """
-        Report host capabilities.
+        Report host capabilities, or only the capabilities modified after
+        generation since.
         """
         hooks.before_get_caps()
-        c = caps.get()
-        c['netConfigDirty'] = str(self._cif._netConfigDirty)
-        c = hooks.after_get_caps(c)
+        netConfigDirty = str(self._cif._netConfigDirty)
+
+        # Hooks get all the capabilities, even if only the capabilities
+        # modified since the given generation are reported.
+        def after_get_caps(c):
+            c['netConfigDirty'] = netConfigDirty
+            return hooks.after_get_caps(c)
+
+        c = caps.get(since, modify=after_get_caps)
 
         return {'status': doneCode, 'info': c}
 
@@ -1359,12 +1377,15 @@ class Global(APIBase):
             return errCode['hwInfoErr']
 
     @api.logged(on="api.host")
-    def getAllVmStats(self):
+    def getAllVmStats(self, groups=None):
         """
         Get statistics of all running VMs.
+
+        :param groups: optional list of stats groups to compute, see
+                       VM.getStats.
         """
         hooks.before_get_all_vm_stats()
-        statsList = self._cif.getAllVmStats()
+        statsList = self._cif.getAllVmStats(groups)
         statsList = hooks.after_get_all_vm_stats(statsList)
         throttledlog.info('getAllVmStats', "Current getAllVmStats: %s",
                           logutils.AllVmStatsValue(statsList))
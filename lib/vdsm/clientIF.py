@@ -558,8 +558,8 @@ class clientIF(object):
                 self.vmContainer[vm.id] = vm
             return ret
 
-    def getAllVmStats(self):
-        return [v.getStats() for v in self.vmContainer.values()]
+    def getAllVmStats(self, groups=None):
+        return [v.getStats(groups) for v in self.vmContainer.values()]
 
     def getAllVmIoTunePolicies(self):
         vm_io_tune_policies = {}
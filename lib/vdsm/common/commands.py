@@ -46,9 +46,12 @@ BUFFSIZE = 1024
 def execCmd(command, sudo=False, cwd=None, data=None, raw=False,
             printable=None, env=None, sync=True, nice=None, ioclass=None,
             ioclassdata=None, setsid=False, execCmdLogger=logging.root,
-            resetCpuAffinity=True):
+            resetCpuAffinity=True, timeout=None):
     """
     Executes an external command, optionally via sudo.
+
+    If timeout is specified and the command does not complete in timeout
+    seconds, the command is killed and subprocess.TimeoutExpired is raised.
     """
 
     command = cmdutils.wrap_command(command, with_ioclass=ioclass,
@@ -78,7 +81,7 @@ def execCmd(command, sudo=False, cwd=None, data=None, raw=False,
         return p
 
     with terminating(p):
-        (out, err) = p.communicate(data)
+        (out, err) = p.communicate(data, timeout=timeout)
 
     if out is None:
         # Prevent splitlines() from barfing later on
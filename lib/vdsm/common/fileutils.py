@@ -26,6 +26,12 @@ from contextlib import contextmanager
 import os
 import shutil
 import tempfile
+import time
+
+# Seconds since the last change of a file before its modification time can
+# be trusted. A change made within the file system timestamp granularity may
+# not modify the file mtime.
+MTIME_GRANULARITY = 1.0
 
 
 def touch_file(file_path):
@@ -97,3 +103,28 @@ def rm_tree(dir_to_remove):
             logging.warning("Directory: %s already removed", dir_to_remove)
         else:
             raise
+
+
+def stat_stamp(paths):
+    """
+    Return a tuple with the (inode, size, mtime) of every path, or None for
+    paths that do not exist. The stamp changes when a file is modified or
+    replaced.
+
+    Return None if a file was modified within MTIME_GRANULARITY seconds,
+    since a following change may not modify the stamp.
+    """
+    stamp = []
+    now = time.time()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            stamp.append(None)
+            continue
+        if now - st.st_mtime <= MTIME_GRANULARITY:
+            return None
+        stamp.append((st.st_ino, st.st_size, st.st_mtime))
+    return tuple(stamp)
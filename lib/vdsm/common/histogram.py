@@ -0,0 +1,94 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import bisect
+import threading
+
+# Default bucket bounds, suitable for timing operations in seconds.
+DEFAULT_BOUNDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram(object):
+    """
+    Count values in buckets, for reporting distribution of values such as
+    operation latency.
+
+    Bucket i counts values v such that bounds[i - 1] < v <= bounds[i]. The
+    last bucket counts values bigger than the last bound.
+
+    Usage::
+
+        h = histogram.Histogram()
+        ...
+        h.add(elapsed)
+        ...
+        log.info("latency: %s", h.info())
+
+    This class is thread safe.
+    """
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        if list(bounds) != sorted(bounds):
+            raise ValueError("Bounds are not sorted: %s" % (bounds,))
+        self._bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._total = 0
+        self._max = 0
+
+    @property
+    def bounds(self):
+        return self._bounds
+
+    def add(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._buckets[index] += 1
+            self._count += 1
+            self._total += value
+            if value > self._max:
+                self._max = value
+
+    def info(self):
+        """
+        Return a dict suitable for reporting, with the number of values, their
+        sum and maximum, and the count of values in each bucket. The bucket
+        bounded by bound is reported as str(bound), and the last bucket as
+        "inf".
+        """
+        with self._lock:
+            buckets = list(self._buckets)
+            count = self._count
+            total = self._total
+            maximum = self._max
+        names = [str(bound) for bound in self._bounds] + ["inf"]
+        return {
+            "count": count,
+            "total": total,
+            "max": maximum,
+            "buckets": dict(zip(names, buckets)),
+        }
+
+    def __repr__(self):
+        info = self.info()
+        return "<Histogram count=%(count)d total=%(total)s max=%(max)s>" % info
@@ -22,6 +22,8 @@ from __future__ import print_function
 from __future__ import absolute_import
 from __future__ import division
 
+import collections
+import errno
 import glob
 import hashlib
 import itertools
@@ -33,11 +35,20 @@ import os.path
 import pkgutil
 import sys
 import tempfile
+import threading
+import time
 
 import six
 
 from vdsm.common import commands
+from vdsm.common import concurrent
 from vdsm.common import exception
+from vdsm.common import fileutils
+from vdsm.common import histogram
+from vdsm.common import hookworker
+from vdsm.common.compat import subprocess
+from vdsm.common.config import config
+from vdsm.common.time import monotonic_time
 from vdsm.common.constants import P_VDSM_HOOKS, P_VDSM_RUN
 
 _LAUNCH_FLAGS_FILE = 'launchflags'
@@ -48,89 +59,419 @@ _LAUNCH_FLAGS_PATH = os.path.join(
 )
 
 
-# dir path is relative to '/' for test purposes
-# otherwise path is relative to P_VDSM_HOOKS
-def _scriptsPerDir(dir):
+# Sidecar descriptor describing how to run a hook script, e.g.
+# 50_myhook.json for 50_myhook.
+_DESCRIPTOR_EXT = '.json'
+
+_EXEC_RUNNER = 'exec'
+_PYTHON_RUNNER = 'python'
+
+_HookScript = collections.namedtuple(
+    '_HookScript', ['path', 'runner', 'independent', 'timeout'])
+
+# {path: (mtime, scripts)}
+_scriptsCache = {}
+
+_worker = hookworker.HookWorker()
+
+
+def _hooksDirPath(dir):
+    # dir path is relative to '/' for test purposes
+    # otherwise path is relative to P_VDSM_HOOKS
     if (dir[0] == '/'):
-        path = dir
+        return dir
     else:
-        path = P_VDSM_HOOKS + dir
-    return [s for s in glob.glob(path + '/*')
-            if os.access(s, os.X_OK)]
+        return P_VDSM_HOOKS + dir
+
+
+def _hookScripts(dir):
+    """
+    Return a sorted tuple of _HookScript for the executable scripts in hooks
+    directory dir.
+
+    The listing is cached, and refreshed when the directory modification
+    time changes, so hot verbs pay only for a stat() call. Adding, removing
+    or renaming scripts and descriptors modifies the directory; a change
+    that does not (e.g. chmod) is picked up on the next directory change.
+    """
+    path = _hooksDirPath(dir)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return ()
+
+    cached = _scriptsCache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    scripts = tuple(_scriptInfo(s)
+                    for s in sorted(glob.glob(path + '/*'))
+                    if os.access(s, os.X_OK))
+    # A change made right after listing may not modify the directory mtime.
+    if time.time() - mtime > fileutils.MTIME_GRANULARITY:
+        _scriptsCache[path] = (mtime, scripts)
+    return scripts
+
+
+def _scriptInfo(script):
+    """
+    Return _HookScript for script, using the script sidecar descriptor.
+
+    The descriptor is a json object with these optional keys:
+
+    runner          "python" to run the script in the hook worker. Python
+                    hooks using only hooking.read_domxml(), write_domxml(),
+                    read_json() and write_json() to access the hook data
+                    can use it. The default, "exec", executes the script.
+
+    independent     true if the script only reads the hook data and does
+                    not depend on other scripts. Consecutive independent
+                    scripts run concurrently, and data written by them is
+                    discarded.
+
+    timeout         Seconds to wait for the script, overriding
+                    vars:hook_timeout.
+
+    For example:
+
+        {"runner": "python", "independent": true, "timeout": 10}
+    """
+    descriptor = _readDescriptor(script)
+    timeout = descriptor.get('timeout')
+    if timeout is not None:
+        try:
+            timeout = float(timeout)
+        except (TypeError, ValueError):
+            logging.warning('Invalid timeout in hook descriptor for %s: %r',
+                            script, timeout)
+            timeout = None
+    return _HookScript(
+        path=script,
+        runner=descriptor.get('runner', _EXEC_RUNNER),
+        independent=bool(descriptor.get('independent', False)),
+        timeout=timeout)
+
+
+def _readDescriptor(script):
+    try:
+        with open(script + _DESCRIPTOR_EXT) as f:
+            descriptor = json.load(f)
+    except EnvironmentError as e:
+        if e.errno != errno.ENOENT:
+            logging.warning('Cannot read hook descriptor for %s: %s',
+                            script, e)
+        return {}
+    except ValueError as e:
+        logging.warning('Invalid hook descriptor for %s: %s', script, e)
+        return {}
+    if not isinstance(descriptor, dict):
+        logging.warning('Invalid hook descriptor for %s: %r', script,
+                        descriptor)
+        return {}
+    return descriptor
+
+
+def _scriptsPerDir(dir):
+    return [s.path for s in _hookScripts(dir)]
+
+
+def _scriptGroups(scripts):
+    """
+    Yield lists of scripts to run together: consecutive independent scripts,
+    or a single script.
+    """
+    group = []
+    for s in scripts:
+        if s.independent:
+            group.append(s)
+            continue
+        if group:
+            yield group
+            group = []
+        yield [s]
+    if group:
+        yield group
+
+
+class _HookStats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._time = histogram.Histogram()
+        self._timeouts = 0
+
+    def add(self, elapsed):
+        self._time.add(elapsed)
+
+    def timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def info(self):
+        info = self._time.info()
+        with self._lock:
+            info['timeouts'] = self._timeouts
+        return info
+
+
+# {"hook_name/script_name": _HookStats}
+_stats = {}
+_statsLock = threading.Lock()
+
+
+def _scriptStats(path):
+    name = os.path.join(os.path.basename(os.path.dirname(path)),
+                        os.path.basename(path))
+    with _statsLock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _HookStats()
+    return stats
+
+
+def stats():
+    """
+    Return the wall time histogram and number of timeouts of every hook
+    script run since vdsm was started, keyed by "hook_name/script_name".
+    """
+    with _statsLock:
+        items = list(_stats.items())
+    return {name: stats.info() for name, stats in items}
 
 _DOMXML_HOOK = 1
 _JSON_HOOK = 2
 
+_WORKER_HOOK_TYPE = {
+    _DOMXML_HOOK: hookworker.DOMXML,
+    _JSON_HOOK: hookworker.JSON,
+}
+
+
+class _HookData(object):
+    """
+    The data passed to hook scripts, kept in memory for scripts running in
+    the hook worker, and in a data file for executed scripts. The file is
+    created when the first script is executed.
+    """
+
+    def __init__(self, text, hookType, env):
+        self.hookType = hookType
+        self.env = env
+        # None if the data was modified in the file.
+        self._text = text
+        self._path = None
+        self._fileValid = False
+
+    def text(self):
+        if self._text is None:
+            self._text = _readDataFile(self._path)
+        return self._text
+
+    def update(self, text):
+        self._text = text
+        self._fileValid = False
+
+    def path(self):
+        """
+        Return the data file path, for executing a script that may modify
+        the file.
+        """
+        if self._path is None:
+            self._path = _createDataFile(self.env, self.hookType)
+        if not self._fileValid:
+            _writeDataFile(self._path, self.text())
+            self._fileValid = True
+        self._text = None
+        return self._path
+
+    def close(self):
+        if self._path is not None:
+            os.unlink(self._path)
+            self._path = None
+
 
 def _runHooksDir(data, dir, vmconf={}, raiseError=True, errors=None, params={},
                  hookType=_DOMXML_HOOK):
     if errors is None:
         errors = []
 
-    scripts = _scriptsPerDir(dir)
-    scripts.sort()
+    scripts = _hookScripts(dir)
 
     if not scripts:
         return data
 
-    data_fd, data_filename = tempfile.mkstemp()
+    if hookType == _DOMXML_HOOK:
+        text = data or ''
+    elif hookType == _JSON_HOOK:
+        text = json.dumps(data)
+
+    scriptenv = os.environ.copy()
+
+    # Update the environment using params and custom configuration
+    env_update = [six.iteritems(params),
+                  six.iteritems(vmconf.get('custom', {}))]
+
+    # Encode custom properties to UTF-8 and save them to scriptenv
+    # Pass str objects (byte-strings) without any conversion
+    for k, v in itertools.chain(*env_update):
+        try:
+            if isinstance(v, unicode):
+                scriptenv[k] = v.encode('utf-8')
+            else:
+                scriptenv[k] = v
+        except UnicodeDecodeError:
+            pass
+
+    if vmconf.get('vmId'):
+        scriptenv['vmId'] = vmconf.get('vmId')
+    ppath = scriptenv.get('PYTHONPATH', '')
+    hook = pkgutil.get_loader('vdsm.hook').filename
+    scriptenv['PYTHONPATH'] = ':'.join(ppath.split(':') + [hook])
+
+    hookData = _HookData(text, hookType, scriptenv)
     try:
-        if hookType == _DOMXML_HOOK:
-            os.write(data_fd, data or '')
-        elif hookType == _JSON_HOOK:
-            os.write(data_fd, json.dumps(data))
-        os.close(data_fd)
-
-        scriptenv = os.environ.copy()
-
-        # Update the environment using params and custom configuration
-        env_update = [six.iteritems(params),
-                      six.iteritems(vmconf.get('custom', {}))]
-
-        # Encode custom properties to UTF-8 and save them to scriptenv
-        # Pass str objects (byte-strings) without any conversion
-        for k, v in itertools.chain(*env_update):
-            try:
-                if isinstance(v, unicode):
-                    scriptenv[k] = v.encode('utf-8')
-                else:
-                    scriptenv[k] = v
-            except UnicodeDecodeError:
-                pass
-
-        if vmconf.get('vmId'):
-            scriptenv['vmId'] = vmconf.get('vmId')
-        ppath = scriptenv.get('PYTHONPATH', '')
-        hook = pkgutil.get_loader('vdsm.hook').filename
-        scriptenv['PYTHONPATH'] = ':'.join(ppath.split(':') + [hook])
-        if hookType == _DOMXML_HOOK:
-            scriptenv['_hook_domxml'] = data_filename
-        elif hookType == _JSON_HOOK:
-            scriptenv['_hook_json'] = data_filename
-
-        for s in scripts:
-            rc, out, err = commands.execCmd([s], raw=True,
-                                            env=scriptenv)
-            logging.info('%s: rc=%s err=%s', s, rc, err)
-            if rc != 0:
-                errors.append(err)
-
-            if rc == 2:
+        for group in _scriptGroups(scripts):
+            if group[0].independent:
+                results = _runIndependent(group, hookData)
+            else:
+                results = [_runScript(group[0], hookData)]
+
+            stop = False
+            for s, (rc, err) in zip(group, results):
+                logging.info('%s: rc=%s err=%s', s.path, rc, err)
+                if rc != 0:
+                    errors.append(err)
+
+                if rc == 2:
+                    stop = True
+                elif rc > 2:
+                    logging.warn('hook returned unexpected return code %s',
+                                 rc)
+            if stop:
                 break
-            elif rc > 2:
-                logging.warn('hook returned unexpected return code %s', rc)
 
         if errors and raiseError:
             raise exception.HookError(err)
 
-        with open(data_filename) as f:
-            final_data = f.read()
+        text = hookData.text()
     finally:
-        os.unlink(data_filename)
+        hookData.close()
     if hookType == _DOMXML_HOOK:
-        return final_data
+        return text
     elif hookType == _JSON_HOOK:
-        return json.loads(final_data)
+        return json.loads(text)
+
+
+def _runIndependent(scripts, hookData):
+    """
+    Run independent scripts concurrently, returning list of (rc, err). Every
+    script gets a private copy of the data, so data written by one script
+    cannot affect the others.
+    """
+    text = hookData.text()
+
+    def run(s):
+        private = _HookData(text, hookData.hookType, hookData.env.copy())
+        try:
+            return _runScript(s, private)
+        finally:
+            private.close()
+
+    if len(scripts) == 1:
+        return [run(scripts[0])]
+
+    results = []
+    for res in concurrent.tmap(run, scripts):
+        if not res.succeeded:
+            raise res.value
+        results.append(res.value)
+    return results
+
+
+def _runScript(s, hookData):
+    """
+    Run script s with hookData, returning (rc, err). If the script does not
+    complete within the timeout, the data is not modified, and the script
+    fails.
+    """
+    timeout = s.timeout
+    if timeout is None:
+        timeout = config.getfloat('vars', 'hook_timeout') or None
+
+    stats = _scriptStats(s.path)
+    start = monotonic_time()
+    try:
+        if s.runner == _PYTHON_RUNNER:
+            try:
+                rc, text, err = _runInWorker(s.path, hookData.env,
+                                             hookData.hookType,
+                                             hookData.text(), timeout)
+            except hookworker.Busy:
+                logging.debug('Hook worker busy, executing %s', s.path)
+            except hookworker.Timeout:
+                return _timedOut(s, timeout, stats)
+            except hookworker.Error as e:
+                logging.warning('Cannot run %s in hook worker: %s',
+                                s.path, e)
+            else:
+                hookData.update(text)
+                return rc, err
+
+        saved = hookData.text() if timeout else None
+        hookData.path()
+        try:
+            rc, out, err = commands.execCmd([s.path], raw=True,
+                                            env=hookData.env,
+                                            timeout=timeout)
+        except subprocess.TimeoutExpired:
+            hookData.update(saved)
+            return _timedOut(s, timeout, stats)
+        return rc, err
+    finally:
+        stats.add(monotonic_time() - start)
+
+
+def _timedOut(s, timeout, stats):
+    stats.timeout()
+    err = 'hook %s timed out after %s seconds' % (s.path, timeout)
+    logging.error('%s', err)
+    return 1, err
+
+
+def _runInWorker(script, env, hookType, text, timeout):
+    if six.PY2 and hookType == _DOMXML_HOOK:
+        try:
+            text = text.decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise hookworker.Error("Cannot decode hook data: %s" % e)
+    rc, text, err = _worker.run(script, env, _WORKER_HOOK_TYPE[hookType],
+                                text, timeout=timeout)
+    if six.PY2:
+        text = text.encode('utf-8')
+        err = err.encode('utf-8')
+    return rc, text, err
+
+
+def _createDataFile(scriptenv, hookType):
+    data_fd, data_filename = tempfile.mkstemp()
+    os.close(data_fd)
+    if hookType == _DOMXML_HOOK:
+        scriptenv['_hook_domxml'] = data_filename
+    elif hookType == _JSON_HOOK:
+        scriptenv['_hook_json'] = data_filename
+    return data_filename
+
+
+def _writeDataFile(data_filename, text):
+    with open(data_filename, 'w') as f:
+        f.write(text)
+
+
+def _readDataFile(data_filename):
+    with open(data_filename) as f:
+        return f.read()
 
 
 def before_device_create(devicexml, vmconf={}, customProperties={}):
@@ -483,6 +824,25 @@ def installed():
             res[dir] = inf
     return res
 
+
+def installed_stamp():
+    """
+    Return a value that changes when installed() may return a different
+    result, or None if a hook was modified too recently to tell.
+
+    This is much cheaper than installed(), reading only the modification
+    time and size of the hooks directories and scripts.
+    """
+    paths = []
+    for dir in sorted(os.listdir(P_VDSM_HOOKS)):
+        paths.append(_hooksDirPath(dir))
+        paths.extend(_scriptsPerDir(dir))
+    stamp = fileutils.stat_stamp(paths)
+    if stamp is None:
+        return None
+    return tuple(zip(paths, stamp))
+
+
 if __name__ == '__main__':
     def usage():
         print('Usage: %s hook_name' % sys.argv[0])
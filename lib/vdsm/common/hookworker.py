@@ -0,0 +1,340 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Run python hooks in a pre-forked hook worker process.
+
+Running a python hook script is dominated by starting the interpreter and
+importing the hooking module, not by the hook itself. The hook worker is a
+long lived python process with the hooking module already imported. For
+every hook, the worker forks a child running the hook script with runpy, so
+hooks cannot affect each other or the worker.
+
+The hook data is sent to the worker over a pipe, and the hooking module
+read_domxml(), write_domxml(), read_json() and write_json() functions are
+replaced in the child to use the data in memory instead of a temporary file.
+Hooks reading the file named by the _hook_domxml or _hook_json environment
+variables directly cannot run in the worker.
+
+The worker runs one hook at a time. If the worker is busy, HookWorker.run()
+raises Busy, and the caller should run the hook as a new process. If the
+worker fails or times out, it is killed and a new worker is started on the
+next call.
+
+Requests and responses are json objects, one per line:
+
+    request:  {"script": path, "env": {...}, "type": "domxml", "data": text}
+    response: {"rc": 0, "err": text, "data": text}
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import errno
+import io
+import json
+import logging
+import os
+import pkgutil
+import runpy
+import select
+import signal
+import sys
+import threading
+import traceback
+
+import six
+
+from vdsm.common.compat import subprocess
+from vdsm.common.osutils import uninterruptible_poll
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("hooks.worker")
+
+DOMXML = "domxml"
+JSON = "json"
+
+
+class Error(Exception):
+    """ Running a hook in the worker failed """
+
+
+class Busy(Error):
+    """ The worker is running another hook """
+
+
+class Timeout(Error):
+    """ The worker did not complete a hook in time """
+
+
+class HookWorker(object):
+
+    def __init__(self, command=None):
+        if command is None:
+            command = [sys.executable, "-m", "vdsm.common.hookworker"]
+        self._command = command
+        self._lock = threading.Lock()
+        self._proc = None
+
+    def run(self, script, env, hook_type, data, timeout=None):
+        """
+        Run hook script in the worker.
+
+        Arguments:
+            script (str): path to python hook script
+            env (dict): hook environment
+            hook_type (str): DOMXML or JSON
+            data (str): domxml or json text passed to the hook
+            timeout (float): seconds to wait for the hook, or None to wait
+                until the hook completes.
+
+        Returns:
+            tuple (rc, data, err), where data is the domxml or json text
+            written by the hook, or the original data if the hook did not
+            modify it.
+
+        Raises:
+            Busy if the worker is running another hook, Timeout if the hook
+            did not complete in time, or Error if the request cannot be
+            sent or the worker failed.
+        """
+        request = {"script": script, "env": env, "type": hook_type,
+                   "data": data}
+        try:
+            line = json.dumps(request) + "\n"
+        except (TypeError, ValueError) as e:
+            raise Error("Cannot encode hook request: %s" % e)
+
+        if not self._lock.acquire(False):
+            raise Busy("hook worker is busy")
+        try:
+            if self._proc is None:
+                self._start()
+            try:
+                self._write(line.encode("utf-8"))
+                response = json.loads(self._read_line(timeout))
+                return response["rc"], response["data"], response["err"]
+            except Exception:
+                self._stop()
+                raise
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._stop()
+
+    def _start(self):
+        log.debug("Starting hook worker %s", self._command)
+        self._proc = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            close_fds=True,
+            start_new_session=True)
+
+    def _stop(self):
+        proc = self._proc
+        self._proc = None
+        log.debug("Stopping hook worker pid=%s", proc.pid)
+        # The worker runs in a new session, so killing the process group
+        # kills also a hook running in the worker child.
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+        for f in (proc.stdin, proc.stdout):
+            try:
+                f.close()
+            except EnvironmentError as e:
+                log.debug("Error closing hook worker pipe: %s", e)
+        proc.wait()
+
+    def _write(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except EnvironmentError as e:
+            if e.errno != errno.EPIPE:
+                raise
+            raise Error("hook worker terminated: %s" % e)
+
+    def _read_line(self, timeout):
+        fd = self._proc.stdout.fileno()
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        deadline = None if timeout is None else monotonic_time() + timeout
+        buf = bytearray()
+        while not buf.endswith(b"\n"):
+            if deadline is None:
+                remaining = -1
+            else:
+                remaining = (deadline - monotonic_time()) * 1000
+                if remaining <= 0:
+                    raise Timeout("Timeout waiting for hook worker")
+            if not uninterruptible_poll(poller.poll, remaining):
+                raise Timeout("Timeout waiting for hook worker")
+            data = os.read(fd, 65536)
+            if not data:
+                raise Error("hook worker terminated, output=%r" % bytes(buf))
+            buf += data
+        return buf.decode("utf-8")
+
+
+# Worker process.
+
+
+def _load_hooking():
+    """
+    Import the hooking module both as "hooking" and "vdsm.hook.hooking", so
+    hook scripts importing any of them do not pay for the import.
+    """
+    hook_dir = pkgutil.get_loader("vdsm.hook").filename
+    if hook_dir not in sys.path:
+        sys.path.append(hook_dir)
+    import hooking
+    from vdsm.hook import hooking as vdsm_hooking
+    return [hooking, vdsm_hooking]
+
+
+def _run_script(modules, request):
+    """
+    Run a hook script in the current process, returning the response.
+    """
+    hook_type = request["type"]
+    state = {"data": request["data"]}
+
+    def read_domxml():
+        from xml.dom import minidom
+        return minidom.parseString(state["data"].encode("utf-8"))
+
+    def write_domxml(domxml):
+        state["data"] = domxml.toxml(encoding="utf-8").decode("utf-8")
+
+    def read_json():
+        return json.loads(state["data"])
+
+    def write_json(data):
+        state["data"] = json.dumps(data)
+
+    for module in modules:
+        module.read_domxml = read_domxml
+        module.write_domxml = write_domxml
+        module.read_json = read_json
+        module.write_json = write_json
+
+    env = request["env"]
+    if six.PY2:
+        env = {k.encode("utf-8"): v.encode("utf-8")
+               for k, v in six.iteritems(env)}
+    os.environ.clear()
+    os.environ.update(env)
+    # Hooks using the file directly must not run in the worker, but the
+    # variable is kept so checking for it works as expected.
+    os.environ["_hook_" + hook_type] = ""
+
+    script = request["script"]
+    sys.argv = [script]
+    err = six.StringIO()
+    sys.stdout = six.StringIO()
+    sys.stderr = err
+    try:
+        runpy.run_path(script, run_name="__main__")
+        rc = 0
+    except SystemExit as e:
+        if e.code is None:
+            rc = 0
+        elif isinstance(e.code, int):
+            rc = e.code
+        else:
+            err.write("%s\n" % e.code)
+            rc = 1
+    except BaseException:
+        traceback.print_exc(file=err)
+        rc = 1
+
+    err = err.getvalue()
+    if isinstance(err, bytes):
+        err = err.decode("utf-8", "replace")
+    return {"rc": rc, "err": err, "data": state["data"]}
+
+
+def _serve(modules, request):
+    """
+    Run a hook in a forked child, returning the child response.
+    """
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(r)
+            response = _run_script(modules, request)
+            data = json.dumps(response).encode("utf-8")
+            while data:
+                n = os.write(w, data)
+                data = data[n:]
+        finally:
+            os._exit(0)
+
+    os.close(w)
+    chunks = []
+    with io.open(r, "rb") as f:
+        while True:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    _, status = os.waitpid(pid, 0)
+    if chunks:
+        return json.loads(b"".join(chunks).decode("utf-8"))
+
+    # The hook terminated the child without returning, for example using
+    # os._exit().
+    if os.WIFEXITED(status):
+        rc = os.WEXITSTATUS(status)
+        err = ""
+    else:
+        rc = 1
+        err = "hook terminated by signal %d\n" % os.WTERMSIG(status)
+    return {"rc": rc, "err": err, "data": request["data"]}
+
+
+def main():
+    # Keep the protocol pipes away from fds 0 and 1, so hooks and programs
+    # started by hooks cannot corrupt the protocol.
+    requests = io.open(os.dup(0), "rb")
+    responses = io.open(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+    modules = _load_hooking()
+
+    for line in iter(requests.readline, b""):
+        response = _serve(modules, json.loads(line.decode("utf-8")))
+        responses.write(json.dumps(response).encode("utf-8") + b"\n")
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -30,8 +30,12 @@ import threading
 
 from vdsm.common import concurrent
 from vdsm.common import exception
+from vdsm.common import histogram
 from vdsm.common import time
 
+# Name of the task class used when no class is specified in dispatch().
+DEFAULT = "default"
+
 
 class NotRunning(Exception):
     """Executor not yet started or shutting down."""
@@ -41,6 +45,10 @@ class AlreadyStarted(Exception):
     """Executor started multiple times."""
 
 
+TaskClass = collections.namedtuple(
+    "TaskClass", "name, workers_count, max_tasks")
+
+
 class Executor(object):
     """
     Executes potentially blocking task into background
@@ -68,11 +76,23 @@ class Executor(object):
       the stuck task finishes.  This prevents creating an excessive number
       of threads when many tasks are stuck.
 
+    - Tasks may be dispatched to task classes, set with `task_classes`
+      constructor parameter.  Every class has its own queue and workers, so
+      slow tasks of one class cannot delay tasks of another class.  The
+      default class, served by `workers_count` workers, has the lowest
+      priority.  When their queue is empty, workers steal tasks from the
+      queues of classes with higher priority, but never from classes with
+      lower priority, keeping the workers of the high priority classes
+      available for their tasks.
+
+    - The time tasks wait in the queue and their run time are recorded per
+      class, see `stats()`.
+
     """
     _log = logging.getLogger('Executor')
 
     def __init__(self, name, workers_count, max_tasks, scheduler,
-                 max_workers=None, log=None):
+                 max_workers=None, log=None, task_classes=()):
         """
         :param name: Name of the executor; no special purpose, just for
           logging and debugging.
@@ -97,13 +117,21 @@ class Executor(object):
         :param log: logger instance to override the default logger. This is
           useful for testing
         :type log: logger as returned by logging.getLogger()
+        :param task_classes: Task classes with higher priority than the
+          default class, ordered by priority, highest first.  Each class is
+          served by its own workers, and has its own queue.  `max_workers`
+          limits the total number of the workers of all classes.
+        :type task_classes: sequence of `TaskClass`
 
         """
         self._name = name
         self._workers_count = workers_count
         self._max_workers = max_workers
         self._worker_id = 0
-        self._tasks = TaskQueue(name, max_tasks)
+        self._classes = tuple(task_classes) + (
+            TaskClass(DEFAULT, workers_count, max_tasks),)
+        self._tasks = TaskQueue(name, max_tasks, task_classes)
+        self._stats = {c.name: _TaskClassStats() for c in self._classes}
         self._scheduler = scheduler
         if log is not None:
             self._log = log
@@ -130,21 +158,24 @@ class Executor(object):
             if self._running:
                 raise AlreadyStarted()
             self._running = True
-            for _ in range(self._workers_count):
-                self._add_worker()
+            for task_class in self._classes:
+                for _ in range(task_class.workers_count):
+                    self._add_worker(task_class.name)
 
     def stop(self, wait=True):
         self._log.debug('Stopping executor')
         with self._lock:
             self._running = False
             self._tasks.clear()
-            for _ in range(self._workers_count):
-                self._tasks.put(_STOP)
+            for task_class in self._classes:
+                for _ in range(task_class.workers_count):
+                    self._tasks.put(_STOP, task_class.name)
             workers = tuple(self._workers) if wait else ()
         for worker in workers:
             worker.join()
 
-    def dispatch(self, callable, timeout=None, discard=True):
+    def dispatch(self, callable, timeout=None, discard=True,
+                 task_class=DEFAULT):
         """
         Dispatches a new task to the executor.
 
@@ -165,10 +196,29 @@ class Executor(object):
           completed, emits a warning in the log if it didn't complete,
           and reschedules the check after `timeout` seconds.
         :type discard: boolean
+        :param task_class: name of the task class to run the callable in.
+          Raises ValueError if the class is unknown.
+        :type task_class: basestring
         """
         if not self._running:
             raise NotRunning()
-        self._tasks.put(Task(callable, timeout, discard))
+        self._tasks.put(Task(callable, timeout, discard, task_class),
+                        task_class)
+
+    def stats(self):
+        """
+        Return a dict with the statistics of every task class: the number of
+        queued tasks, and the histograms of the time tasks waited in the queue
+        and of their run time, in seconds.
+        """
+        return {
+            name: {
+                "queued": self._tasks.size(name),
+                "wait": stats.wait.info(),
+                "run": stats.run.info(),
+            }
+            for name, stats in self._stats.items()
+        }
 
     # Serving workers
 
@@ -180,8 +230,14 @@ class Executor(object):
     def _total_workers(self):
         return len(self._workers)
 
-    def _may_add_workers(self):
-        return (self._active_workers < self._workers_count and
+    def _active_class_workers(self, task_class):
+        return len([w for w in tuple(self._workers)
+                    if w.task_class == task_class and not w.discarded])
+
+    def _may_add_workers(self, task_class):
+        workers_count = next(c.workers_count for c in self._classes
+                             if c.name == task_class)
+        return (self._active_class_workers(task_class) < workers_count and
                 (self._max_workers is None or
                  self._total_workers < self._max_workers))
 
@@ -200,8 +256,8 @@ class Executor(object):
         with self._lock:
             if not self._running:
                 return
-            if self._may_add_workers():
-                self._add_worker()
+            if self._may_add_workers(worker.task_class):
+                self._add_worker(worker.task_class)
                 worker_added = True
 
         # intentionally done outside the lock
@@ -227,30 +283,38 @@ class Executor(object):
             self._workers.remove(worker)
             if not self._running:
                 return
-            if self._may_add_workers():
-                self._add_worker()
+            if self._may_add_workers(worker.task_class):
+                self._add_worker(worker.task_class)
                 worker_added = True
 
         if worker_added:
             self._log.info("New worker added (%s active, %s total workers)",
                            self._active_workers, self._total_workers)
 
-    def _next_task(self):
+    def _next_task(self, task_class):
         """
         Called from the worker thread to get the next task from the task queue.
         Raises NotRunning exception if executor was stopped.
         """
-        task = self._tasks.get()
+        task = self._tasks.get(task_class)
         if task is _STOP:
             raise NotRunning()
         return task
 
+    def _task_done(self, task):
+        """
+        Called from the worker thread when a task is finished.
+        """
+        stats = self._stats[task.task_class]
+        stats.wait.add(task.wait_time)
+        stats.run.add(task.duration)
+
     # Private
 
-    def _add_worker(self):
+    def _add_worker(self, task_class):
         name = "%s/%d" % (self.name, self._worker_id)
         self._worker_id += 1
-        worker = _Worker(self, self._scheduler, name, self._log)
+        worker = _Worker(self, self._scheduler, name, self._log, task_class)
         worker.start()
         self._workers.add(worker)
 
@@ -258,6 +322,13 @@ class Executor(object):
 _STOP = object()
 
 
+class _TaskClassStats(object):
+
+    def __init__(self):
+        self.wait = histogram.Histogram()
+        self.run = histogram.Histogram()
+
+
 class _WorkerDiscarded(Exception):
     """ Raised if worker was discarded during execution of a task """
 
@@ -266,9 +337,11 @@ class _Worker(object):
 
     _log = logging.getLogger('Executor')
 
-    def __init__(self, executor, scheduler, name, log=None):
+    def __init__(self, executor, scheduler, name, log=None,
+                 task_class=DEFAULT):
         self._executor = executor
         self._scheduler = scheduler
+        self._task_class = task_class
         self._discarded = False
         self._task_counter = 0
         self._lock = threading.Lock()
@@ -294,6 +367,10 @@ class _Worker(object):
     def discarded(self):
         return self._discarded
 
+    @property
+    def task_class(self):
+        return self._task_class
+
     def _run(self):
         self._log.debug('Worker started')
         try:
@@ -307,7 +384,7 @@ class _Worker(object):
             self._executor._worker_stopped(self)
 
     def _execute_task(self):
-        task = self._executor._next_task()
+        task = self._executor._next_task(self._task_class)
         with self._lock:
             self._scheduled_check = self._check_after(task.timeout)
         self._task = task
@@ -316,6 +393,7 @@ class _Worker(object):
         except Exception:
             self._log.exception("Unhandled exception in %s", task)
         finally:
+            self._executor._task_done(task)
             self._task = None
             # We want to discard workers that were too slow to disarm
             # the timer. It does not matter if the thread was still
@@ -363,8 +441,9 @@ class _Worker(object):
                               trace)
 
     def __repr__(self):
-        return "<Worker name=%s %s%s task#=%s at 0x%x>" % (
+        return "<Worker name=%s class=%s %s%s task#=%s at 0x%x>" % (
             self.name,
+            self._task_class,
             "running %s" % (self._task,) if self._task else "waiting",
             " discarded" if self._discarded else "",
             self._task_counter,
@@ -374,10 +453,12 @@ class _Worker(object):
 
 class Task(object):
 
-    def __init__(self, callable, timeout, discard=True):
+    def __init__(self, callable, timeout, discard=True, task_class=DEFAULT):
         self._callable = callable
         self.timeout = timeout
         self.discard = discard
+        self.task_class = task_class
+        self._queued = time.monotonic_time()
         self._start = None
 
     @property
@@ -386,6 +467,15 @@ class Task(object):
             return 0
         return time.monotonic_time() - self._start
 
+    @property
+    def wait_time(self):
+        """
+        Time the task waited in the queue before it was called.
+        """
+        if self._start is None:
+            return time.monotonic_time() - self._queued
+        return self._start - self._queued
+
     def __call__(self):
         self._start = time.monotonic_time()
         self._callable()
@@ -402,67 +492,130 @@ class Task(object):
 
 class TaskQueue(object):
     """
-    Replacement for Queue.Queue, with two important changes:
+    Replacement for Queue.Queue, with important changes:
 
     * Queue.Queue blocks when full. We want to raise ResourceExhausted instead.
     * Queue.Queue lacks the clear() operation, which is needed to implement
       the 'poison pill' pattern (described for example in
       http://pymotw.com/2/multiprocessing/communication.html )
+    * Tasks are queued per task class, each class with its own bounded queue.
+      See get() for the order tasks are served.
     """
 
-    def __init__(self, name, max_tasks):
+    def __init__(self, name, max_tasks, task_classes=()):
         """
         :param name: Name of the executor; no special purpose, just for
           logging and debugging.
         :type name: basestring
         :param max_tasks: Maximum number of tasks waiting for execution in the
-          executor's task queue.
+          queue of the default task class.
         :type max_tasks: int
+        :param task_classes: Task classes with higher priority than the
+          default class, ordered by priority, highest first.
+        :type task_classes: sequence of `TaskClass`
         """
         self._name = name
-        self._max_tasks = max_tasks
-        self._tasks = collections.deque()
-        # Deque supports thread-safe append and pop from both ends. We need
-        # this condition for waking up threads waiting on an empty queue and
-        # protecting other methods which are not documented as thread-safe.
-        # https://docs.python.org/2/library/collections.html#deque-objects
-        self._cond = threading.Condition(threading.Lock())
+        classes = tuple(task_classes) + (
+            TaskClass(DEFAULT, None, max_tasks),)
+        names = [c.name for c in classes]
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate task class names: %s" % names)
+        self._max_tasks = {c.name: c.max_tasks for c in classes}
+        self._tasks = {c.name: collections.deque() for c in classes}
+        # Workers of a class may steal tasks from classes with higher
+        # priority, ordered by priority.
+        self._steal_from = {name: names[:i] for i, name in enumerate(names)}
+        self._order = names
+        # All queues are protected by one lock. Every class has its own
+        # condition, so put() can wake up a worker which can run the task.
+        lock = threading.Lock()
+        self._cond = {name: threading.Condition(lock) for name in names}
+        self._lock = lock
+        # Number of workers waiting on each class condition and not notified
+        # yet.
+        self._idle = {name: 0 for name in names}
 
     def __repr__(self):
-        return "<TaskQueue %s max_tasks=%i tasks(%i)=%s at 0x%x>" % (
+        return "<TaskQueue %s %s at 0x%x>" % (
             self._name,
-            self._max_tasks,
-            len(self._tasks),
-            repr(self._tasks),
+            " ".join("%s(max_tasks=%i tasks(%i)=%r)" % (
+                name,
+                self._max_tasks[name],
+                len(self._tasks[name]),
+                self._tasks[name])
+                for name in self._order),
             id(self)
         )
 
-    def put(self, task):
+    def put(self, task, task_class=DEFAULT):
         """
-        Put a new task in the queue.
+        Put a new task in the queue of task_class.
         Do not block when full, raises ResourceExhausted instead.
+        Raises ValueError if task_class is unknown.
         """
-        with self._cond:
-            if len(self._tasks) == self._max_tasks:
+        if task_class not in self._tasks:
+            raise ValueError("Unknown task class %r" % task_class)
+        with self._lock:
+            tasks = self._tasks[task_class]
+            if len(tasks) == self._max_tasks[task_class]:
                 raise exception.ResourceExhausted(
                     "Too many tasks",
                     resource=self._name,
-                    current_tasks=self._max_tasks)
-            self._tasks.append(task)
-            self._cond.notify()
+                    task_class=task_class,
+                    current_tasks=self._max_tasks[task_class])
+            tasks.append(task)
+            self._wakeup(task_class)
 
-    def get(self):
+    def get(self, task_class=DEFAULT):
         """
-        Get a new task. Blocks if empty.
+        Get a new task for a worker of task_class. Blocks if there is no task
+        the worker can run.
+
+        Return the oldest task of task_class. If there is no such task, steal
+        the oldest task from the classes with higher priority, starting with
+        the class with the highest priority.
         """
-        while True:
-            try:
-                return self._tasks.popleft()
-            except IndexError:
-                with self._cond:
-                    if not self._tasks:
-                        self._cond.wait()
+        with self._lock:
+            while True:
+                task = self._pop(task_class)
+                if task is not None:
+                    return task
+                self._idle[task_class] += 1
+                self._cond[task_class].wait()
+
+    def size(self, task_class=DEFAULT):
+        """
+        Return the number of tasks in the queue of task_class.
+        """
+        with self._lock:
+            return len(self._tasks[task_class])
 
     def clear(self):
-        with self._cond:
-            self._tasks.clear()
+        with self._lock:
+            for tasks in self._tasks.values():
+                tasks.clear()
+
+    def _pop(self, task_class):
+        tasks = self._tasks[task_class]
+        if tasks:
+            return tasks.popleft()
+        for name in self._steal_from[task_class]:
+            tasks = self._tasks[name]
+            # Stop requests must be handled by the workers of the class.
+            if tasks and tasks[0] is not _STOP:
+                return tasks.popleft()
+        return None
+
+    def _wakeup(self, task_class):
+        """
+        Wake up an idle worker of task_class, or a worker which can steal
+        the task. Must be called with the lock held.
+        """
+        candidates = [task_class]
+        if self._tasks[task_class][-1] is not _STOP:
+            candidates.extend(self._order[self._order.index(task_class) + 1:])
+        for name in candidates:
+            if self._idle[name]:
+                self._idle[name] -= 1
+                self._cond[name].notify()
+                return
@@ -54,6 +54,10 @@ def get_stats(cif, sample, multipath=False):
         if multipath:
             decStats['multipathHealth'] = cif.irs.multipath_health()
             del decStats['multipathHealth']['status']
+        latency = cif.irs.mailbox_latency()
+        del latency['status']
+        if latency:
+            decStats['mailboxLatency'] = latency
     else:
         decStats['storageDomains'] = {}
 
@@ -79,6 +83,8 @@ def get_stats(cif, sample, multipath=False):
     if ret['haStats']['configured']:
         # For backwards compatibility, will be removed in the future
         ret['haScore'] = ret['haStats']['score']
+    ret['hookStats'] = hooks.stats()
+    ret['executorStats'] = _executorStats(cif)
 
     ret = hooks.after_get_stats(ret)
     return ret
@@ -100,6 +106,16 @@ def send_metrics(hoststats):
         logging.exception('Host metrics collection failed')
 
 
+def _executorStats(cif):
+    """
+    Return the task classes statistics of the jsonrpc executor.
+    """
+    json_binding = cif.servers.get('jsonrpc')
+    if json_binding is None:
+        return {}
+    return json_binding.executor.stats()
+
+
 def _readSwapTotalFree():
     meminfo = utils.readMemInfo()
     return meminfo['SwapTotal'] // 1024, meminfo['SwapFree'] // 1024
@@ -21,14 +21,20 @@
 from __future__ import absolute_import
 from __future__ import division
 
-import os
+import copy
+import glob
 import logging
+import os
+import threading
+import time
 
 import libvirt
+import six
 
 from vdsm.common import cache
 from vdsm.common import cpuarch
 from vdsm.common import dsaversion
+from vdsm.common import fileutils
 from vdsm.common import hooks
 from vdsm.common import hostdev
 from vdsm.common import supervdsm
@@ -70,12 +76,45 @@ def _getIscsiIniName():
     return ''
 
 
-def get():
+# Host capabilities are collected in sections. A section is collected again
+# only when its stamp changes. Sections without a stamp, or with a stamp
+# returning None, are collected on every call. Every change in a section
+# value increments the capabilities generation, so clients can ask only for
+# the sections modified since the generation they have.
+
+_PACKAGE_DBS = (
+    '/var/lib/rpm/Packages',
+    '/var/lib/rpm/rpmdb.sqlite',
+    '/var/lib/dpkg/status',
+)
+
+
+def get(since=None, modify=None):
+    """
+    Return host capabilities.
+
+    The returned capabilities include a 'capsGeneration' key. If since is a
+    generation returned by a previous call, return only the sections modified
+    after that generation.
+
+    If modify is specified, it is called with all the capabilities and
+    returns the capabilities to report, for example modified by hooks. When
+    since is specified, capabilities changed by modify are reported even if
+    their section was not modified.
+    """
+    return _cache.get(since, modify)
+
+
+def _static():
+    # Values that cannot change while vdsm is running, or memoized by the
+    # modules reporting them.
+    return True
+
+
+def _cpu_caps():
     caps = {}
     cpu_topology = numa.cpu_topology()
 
-    caps['kvmEnabled'] = str(os.path.exists('/dev/kvm')).lower()
-
     if config.getboolean('vars', 'report_host_threads_as_cores'):
         caps['cpuCores'] = str(cpu_topology.threads)
     else:
@@ -88,46 +127,24 @@ def get():
     caps['cpuModel'] = cpuinfo.model()
     caps['cpuFlags'] = ','.join(cpuinfo.flags() +
                                 machinetype.compatible_cpu_models())
+    caps['emulatedMachines'] = machinetype.emulated_machines(
+        cpuarch.effective())
+    caps['numaNodes'] = dict(numa.topology())
+    caps['numaNodeDistance'] = dict(numa.distances())
+    caps['hugepages'] = hugepages.supported()
+    return caps
 
-    caps.update(_getVersionInfo())
-
-    net_caps = supervdsm.getProxy().network_caps()
-    caps.update(net_caps)
-
-    try:
-        caps['hooks'] = hooks.installed()
-    except:
-        logging.debug('not reporting hooks', exc_info=True)
 
+def _version_caps():
+    caps = dict(_getVersionInfo())
     caps['operatingSystem'] = osinfo.version()
     caps['uuid'] = host.uuid()
-    caps['packages2'] = osinfo.package_versions()
     caps['realtimeKernel'] = osinfo.runtime_kernel_flags().realtime
     caps['kernelArgs'] = osinfo.kernel_args()
     caps['nestedVirtualization'] = osinfo.nested_virtualization().enabled
-    caps['emulatedMachines'] = machinetype.emulated_machines(
-        cpuarch.effective())
-    caps['ISCSIInitiatorName'] = _getIscsiIniName()
-    caps['HBAInventory'] = hba.HBAInventory()
     caps['vmTypes'] = ['kvm']
-
-    caps['memSize'] = str(utils.readMemInfo()['MemTotal'] // 1024)
-    caps['reservedMem'] = str(config.getint('vars', 'host_mem_reserve') +
-                              config.getint('vars', 'extra_mem_reserve'))
-    caps['guestOverhead'] = config.get('vars', 'guest_ram_overhead')
-
-    caps['rngSources'] = rngsources.list_available()
-
-    caps['numaNodes'] = dict(numa.topology())
-    caps['numaNodeDistance'] = dict(numa.distances())
-    caps['autoNumaBalancing'] = numa.autonuma_status()
-
-    caps['selinux'] = osinfo.selinux_status()
-
     caps['liveSnapshot'] = 'true'
     caps['liveMerge'] = 'true'
-    caps['kdumpStatus'] = osinfo.kdump_status()
-
     caps['hostdevPassthrough'] = str(hostdev.is_supported()).lower()
     # TODO This needs to be removed after adding engine side support
     # and adding gdeploy support to enable libgfapi on RHHI by default
@@ -135,13 +152,156 @@ def get():
     if osinfo.glusterEnabled:
         from vdsm.gluster.api import glusterAdditionalFeatures
         caps['additionalFeatures'].extend(glusterAdditionalFeatures())
+    return caps
+
+
+def _network_caps():
+    return supervdsm.getProxy().network_caps()
+
+
+def _hooks_caps():
+    try:
+        return {'hooks': hooks.installed()}
+    except:
+        logging.debug('not reporting hooks', exc_info=True)
+        return {}
+
+
+def _packages_caps():
+    return {'packages2': osinfo.package_versions()}
+
+
+def _packages_stamp():
+    return fileutils.stat_stamp(_PACKAGE_DBS)
+
+
+def _storage_caps():
+    return {
+        'ISCSIInitiatorName': _getIscsiIniName(),
+        'HBAInventory': hba.HBAInventory(),
+    }
+
+
+def _storage_stamp():
+    # FC hosts are added and removed with their HBA driver, and their port
+    # names cannot change.
+    stamp = fileutils.stat_stamp([hba.ISCSI_INITIATOR_NAME])
+    if stamp is None:
+        return None
+    return stamp, tuple(sorted(glob.glob(hba.FC_HOST_MASK)))
+
+
+def _host_caps():
+    caps = {}
+    caps['kvmEnabled'] = str(os.path.exists('/dev/kvm')).lower()
+    caps['memSize'] = str(utils.readMemInfo()['MemTotal'] // 1024)
+    caps['reservedMem'] = str(config.getint('vars', 'host_mem_reserve') +
+                              config.getint('vars', 'extra_mem_reserve'))
+    caps['guestOverhead'] = config.get('vars', 'guest_ram_overhead')
+    caps['rngSources'] = rngsources.list_available()
+    caps['selinux'] = osinfo.selinux_status()
+    caps['kdumpStatus'] = osinfo.kdump_status()
     caps['containers'] = containersconnection.is_supported()
     caps['hostedEngineDeployed'] = _isHostedEngineDeployed()
-    caps['hugepages'] = hugepages.supported()
     caps['kernelFeatures'] = osinfo.kernel_features()
+    caps['autoNumaBalancing'] = numa.autonuma_status()
     return caps
 
 
+class Section(object):
+
+    def __init__(self, name, collect, stamp=None):
+        """
+        Arguments:
+            name (str): section name, used for logging
+            collect (callable): return a dict of capabilities
+            stamp (callable): return a value that changes when the
+                capabilities may change, or None if they must be collected.
+                If not specified, the section is collected on every call.
+        """
+        self.name = name
+        self.collect = collect
+        self.stamp = stamp
+        self.value = None
+        self.last_stamp = None
+        self.generation = None
+
+
+class Cache(object):
+
+    def __init__(self, sections, clock=time.time):
+        self._sections = sections
+        self._lock = threading.Lock()
+        # Start from the current time in milliseconds, so generations
+        # reported by a previous vdsm instance are older than the
+        # generations reported after a restart.
+        self._generation = int(clock() * 1000)
+
+    def get(self, since=None, modify=None):
+        with self._lock:
+            for section in self._sections:
+                self._refresh(section)
+
+            generation = self._generation
+            caps = {}
+            unmodified = {}
+            for section in self._sections:
+                caps.update(section.value)
+                # A client may send a generation from the future, for example
+                # after the host clock was moved backwards. We cannot tell
+                # what it has, so we report everything.
+                if not (since is None or since > generation or
+                        section.generation > since):
+                    unmodified.update(section.value)
+            caps = copy.deepcopy(caps)
+
+        if modify is not None:
+            caps = modify(caps)
+
+        # Section values are replaced when collected, never modified, so
+        # they can be compared outside of the lock.
+        for key, value in six.iteritems(unmodified):
+            if key in caps and caps[key] == value:
+                del caps[key]
+
+        caps['capsGeneration'] = generation
+        return caps
+
+    def _refresh(self, section):
+        stamp = None
+        if section.stamp is not None:
+            try:
+                stamp = section.stamp()
+            except Exception:
+                logging.debug("Error checking capabilities section %r",
+                              section.name, exc_info=True)
+
+        if (section.value is not None and stamp is not None and
+                stamp == section.last_stamp):
+            return
+
+        value = section.collect()
+        section.last_stamp = stamp
+        if value != section.value:
+            if section.value is not None:
+                logging.debug("Capabilities section %r changed",
+                              section.name)
+            self._generation += 1
+            section.generation = self._generation
+            section.value = value
+
+
+_cache = Cache([
+    Section('cpu', _cpu_caps, stamp=_static),
+    Section('version', _version_caps, stamp=_static),
+    Section('network', _network_caps),
+    Section('hooks', _hooks_caps, stamp=hooks.installed_stamp),
+    Section('packages', _packages_caps, stamp=_packages_stamp),
+    Section('storage', _storage_caps, stamp=_storage_stamp),
+    Section('host', _host_caps),
+])
+
+
 def _dropVersion(vstring, logMessage):
     logging.error(logMessage)
 
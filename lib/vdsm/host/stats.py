@@ -110,43 +110,77 @@ def produce(first_sample, last_sample):
 
 def _get_cpu_core_stats(first_sample, last_sample):
     interval = last_sample.timestamp - first_sample.timestamp
+    cores, first_user, first_sys, last_user, last_sys = _common_cores(
+        first_sample.cpuCores, last_sample.cpuCores)
 
-    def compute_cpu_usage(cpu_core, mode):
-        first_core_sample = first_sample.cpuCores.getCoreSample(cpu_core)
-        last_core_sample = last_sample.cpuCores.getCoreSample(cpu_core)
-        if not first_core_sample or not last_core_sample:
-            raise MissingSample()
-        jiffies = (
-            last_core_sample[mode] - first_core_sample[mode]
-        ) % JIFFIES_BOUND
-        return ("%.2f" % (jiffies / interval))
+    user = [((last - first) % JIFFIES_BOUND) / interval
+            for first, last in zip(first_user, last_user)]
+    sys = [((last - first) % JIFFIES_BOUND) / interval
+           for first, last in zip(first_sys, last_sys)]
 
+    core_nodes = _core_nodes()
     cpu_core_stats = {}
-    for node_index, numa_node in six.iteritems(numa.topology()):
-        cpu_cores = numa_node['cpus']
-        for cpu_core in cpu_cores:
-            try:
-                user_cpu_usage = compute_cpu_usage(cpu_core, 'user')
-                system_cpu_usage = compute_cpu_usage(cpu_core, 'sys')
-            except MissingSample:
-                # Only collect data when all required samples already present
-                continue
-            core_stat = {
-                'nodeIndex': int(node_index),
-                'cpuUser': user_cpu_usage,
-                'cpuSys': system_cpu_usage,
-            }
-            core_stat['cpuIdle'] = (
-                "%.2f" % max(0.0,
-                             100.0 -
-                             float(core_stat['cpuUser']) -
-                             float(core_stat['cpuSys'])))
-            cpu_core_stats[str(cpu_core)] = core_stat
+    for cpu_core, core_user, core_sys in zip(cores, user, sys):
+        node_index = core_nodes.get(cpu_core)
+        if node_index is None:
+            continue
+        user_cpu_usage = "%.2f" % core_user
+        system_cpu_usage = "%.2f" % core_sys
+        core_stat = {
+            'nodeIndex': node_index,
+            'cpuUser': user_cpu_usage,
+            'cpuSys': system_cpu_usage,
+        }
+        core_stat['cpuIdle'] = (
+            "%.2f" % max(0.0,
+                         100.0 -
+                         float(user_cpu_usage) -
+                         float(system_cpu_usage)))
+        cpu_core_stats[str(cpu_core)] = core_stat
     return cpu_core_stats
 
 
-class MissingSample(Exception):
-    pass
+def _common_cores(first, last):
+    """
+    Return the cores found in both samples, and the first and last user and
+    sys counters of these cores.
+    """
+    if first.cores == last.cores:
+        return last.cores, first.user, first.sys, last.user, last.sys
+
+    # A core went online or offline between the samples. Only collect data
+    # when all required samples already present.
+    first_index = {core: i for i, core in enumerate(first.cores)}
+    common = [(core, first_index[core], i)
+              for i, core in enumerate(last.cores)
+              if core in first_index]
+    return ([core for core, _, _ in common],
+            [first.user[i] for _, i, _ in common],
+            [first.sys[i] for _, i, _ in common],
+            [last.user[i] for _, _, i in common],
+            [last.sys[i] for _, _, i in common])
+
+
+# (topology, {core: node index})
+_core_nodes_cache = (None, {})
+
+
+def _core_nodes():
+    """
+    Return a mapping from cpu core to numa node index.
+
+    numa.topology() is memoized, so the mapping is computed again only if the
+    topology is a different object.
+    """
+    global _core_nodes_cache
+    topology = numa.topology()
+    cached_topology, core_nodes = _core_nodes_cache
+    if topology is not cached_topology:
+        core_nodes = {core: int(node_index)
+                      for node_index, numa_node in six.iteritems(topology)
+                      for core in numa_node['cpus']}
+        _core_nodes_cache = (topology, core_nodes)
+    return core_nodes
 
 
 def get_interfaces_stats():
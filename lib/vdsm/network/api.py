@@ -38,6 +38,7 @@ from vdsm.network.ipwrapper import DUMMY_BRIDGE
 from vdsm.network.link import iface as link_iface
 from vdsm.network.link import sriov
 from vdsm.network.lldp import info as lldp_info
+from vdsm.network.netinfo import cache as netinfo_cache
 
 from . import canonicalize
 from . ip import address as ipaddress
@@ -236,6 +237,10 @@ def setupNetworks(networks, bondings, options):
     else:
         hooks.after_network_setup(
             _build_setup_hook_dict(networks, bondings, options))
+    finally:
+        # Not all changes are reported by netlink events, e.g. dhcp and
+        # qos.
+        netinfo_cache.invalidate()
 
 
 def _setup_networks(networks, bondings, options, net_info):
@@ -16,33 +16,120 @@
 #
 # Refer to the README and COPYING files for full details of the license
 #
+
+"""
+Link statistics.
+
+The counters of all links are read in a single netlink link dump. Reading
+the speed and duplex of a link requires several netlink, sysfs and ethtool
+calls, and they change only when links change. They are cached, and the
+cache is dropped on every netlink link event.
+"""
+
 from __future__ import absolute_import
 from __future__ import division
 
+import threading
+
+import six
+
 from vdsm.network.link import bond
 from vdsm.network.link import dpdk
 from vdsm.network.link import iface
 from vdsm.network.link import nic
 from vdsm.network.link import vlan
+from vdsm.network.netlink import link
+from vdsm.network.netlink import monitor
 
 
 def report():
     stats = {}
-    for iface_properties in iface.list():
-        i = iface.iface(iface_properties['name'])
-        stats[i.device] = i.statistics()
-
-        speed = 0
-        if i.type() == iface.Type.NIC:
-            speed = nic.speed(i.device)
-        elif i.type() == iface.Type.BOND:
-            speed = bond.speed(i.device)
-        elif i.type() == iface.Type.VLAN:
-            speed = vlan.speed(i.device)
-        elif i.type() == iface.Type.DPDK:
-            speed = dpdk.speed(i.device)
-
-        stats[i.device]['speed'] = speed
-        stats[i.device]['duplex'] = nic.duplex(i.device)
+    for properties in link.iter_links(stats=True):
+        dev = properties['name']
+        counters = properties['stats']
+        oper_up = link.is_link_up(properties['flags'], check_oper_status=True)
+        stats[dev] = {
+            'name': dev,
+            'rx': counters['rx_bytes'],
+            'tx': counters['tx_bytes'],
+            'state': 'up' if oper_up else 'down',
+            'rxDropped': counters['rx_dropped'],
+            'txDropped': counters['tx_dropped'],
+            'rxErrors': counters['rx_errors'],
+            'txErrors': counters['tx_errors'],
+        }
+        speed, duplex = _speed_cache.get(dev, properties.get('type'))
+        stats[dev]['speed'] = speed
+        stats[dev]['duplex'] = duplex
+
+    # DPDK ports are not kernel links.
+    for dev in six.viewkeys(dpdk.get_dpdk_devices()):
+        stats[dev] = iface.iface(dev).statistics()
+        stats[dev]['speed'] = _speed(dev, iface.Type.DPDK)
+        stats[dev]['duplex'] = nic.duplex(dev)
 
     return stats
+
+
+def _speed(dev, link_type):
+    if link_type is None:
+        link_type = iface.get_alternative_type(dev)
+    if link_type == iface.Type.NIC:
+        return nic.speed(dev)
+    elif link_type == iface.Type.BOND:
+        return bond.speed(dev)
+    elif link_type == iface.Type.VLAN:
+        return vlan.speed(dev)
+    elif link_type == iface.Type.DPDK:
+        return dpdk.speed(dev)
+    return 0
+
+
+class _SpeedCache(object):
+    """
+    Speed and duplex of links, dropped on every netlink link event.
+
+    The speed of bonds and vlans depends on their underlying links, so an
+    event on any link drops all links. Nothing is cached until link events
+    are monitored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # dev -> (speed, duplex)
+        self._links = {}
+        # Incremented when the cache is dropped, so values read while
+        # handling an event are not kept.
+        self._generation = 0
+        self._monitoring = False
+        self._watcher = monitor.Watcher(
+            ('link',), self._drop, self._monitoring_changed,
+            name="netlink/speed")
+
+    def get(self, dev, link_type):
+        self._watcher.start()
+        with self._lock:
+            cached = self._links.get(dev)
+            generation = self._generation
+        if cached is not None:
+            return cached
+
+        value = (_speed(dev, link_type), nic.duplex(dev))
+        with self._lock:
+            if self._monitoring and self._generation == generation:
+                self._links[dev] = value
+        return value
+
+    def _drop(self, event=None):
+        with self._lock:
+            self._links.clear()
+            self._generation += 1
+
+    def _monitoring_changed(self, monitoring):
+        with self._lock:
+            self._monitoring = monitoring
+            self._links.clear()
+            self._generation += 1
+
+
+_speed_cache = _SpeedCache()
@@ -20,17 +20,24 @@
 
 from __future__ import absolute_import
 from __future__ import division
+import copy
 import logging
 import errno
+import os
+import threading
+
 import six
 
+from vdsm.common import fileutils
 from vdsm.network import dns
 from vdsm.network.ip.address import ipv6_supported
 from vdsm.network.ip import dhclient
 from vdsm.network.ipwrapper import getLinks
 from vdsm.network.link import dpdk
 from vdsm.network.link import iface as link_iface
+from vdsm.network.netconfpersistence import CONF_RUN_DIR, NETCONF_NETS
 from vdsm.network.netconfpersistence import RunningConfig
+from vdsm.network.netlink import monitor
 
 from .addresses import getIpAddrs, getIpInfo, is_ipv6_local_auto
 from . import bonding
@@ -158,13 +165,34 @@ def _permanent_hwaddr_info(devs_report):
 
 
 def get(vdsmnets=None, compatibility=None):
-    if compatibility is None:
-        return _get(vdsmnets)
-    elif compatibility < 30700:
-        # REQUIRED_FOR engine < 3.7
-        return _stringify_mtus(_get(vdsmnets))
+    return _compat(_get(vdsmnets), compatibility)
+
+
+def get_cached(compatibility=None):
+    """
+    Return the networking report of get(), rebuilt only when devices,
+    addresses or routes were modified since the last call.
+
+    The report depends also on state not reported by netlink events, like
+    dhclient processes and ipv6 autoconf. Flows modifying it, like
+    setupNetworks, should use get() and call invalidate() when done.
+    """
+    return _compat(_report_cache.get(), compatibility)
 
-    return _get(vdsmnets)
+
+def invalidate():
+    """
+    Drop the cached networking report, so the next get_cached() call
+    rebuilds it.
+    """
+    _report_cache.drop()
+
+
+def _compat(netinfo, compatibility):
+    if compatibility is not None and compatibility < 30700:
+        # REQUIRED_FOR engine < 3.7
+        return _stringify_mtus(netinfo)
+    return netinfo
 
 
 def _stringify_mtus(netinfo_data):
@@ -273,6 +301,76 @@ def _getNetInfo(iface, bridged, routes, ipaddrs):
     return data
 
 
+_REPORT_EVENTS = (
+    'link',
+    'ipv4-ifaddr',
+    'ipv6-ifaddr',
+    'ipv4-route',
+    'ipv6-route',
+)
+
+
+class _ReportCache(object):
+    """
+    Networking report, dropped on every netlink link, address or route
+    event, or when the running config or the nameservers change.
+
+    Events are coalesced; a burst of events costs one rebuild on the next
+    get(). Nothing is cached until events are monitored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._report = None
+        self._stamp = None
+        # Incremented when the report is dropped, so a report built while
+        # handling an event is not kept.
+        self._generation = 0
+        self._monitoring = False
+        self._watcher = monitor.Watcher(
+            _REPORT_EVENTS, self.drop, self._monitoring_changed,
+            name="netlink/netinfo")
+
+    def get(self):
+        self._watcher.start()
+        stamp = _report_stamp()
+        with self._lock:
+            if (self._report is not None and stamp is not None and
+                    stamp == self._stamp):
+                return copy.deepcopy(self._report)
+            generation = self._generation
+
+        report = _get()
+        with self._lock:
+            if self._monitoring and self._generation == generation:
+                self._report = copy.deepcopy(report)
+                self._stamp = stamp
+        return report
+
+    def drop(self, event=None):
+        with self._lock:
+            self._report = None
+            self._generation += 1
+
+    def _monitoring_changed(self, monitoring):
+        with self._lock:
+            self._monitoring = monitoring
+            self._report = None
+            self._generation += 1
+
+
+def _report_stamp():
+    """
+    Return a value that changes when the running config or the nameservers
+    change, or None if they were modified too recently to tell.
+    """
+    return fileutils.stat_stamp((os.path.join(CONF_RUN_DIR, NETCONF_NETS),
+                                 dns.DNS_CONF_FILE))
+
+
+_report_cache = _ReportCache()
+
+
 class NetInfo(object):
     def __init__(self, _netinfo):
         self.networks = _netinfo['networks']
@@ -35,6 +35,7 @@ from __future__ import division
 
 from ctypes import CDLL, CFUNCTYPE, sizeof, get_errno, byref
 from ctypes import c_char, c_char_p, c_int, c_void_p, c_size_t, py_object
+from ctypes import c_uint64
 
 from vdsm.common.cache import memoized
 from vdsm.network import py2to3
@@ -144,6 +145,18 @@ class IfaceStatus(object):
     IFF_ECHO = 1 << 18
 
 
+# include/netlink/route/link.h
+class RtnlLinkStat(object):
+    RTNL_LINK_RX_PACKETS = 0
+    RTNL_LINK_TX_PACKETS = 1
+    RTNL_LINK_RX_BYTES = 2
+    RTNL_LINK_TX_BYTES = 3
+    RTNL_LINK_RX_ERRORS = 4
+    RTNL_LINK_TX_ERRORS = 5
+    RTNL_LINK_RX_DROPPED = 6
+    RTNL_LINK_TX_DROPPED = 7
+
+
 # include/netlink/handlers.h
 class NlCbAction(object):
     NL_OK = 0  # Proceed with whatever would come next
@@ -765,6 +778,19 @@ def rtnl_link_get_qdisc(link):
     return py2to3.to_str(qdisc) if qdisc else None
 
 
+def rtnl_link_get_stat(link, stat_id):
+    """Return statistical counter of link object.
+
+    @arg link            Link object
+    @arg stat_id         Counter ID, one of RtnlLinkStat
+
+    @return Value of the counter, or 0 if not reported by the kernel.
+    """
+    _rtnl_link_get_stat = _libnl_route(
+        'rtnl_link_get_stat', c_uint64, c_void_p, c_int)
+    return _rtnl_link_get_stat(link, stat_id)
+
+
 def rtnl_link_get_by_name(cache, name):
     """Lookup link in cache by link name
 
@@ -28,6 +28,16 @@ from . import _pool
 from . import libnl
 
 
+_LINK_STATS = (
+    ('rx_bytes', libnl.RtnlLinkStat.RTNL_LINK_RX_BYTES),
+    ('tx_bytes', libnl.RtnlLinkStat.RTNL_LINK_TX_BYTES),
+    ('rx_dropped', libnl.RtnlLinkStat.RTNL_LINK_RX_DROPPED),
+    ('tx_dropped', libnl.RtnlLinkStat.RTNL_LINK_TX_DROPPED),
+    ('rx_errors', libnl.RtnlLinkStat.RTNL_LINK_RX_ERRORS),
+    ('tx_errors', libnl.RtnlLinkStat.RTNL_LINK_TX_ERRORS),
+)
+
+
 def get_link(name):
     """Returns the information dictionary of the name specified link."""
     with _pool.socket() as sock:
@@ -39,14 +49,18 @@ def get_link(name):
         return link_info
 
 
-def iter_links():
+def iter_links(stats=False):
     """Generator that yields an information dictionary for each link of the
-    system."""
+    system. If stats is True, the dictionary includes the link counters
+    under the 'stats' key, named as in /sys/class/net/<link>/statistics."""
     with _pool.socket() as sock:
         with _nl_link_cache(sock) as cache:
             link = libnl.nl_cache_get_first(cache)
             while link:
-                yield _link_info(link, cache=cache)
+                info = _link_info(link, cache=cache)
+                if stats:
+                    info['stats'] = _link_stats(link)
+                yield info
                 link = libnl.nl_cache_get_next(link)
 
 
@@ -105,6 +119,12 @@ def _link_info(link, cache=None):
     return info
 
 
+def _link_stats(link):
+    """Returns a dictionary with the counters of the link object."""
+    return {name: libnl.rtnl_link_get_stat(link, stat_id)
+            for name, stat_id in _LINK_STATS}
+
+
 def _link_index_to_name(link_index, cache=None):
     """Returns the textual name of the link with index equal to link_index."""
     if cache is None:
@@ -205,6 +205,53 @@ class Monitor(object):
         self._scan_thread.join()
 
 
+class Watcher(object):
+    """
+    Watch netlink events in a background thread, for keeping caches up to
+    date.
+
+    on_event(event) is called for every event. on_monitoring(True) is called
+    when events start to be monitored, and on_monitoring(False) when
+    monitoring fails. Events may be missed when not monitoring, so a cache
+    should not keep values at that time.
+
+    The thread is started by start(), and started again by the next start()
+    call after monitoring failed.
+    """
+
+    def __init__(self, groups, on_event, on_monitoring,
+                 name="netlink/watcher"):
+        self._groups = groups
+        self._on_event = on_event
+        self._on_monitoring = on_monitoring
+        self._name = name
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        t = concurrent.thread(self._run, name=self._name)
+        t.start()
+
+    def _run(self):
+        try:
+            mon = Monitor(groups=self._groups)
+            mon.start()
+            self._on_monitoring(True)
+            for event in mon:
+                self._on_event(event)
+        except Exception:
+            logging.exception("Error monitoring netlink events %s",
+                              self._groups)
+        finally:
+            self._on_monitoring(False)
+            with self._lock:
+                self._running = False
+
+
 def _object_input(obj, queue):
     """This function serves as a callback for nl_msg_parse(message, callback,
     extra_argument) function. When nl_msg_parse() is called, it passes message
@@ -44,6 +44,7 @@ from vdsm.network.link import bond
 from vdsm.network.link.setup import SetupBonds
 from vdsm.network.netinfo import bridges
 from vdsm.network.netinfo.cache import (get as netinfo_get,
+                                        get_cached as netinfo_get_cached,
                                         CachingNetInfo, NetInfo)
 from vdsm.network.netinfo.cache import get_net_iface_from_config
 
@@ -316,15 +317,23 @@ def _gather_ovs_ifaces(nets2add, bonds2add, bonds2edit):
 
 
 def netcaps(compatibility):
-    net_caps = netinfo(compatibility=compatibility)
+    net_caps = netinfo(compatibility=compatibility, cached=True)
     _add_speed_device_info(net_caps)
     _add_bridge_opts(net_caps)
     return net_caps
 
 
-def netinfo(vdsmnets=None, compatibility=None):
+def netinfo(vdsmnets=None, compatibility=None, cached=False):
+    """
+    Return the networking report. If cached is True, use the report cached
+    by the netinfo cache, rebuilt only when the system changes; vdsmnets
+    cannot be used with it.
+    """
     # TODO: Version requests by engine to ease handling of compatibility.
-    _netinfo = netinfo_get(vdsmnets, compatibility)
+    if cached:
+        _netinfo = netinfo_get_cached(compatibility)
+    else:
+        _netinfo = netinfo_get(vdsmnets, compatibility)
 
     if _is_ovs_service_running():
         try:
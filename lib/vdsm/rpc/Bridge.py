@@ -403,6 +403,7 @@ command_info = {
     'VM_getIoTune': {'ret': 'ioTuneList'},
     'VM_getIoTunePolicy': {'ret': 'ioTunePolicyList'},
     'VM_getStats': {'ret': 'statsList'},
+    'VM_getStatsHistory': {'ret': 'statsHistory'},
     'VM_hotplugDisk': {'ret': 'vmList'},
     'VM_hotplugLease': {'ret': 'vmList'},
     'VM_hotplugNic': {'ret': 'vmList'},
@@ -16,7 +16,6 @@
 
 from __future__ import absolute_import
 from __future__ import division
-import functools
 import logging
 
 from yajsonrpc import JsonRpcServer
@@ -32,21 +31,30 @@ _TIMEOUT = config.getint('rpc', 'worker_timeout')
 _THREADS = config.getint('rpc', 'worker_threads')
 _TASK_PER_WORKER = config.getint('rpc', 'tasks_per_worker')
 _TASKS = _THREADS * _TASK_PER_WORKER
+_FAST_THREADS = config.getint('rpc', 'fast_worker_threads')
+_FAST_METHODS = frozenset(
+    m.strip() for m in config.get('rpc', 'fast_methods').split(',')
+    if m.strip())
+
+# Task class for methods which should not wait for slow methods.
+_FAST = "fast"
 
 
 class BindingJsonRpc(object):
     log = logging.getLogger('BindingJsonRpc')
 
     def __init__(self, bridge, subs, timeout, scheduler, cif):
+        task_classes = []
+        if _FAST_THREADS > 0:
+            task_classes.append(executor.TaskClass(
+                _FAST, _FAST_THREADS, _FAST_THREADS * _TASK_PER_WORKER))
         self._executor = executor.Executor(name="jsonrpc",
                                            workers_count=_THREADS,
                                            max_tasks=_TASKS,
-                                           scheduler=scheduler)
+                                           scheduler=scheduler,
+                                           task_classes=task_classes)
         self._bridge = bridge
-        self._server = JsonRpcServer(
-            bridge, timeout, cif,
-            functools.partial(self._executor.dispatch,
-                              timeout=_TIMEOUT, discard=False))
+        self._server = JsonRpcServer(bridge, timeout, cif, self._dispatch)
         self._reactor = StompReactor(subs)
         self.startReactor()
 
@@ -56,6 +64,18 @@ class BindingJsonRpc(object):
     def _onAccept(self, client):
         client.set_message_handler(self._server.queueRequest)
 
+    def _dispatch(self, task):
+        if _FAST_THREADS > 0 and task.method in _FAST_METHODS:
+            task_class = _FAST
+        else:
+            task_class = executor.DEFAULT
+        self._executor.dispatch(task, timeout=_TIMEOUT, discard=False,
+                                task_class=task_class)
+
+    @property
+    def executor(self):
+        return self._executor
+
     @property
     def reactor(self):
         return self._reactor
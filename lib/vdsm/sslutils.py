@@ -61,6 +61,26 @@ class SSLSocket(object):
         return result
     recv = read
 
+    def recv_into(self, buffer, nbytes=0, flags=0):
+        """
+        Read data into buffer, returning the number of bytes read, or None if
+        no data is available. Data peeked by read() is returned first.
+        """
+        if nbytes == 0:
+            nbytes = len(buffer)
+        if self._data:
+            n = min(nbytes, len(self._data))
+            buffer[:n] = self._data[:n]
+            self._data = self._data[n:]
+            return n
+        try:
+            return self.sock.recv_into(buffer, nbytes)
+        except SSLError as e:
+            # pylint: disable=no-member
+            if e.errno != ssl.SSL_ERROR_WANT_READ:
+                raise
+        return None
+
     def pending(self):
         pending = self.sock.pending()
         if self._data:
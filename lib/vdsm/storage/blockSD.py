@@ -57,10 +57,12 @@ from vdsm.storage import multipath
 from vdsm.storage import resourceFactories
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import sd
+from vdsm.storage import volumegraph
 from vdsm.storage.compat import sanlock
 from vdsm.storage.mailbox import MAILBOX_SIZE
 from vdsm.storage.persistent import PersistentDict, DictValidator
 from vdsm.storage.sdm import volume_artifacts
+from vdsm.storage.volumemetadata import VolumeMetadata
 
 import vdsm.common.supervdsm as svdsm
 
@@ -410,6 +412,11 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
         # BlockStorageDomain. The lock should not be used elsewhere.
         self.metadata_lock = threading.Lock()
 
+        # The metadata volume is kept open by read_metadata_block(), and
+        # closed by close_metadata_volume() before the volume is deactivated.
+        self._metadata_file = None
+        self._metadata_file_lock = threading.Lock()
+
         try:
             self.logBlkSize = self.getMetaParam(DMDK_LOGBLKSIZE)
             self.phyBlkSize = self.getMetaParam(DMDK_PHYBLKSIZE)
@@ -616,6 +623,7 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
             lvm.extendVG(self.sdUUID, devlist, force)
             self.updateMapping()
             newsize = self.metaSize(self.sdUUID)
+            self.close_metadata_volume()
             lvm.extendLV(self.sdUUID, sd.METADATA, newsize)
 
     def resizePV(self, guid):
@@ -623,6 +631,7 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
             lvm.resizePV(self.sdUUID, guid)
             self.updateMapping()
             newsize = self.metaSize(self.sdUUID)
+            self.close_metadata_volume()
             lvm.extendLV(self.sdUUID, sd.METADATA, newsize)
 
     def movePV(self, src_device, dst_devices):
@@ -697,6 +706,8 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
                       "failing Image %s %s operation for vols: %s. %s",
                       sdUUID, imgUUID, opTag, volUUIDs, e)
             raise
+        finally:
+            self.invalidate_volume_graph()
 
     def _rmDCVolLinks(self, imgPath, volsImgs):
         for vol in volsImgs:
@@ -809,6 +820,7 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
                 os.symlink(src, dst)
 
     def refresh(self):
+        self.close_metadata_volume()
         self.refreshDirTree()
         lvm.invalidateVG(self.sdUUID)
         self.replaceMetadata(selectMetadata(self.sdUUID))
@@ -956,6 +968,110 @@ class BlockStorageDomainManifest(sd.StorageDomainManifest):
     def metadata_volume_path(self):
         return lvm.lvPath(self.sdUUID, sd.METADATA)
 
+    def read_metadata_block(self, offset, size):
+        """
+        Read (direct IO) size bytes at offset from the metadata volume,
+        returning a list of lines.
+
+        The metadata volume is opened on the first read and kept open, so
+        reading the metadata of many volumes does not open the device for
+        every read. On errors the volume is closed and opened again on the
+        next read.
+        """
+        data = self._read_metadata_volume(offset, size)
+        return data.splitlines()
+
+    def read_volumes_metadata(self):
+        """
+        Read the metadata of all volumes in the domain using one direct read
+        of the area holding the volumes metadata slots.
+
+        Returns dict {volUUID: VolumeMetadata}. Volumes without a metadata
+        slot tag or with invalid metadata are logged and skipped.
+        """
+        slots = {}
+        special_lvs = self.special_volumes(self.getVersion())
+        for lv in lvm.getLV(self.sdUUID):
+            if lv.name in special_lvs:
+                continue
+            for tag in lv.tags:
+                if tag.startswith(sc.TAG_PREFIX_MD):
+                    slots[lv.name] = int(tag[len(sc.TAG_PREFIX_MD):])
+                    break
+            else:
+                self.log.warning("Could not find mapping for lv %s/%s",
+                                 self.sdUUID, lv.name)
+
+        if not slots:
+            return {}
+
+        first = min(six.itervalues(slots))
+        last = max(six.itervalues(slots))
+        data = self._read_metadata_volume(
+            first * sc.METADATA_SIZE,
+            (last - first + 1) * sc.METADATA_SIZE)
+
+        res = {}
+        for vol_id, slot in six.iteritems(slots):
+            start = (slot - first) * sc.METADATA_SIZE
+            lines = data[start:start + sc.METADATA_SIZE].splitlines()
+            try:
+                res[vol_id] = VolumeMetadata.from_lines(lines)
+            except se.MetaDataKeyNotFoundError as e:
+                self.log.warning("Invalid metadata for volume %s/%s: %s",
+                                 self.sdUUID, vol_id, e)
+        return res
+
+    def _make_volume_graph(self):
+        # The parent LV tag is not updated after a live merge on an HSM host,
+        # so take the parents from the volumes metadata, read in one I/O.
+        volumes_md = self.read_volumes_metadata()
+        volumes = dict(
+            (vol_id, sd.ImgsPar(ip.imgs, volumes_md[vol_id].puuid)
+             if vol_id in volumes_md else ip)
+            for vol_id, ip in six.iteritems(self.getAllVolumes()))
+        return volumegraph.VolumeGraph(volumes)
+
+    def _read_metadata_volume(self, offset, size):
+        path = self.metadata_volume_path()
+        with self._metadata_file_lock:
+            try:
+                if (self._metadata_file is not None and
+                        offset + size > self._metadata_file_size()):
+                    # The metadata volume was extended on the SPM. Close it
+                    # before refreshing, and read from the refreshed volume.
+                    self._close_metadata_file()
+                    lvm.refreshLVs(self.sdUUID, [sd.METADATA])
+                if self._metadata_file is None:
+                    self._metadata_file = directio.DirectFile(path, "r")
+                data = self._metadata_file.pread(offset, size)
+            except (OSError, IOError) as e:
+                self.log.error("Error reading %s: %s", path, e)
+                self._close_metadata_file()
+                raise se.MiscBlockReadException(path, offset, size)
+
+        if len(data) < size:
+            raise se.MiscBlockReadIncomplete(path, offset, size)
+
+        return data
+
+    def close_metadata_volume(self):
+        """
+        Close the metadata volume opened by read_metadata_block(). Must be
+        called before deactivating, refreshing or extending the metadata
+        volume.
+        """
+        with self._metadata_file_lock:
+            self._close_metadata_file()
+
+    def _close_metadata_file(self):
+        if self._metadata_file is not None:
+            self._metadata_file.close()
+            self._metadata_file = None
+
+    def _metadata_file_size(self):
+        return os.lseek(self._metadata_file.fileno(), 0, os.SEEK_END)
+
 
 class BlockStorageDomain(sd.StorageDomain):
     manifestClass = BlockStorageDomainManifest
@@ -1205,6 +1321,9 @@ class BlockStorageDomain(sd.StorageDomain):
             # log any other exception, but keep going
             self.log.error("Unexpected error", exc_info=True)
 
+        # The metadata volume cannot be deactivated while it is open.
+        self._manifest.close_metadata_volume()
+
         # FIXME: remove this and make sure nothing breaks
         try:
             lvm.deactivateVG(self.sdUUID)
@@ -1276,7 +1395,7 @@ class BlockStorageDomain(sd.StorageDomain):
     def getStats(self):
         """
         """
-        vg = lvm.getVG(self.sdUUID)
+        vg = lvm.getVG(self.sdUUID, stale_ok=True)
         vgMetadataStatus = metadataValidity(vg)
         return dict(disktotal=vg.size, diskfree=vg.free,
                     mdasize=vg.vg_mda_size, mdafree=vg.vg_mda_free,
@@ -32,7 +32,6 @@ from vdsm.storage import constants as sc
 from vdsm.storage import directio
 from vdsm.storage import exception as se
 from vdsm.storage import lvm
-from vdsm.storage import misc
 from vdsm.storage import qemuimg
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import task
@@ -103,9 +102,8 @@ class BlockVolumeManifest(volume.VolumeManifest):
         _, offs = metaId
         sd = sdCache.produce_manifest(self.sdUUID)
         try:
-            lines = misc.readblock(sd.metadata_volume_path(),
-                                   offs * sc.METADATA_SIZE,
-                                   sc.METADATA_SIZE)
+            lines = sd.read_metadata_block(offs * sc.METADATA_SIZE,
+                                           sc.METADATA_SIZE)
         except Exception as e:
             self.log.error(e, exc_info=True)
             raise se.VolumeMetadataReadError("%s: %s" % (metaId, e))
@@ -261,6 +259,7 @@ class BlockVolumeManifest(volume.VolumeManifest):
         newTag = tagPrefix + uuid
         if oldTag != newTag:
             lvm.replaceLVTag(self.sdUUID, self.volUUID, oldTag, newTag)
+            sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
 
     def setParentMeta(self, puuid):
         """
@@ -269,6 +268,7 @@ class BlockVolumeManifest(volume.VolumeManifest):
         using the volume.
         """
         self.setMetaParam(sc.PUUID, puuid)
+        sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
 
     def setParentTag(self, puuid):
         """
@@ -575,7 +575,7 @@ class BlockVolume(volume.Volume):
         # File domains do not have this complexity because the metadata is
         # stored in only one place and that metadata is updated by the HSM
         # host when the live merge finishes.
-        sync = False
+        staleTags = []
         for childID in self.getChildren():
             child = BlockVolume(self.repoPath, self.sdUUID, self.imgUUID,
                                 childID)
@@ -585,9 +585,14 @@ class BlockVolume(volume.Volume):
                 self.log.debug("Updating stale PUUID LV tag from %s to %s for "
                                "volume %s", tagParent, metaParent,
                                child.volUUID)
-                child.setParentTag(metaParent)
-                sync = True
-        if sync:
+                staleTags.append((child.volUUID,
+                                  (sc.TAG_PREFIX_PARENT + tagParent,),
+                                  (sc.TAG_PREFIX_PARENT + metaParent,)))
+        if staleTags:
+            # Children of the same volume have the same stale tag, so they
+            # are usually fixed by one lvchange command.
+            lvm.changeLVsTags(self.sdUUID, staleTags)
+            sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
             self.recheckIfLeaf()
 
         if not force:
@@ -727,6 +732,7 @@ class BlockVolume(volume.Volume):
         metadataId = self.getMetadataId()
 
         lvm.renameLV(self.sdUUID, self.volUUID, newUUID)
+        sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
 
         self.renameLease(metadataId, newUUID, recovery=recovery)
 
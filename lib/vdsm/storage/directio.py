@@ -35,6 +35,11 @@ CharPointer = ctypes.POINTER(ctypes.c_char)
 _PC_REC_XFER_ALIGN = 17
 _PC_REC_MIN_XFER_SIZE = 16
 
+_pread = libc.pread64
+_pread.argtypes = (ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t,
+                   ctypes.c_int64)
+_pread.restype = ctypes.c_ssize_t
+
 
 class DirectFile(object):
 
@@ -63,6 +68,9 @@ class DirectFile(object):
         self._mode = mode
         self._fd = os.open(path, flags)
         self._closed = False
+        # Aligned buffer reused by pread().
+        self._buf = None
+        self._bufsize = 0
 
     def __enter__(self):
         return self
@@ -136,6 +144,45 @@ class DirectFile(object):
             ptr = CharPointer.from_buffer(pbuff)
             return ptr[:numRead]
 
+    def pread(self, offset, size):
+        """
+        Read up to size bytes at offset, without changing the file position.
+
+        The read is done into an aligned buffer kept by the file, so
+        repeated reads of the same or smaller size do not allocate memory.
+        Returns less than size bytes only at the end of the file.
+        """
+        if offset % 512 or size % 512:
+            raise ValueError("You can only read in 512 multiplies")
+
+        buf = self._alignedBuffer(size)
+        numRead = _pread(self._fd, buf, size, offset)
+        if numRead < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        return ctypes.string_at(buf, numRead)
+
+    def _alignedBuffer(self, size):
+        if size > self._bufsize:
+            self._freeBuffer()
+            buf = ctypes.c_void_p()
+            # Page alignment is good for any device, and fpathconf() may fail
+            # for block devices.
+            alignment = max(
+                libc.fpathconf(self.fileno(), _PC_REC_XFER_ALIGN), 4096)
+            rc = libc.posix_memalign(ctypes.byref(buf), alignment, size)
+            if rc:
+                raise OSError(rc, "Could not allocate aligned buffer")
+            self._buf = buf
+            self._bufsize = size
+        return self._buf
+
+    def _freeBuffer(self):
+        if self._buf is not None:
+            libc.free(self._buf)
+            self._buf = None
+            self._bufsize = 0
+
     def readall(self):
         buffsize = 1024
         res = io.BytesIO()
@@ -169,6 +216,7 @@ class DirectFile(object):
 
         os.close(self._fd)
         self._closed = True
+        self._freeBuffer()
 
     def __del__(self):
         if not hasattr(self, "_fd"):
@@ -295,18 +295,13 @@ class FileStorageDomainManifest(sd.StorageDomainManifest):
         Template volumes have no parent, and thus we report BLANK_UUID as their
         parentUUID.
         """
-        volMetaPattern = os.path.join(glob_escape(self.mountpoint),
-                                      self.sdUUID,
-                                      sd.DOMAIN_IMAGES, "*", "*.meta")
-        volMetaPaths = self.oop.glob.glob(volMetaPattern)
-
         # First create mapping from images to volumes
         images = collections.defaultdict(list)
-        for metaPath in volMetaPaths:
-            head, tail = os.path.split(metaPath)
-            volUUID, volExt = os.path.splitext(tail)
-            imgUUID = os.path.basename(head)
-            images[imgUUID].append(volUUID)
+        for imgUUID, names in self.getImagesInventory().iteritems():
+            for name in names:
+                volUUID, volExt = os.path.splitext(name)
+                if volExt == fileVolume.META_FILEEXT:
+                    images[imgUUID].append(volUUID)
 
         # Using images to volumes mapping, we can create volumes to images
         # mapping, detecting template volumes and template images, based on
@@ -346,16 +341,36 @@ class FileStorageDomainManifest(sd.StorageDomainManifest):
         """
         Fetch the set of the Image UUIDs in the SD.
         """
-        # Get Volumes of an image
-        pattern = os.path.join(self.mountpoint, self.sdUUID, sd.DOMAIN_IMAGES,
-                               UUID_GLOB_PATTERN)
-        files = self.oop.glob.glob(pattern)
-        images = set()
-        for i in files:
-            if self.oop.os.path.isdir(i):
-                images.add(os.path.basename(i))
+        inventory = self.getImagesInventory()
+        images = set(fnmatch.filter(inventory, UUID_GLOB_PATTERN))
+
+        # Image directories without files are not in the inventory. Checking
+        # only the entries not in the inventory avoids an out of process call
+        # per image.
+        pattern = os.path.join(glob_escape(self.mountpoint), self.sdUUID,
+                               sd.DOMAIN_IMAGES, UUID_GLOB_PATTERN)
+        for path in self.oop.glob.glob(pattern):
+            imgUUID = os.path.basename(path)
+            if imgUUID not in images and self.oop.os.path.isdir(path):
+                images.add(imgUUID)
+
         return images
 
+    def getImagesInventory(self):
+        """
+        Return dict {imgUUID: [filename, ...]} of the files in all the
+        domain images directories, using one out of process call for the
+        entire images tree. Image directories without files are not
+        included.
+        """
+        pattern = os.path.join(glob_escape(self.mountpoint), self.sdUUID,
+                               sd.DOMAIN_IMAGES, "*", "*")
+        inventory = collections.defaultdict(list)
+        for path in self.oop.glob.glob(pattern):
+            head, name = os.path.split(path)
+            inventory[os.path.basename(head)].append(name)
+        return inventory
+
     def getVolumeLease(self, imgUUID, volUUID):
         """
         Return the volume lease (leasePath, leaseOffset)
@@ -535,6 +535,8 @@ class FileVolume(volume.Volume):
             eFound = e
             self.log.error("cannot remove volume's %s metadata",
                            self.volUUID, exc_info=True)
+        finally:
+            sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
 
         raise eFound
 
@@ -553,6 +555,7 @@ class FileVolume(volume.Volume):
         using the volume.
         """
         self.setMetaParam(sc.PUUID, puuid)
+        sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
 
     def setParentTag(self, puuid):
         """
@@ -600,6 +603,7 @@ class FileVolume(volume.Volume):
                                                  [metaPath, prevMetaPath]))
         self.log.info("Renaming %s to %s", prevMetaPath, metaPath)
         self.oop.os.rename(prevMetaPath, metaPath)
+        sdCache.produce_manifest(self.sdUUID).invalidate_volume_graph()
         if recovery:
             name = "Rename lease-volume rollback: " + leasePath
             vars.task.pushRecovery(task.Recovery(name, "fileVolume",
@@ -63,6 +63,7 @@ from vdsm.storage import localFsSD
 from vdsm.storage import lvm
 from vdsm.storage import merge
 from vdsm.storage import mpathhealth
+from vdsm.storage import mpathinventory
 from vdsm.storage import misc
 from vdsm.storage import monitor
 from vdsm.storage import mount
@@ -399,6 +400,8 @@ class HSM(object):
         self.multipathListener = udev.MultipathListener()
         self.mpathhealth_monitor = mpathhealth.Monitor()
         self.multipathListener.register(self.mpathhealth_monitor)
+        self.mpath_inventory = mpathinventory.Monitor()
+        self.multipathListener.register(self.mpath_inventory)
         self.multipathListener.start()
 
         def storageRefresh():
@@ -1993,8 +1996,7 @@ class HSM(object):
         devices = []
         pvs = {os.path.basename(pv.name): pv for pv in lvm.getAllPVs()}
 
-        # FIXME: pathListIter() should not return empty records
-        for dev in multipath.pathListIter(guids):
+        for dev in self.mpath_inventory.devices(guids):
             if not typeFilter(dev):
                 continue
 
@@ -2879,7 +2881,7 @@ class HSM(object):
             vgGuids[vg.uuid] = i
 
         pathDict = {}
-        for dev in multipath.pathListIter(devNames):
+        for dev in self.mpath_inventory.devices(devNames):
             pathDict[dev["guid"]] = dev
 
         self.__processVGInfos(vgInfos, pathDict, getGuid)
@@ -3531,6 +3533,17 @@ class HSM(object):
     def multipath_health(self):
         return self.mpathhealth_monitor.status()
 
+    @public
+    def mailbox_latency(self):
+        """
+        Return histogram info of extend requests round trip time using the
+        pool mailbox, or an empty dict if there is no pool mailbox.
+        """
+        pool = self._pool
+        if not pool.is_connected() or pool.hsmMailer is None:
+            return {}
+        return pool.hsmMailer.latency()
+
     @deprecated
     @public
     def startMonitoringDomain(self, sdUUID, hostID, options=None):
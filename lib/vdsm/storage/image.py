@@ -180,7 +180,12 @@ class Image:
         (not including a shared base (template) if any)
         """
         chain = []
-        volclass = sdCache.produce(sdUUID).getVolumeClass()
+        dom = sdCache.produce(sdUUID)
+        volclass = dom.getVolumeClass()
+
+        graphChain = self._getGraphChain(dom, sdUUID, imgUUID, volUUID)
+        if graphChain:
+            return graphChain
 
         # Use volUUID when provided
         if volUUID:
@@ -241,6 +246,50 @@ class Image:
 
         return chain
 
+    def _getGraphChain(self, dom, sdUUID, imgUUID, volUUID):
+        """
+        Return the chain of image using the domain volume graph, or None if
+        the graph cannot build it.
+
+        The graph is invalidated only by changes made on this host, so it may
+        miss volumes created, merged or removed by other hosts. The chain is
+        validated using the volumes metadata, which all hosts see. If the
+        validation fails the graph is built again once, and if the new graph
+        does not match either, the caller falls back to reading the image
+        volumes.
+
+        This still reads the parent of every volume in the chain, but avoids
+        listing the image volumes and checking which one is the leaf.
+        """
+        volclass = dom.getVolumeClass()
+        for _ in range(2):
+            graph = dom.volume_graph()
+            try:
+                uuids = graph.chain(imgUUID, volUUID)
+                chain = [volclass(self.repoPath, sdUUID, imgUUID, uuid)
+                         for uuid in uuids]
+                if chain and self._isGraphChainValid(graph, chain, volUUID):
+                    return chain
+            except (KeyError, se.StorageException) as e:
+                self.log.warning("Cannot get chain of image %s from domain %s "
+                                 "volume graph: %s", imgUUID, sdUUID, e)
+            else:
+                self.log.warning("Stale chain of image %s in domain %s "
+                                 "volume graph", imgUUID, sdUUID)
+            dom.invalidate_volume_graph()
+        return None
+
+    def _isGraphChainValid(self, graph, chain, volUUID):
+        # Volumes created by other hosts are not in the graph.
+        top = chain[-1]
+        if volUUID is None and not (top.isLeaf() or top.isShared()):
+            return False
+        # Volumes merged by other hosts change the parents.
+        for vol in chain:
+            if vol.getParent() != graph.parent(vol.volUUID):
+                return False
+        return True
+
     def getTemplate(self, sdUUID, imgUUID):
         """
         Return template of the image
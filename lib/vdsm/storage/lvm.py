@@ -35,14 +35,20 @@ import glob
 import grp
 import logging
 from collections import namedtuple
+from collections import OrderedDict
 import pprint as pp
 import threading
 from itertools import chain
 from subprocess import list2cmdline
 
+import six
+
 from vdsm import constants
+from vdsm.common import concurrent
+from vdsm.common.time import monotonic_time
 from vdsm.storage import devicemapper
 from vdsm.storage import exception as se
+from vdsm.storage import lvmshell
 from vdsm.storage import misc
 from vdsm.storage import multipath
 from vdsm.storage.constants import VG_EXTENT_SIZE_MB, SUPPORTED_BLOCKSIZE
@@ -54,7 +60,7 @@ log = logging.getLogger("storage.LVM")
 PV_FIELDS = ("uuid,name,size,vg_name,vg_uuid,pe_start,pe_count,"
              "pe_alloc_count,mda_count,dev_size,mda_used_count")
 VG_FIELDS = ("uuid,name,attr,size,free,extent_size,extent_count,free_count,"
-             "tags,vg_mda_size,vg_mda_free,lv_count,pv_count,pv_name")
+             "tags,vg_mda_size,vg_mda_free,lv_count,pv_count,seqno,pv_name")
 LV_FIELDS = "uuid,name,vg_name,attr,size,seg_start_pe,devices,tags"
 
 VG_ATTR_BITS = ("permission", "resizeable", "exported",
@@ -96,7 +102,9 @@ re_pvName = re.compile(PV_PREFIX + '[^\s\"]+', re.MULTILINE)
 
 PVS_CMD = ("pvs",) + LVM_FLAGS + ("-o", PV_FIELDS)
 VGS_CMD = ("vgs",) + LVM_FLAGS + ("-o", VG_FIELDS)
-LVS_CMD = ("lvs",) + LVM_FLAGS + ("-o", LV_FIELDS)
+# The VG metadata sequence number is reported after the LV fields, for
+# detecting VG metadata changes, see LVMCache._validatelvs().
+LVS_CMD = ("lvs",) + LVM_FLAGS + ("-o", LV_FIELDS + ",vg_seqno")
 
 # FIXME we must use different METADATA_USER ownership for qemu-unreadable
 # metadata volumes
@@ -150,6 +158,35 @@ def _buildConfig(devList):
     return conf.replace("\n", " ")
 
 
+def _shellArgs(cmd):
+    """
+    Convert lvm command created by LVMCache._addExtraCfg() to lvm shell
+    arguments, reporting the command status in json format.
+
+    The lvm shell does not support escaping, so we use single quotes in the
+    configuration, and the shell quotes it with double quotes.
+    """
+    args = list(cmd[1:])
+    i = args.index("--config")
+    conf = args[i + 1] + " " + lvmshell.LOG_CONFIG
+    args[i + 1] = conf.replace('"', "'")
+    args.extend(("--reportformat", "json"))
+    return args
+
+
+def _reportLines(report):
+    """
+    Convert lvm json report to output lines in the format used by LVM_FLAGS,
+    so we can parse the output in the same way.
+    """
+    lines = []
+    for section in report.get("report", ()):
+        for rows in section.values():
+            for row in rows:
+                lines.append(SEPARATOR.join(row.values()))
+    return lines
+
+
 def _updateLvmConf(conf):
     # Make a convenience copy for the debugging purposes
     try:
@@ -173,7 +210,7 @@ def _updateLvmConf(conf):
 def _normalizeargs(args=None):
     if args is None:
         args = []
-    elif not hasattr(args, "__iter__"):
+    elif isinstance(args, six.string_types) or not hasattr(args, "__iter__"):
         args = [args]
 
     return args
@@ -231,9 +268,27 @@ def makeLV(*args):
     return LV(*args)
 
 
+def _parseLV(line):
+    """
+    Parse lvs output line, returning the LV and the VG seqno.
+    """
+    fields = [field.strip() for field in line.split(SEPARATOR)]
+    seqno = fields.pop()
+    return makeLV(*fields), seqno
+
+
 class LVMCache(object):
     """
     Keep all the LVM information.
+
+    When the cache is invalidated, the LVs are kept with the VG metadata
+    sequence number (seqno) seen when they were loaded. The LVs of a VG are
+    reloaded only if the VG seqno changed. Changes that do not modify the VG
+    metadata, like activating a LV, must invalidate the LVs explicitly.
+
+    Readers that can use stale data (stale_ok=True) get the LVs and VGs
+    loaded before the cache was invalidated, while a single background
+    thread refreshes the cache.
     """
 
     def _getCachedExtraCfg(self):
@@ -282,6 +337,18 @@ class LVMCache(object):
         self._pvs = {}
         self._vgs = {}
         self._lvs = {}
+        # VGs dropped by the last invalidation, for stale_ok readers.
+        self._vgsSnapshot = {}
+        # VG seqno when the VG LVs were loaded.
+        self._lvsSeqno = {}
+        # VGs whose LVs are known to be up to date since the last
+        # invalidation.
+        self._lvsValid = set()
+        self._refreshing = False
+        if config.getboolean("irs", "lvm_shell"):
+            self._shell = lvmshell.LVMShell()
+        else:
+            self._shell = None
 
     def cmd(self, cmd, devices=tuple()):
         finalCmd = self._addExtraCfg(cmd, devices)
@@ -299,6 +366,37 @@ class LVMCache(object):
 
         return rc, out, err
 
+    def report(self, cmd, devices=tuple()):
+        """
+        Run lvm reporting command (pvs, vgs, lvs) using the lvm shell if
+        enabled. If the shell is busy or failed, run the command using a new
+        lvm process.
+        """
+        if self._shell is not None:
+            try:
+                return self._shellReport(cmd, devices)
+            except lvmshell.Busy:
+                log.debug("lvm shell busy, running lvm command")
+            except lvmshell.Error as e:
+                log.warning("lvm shell failed, running lvm command: %s", e)
+        return self.cmd(cmd, devices)
+
+    def _shellReport(self, cmd, devices):
+        finalCmd = self._addExtraCfg(cmd, devices)
+        rc, out, err = self._shellRun(finalCmd)
+        if rc != 0:
+            # Filter might be stale, see cmd().
+            self.invalidateFilter()
+            newCmd = self._addExtraCfg(cmd)
+            if newCmd != finalCmd:
+                return self._shellRun(newCmd)
+
+        return rc, out, err
+
+    def _shellRun(self, cmd):
+        rc, report, err = self._shell.run(_shellArgs(cmd))
+        return rc, _reportLines(report), err
+
     def __str__(self):
         return ("PVS:\n%s\n\nVGS:\n%s\n\nLVS:\n%s" %
                 (pp.pformat(self._pvs),
@@ -315,7 +413,7 @@ class LVMCache(object):
         pvNames = _normalizeargs(pvName)
         cmd.extend(pvNames)
 
-        rc, out, err = self.cmd(cmd)
+        rc, out, err = self.report(cmd)
 
         with self._lock:
             if rc != 0:
@@ -341,7 +439,7 @@ class LVMCache(object):
                 self._stalepv = False
                 # Remove stalePVs
                 stalePVs = [staleName for staleName in self._pvs.keys()
-                            if staleName not in updatedPVs.iterkeys()]
+                            if staleName not in updatedPVs]
                 for staleName in stalePVs:
                     log.warning("Removing stale PV: %s", staleName)
                     self._pvs.pop((staleName), None)
@@ -368,7 +466,7 @@ class LVMCache(object):
         vgNames = _normalizeargs(vgName)
         cmd.extend(vgNames)
 
-        rc, out, err = self.cmd(cmd, self._getVGDevs(vgNames))
+        rc, out, err = self.report(cmd, self._getVGDevs(vgNames))
 
         with self._lock:
             if rc != 0:
@@ -395,19 +493,21 @@ class LVMCache(object):
                     vgsFields[uuid] = fields
                 else:
                     vgsFields[uuid][pvNameIdx].append(pv_name)
-            for fields in vgsFields.itervalues():
+            for fields in vgsFields.values():
                 vg = makeVG(*fields)
                 if int(vg.pv_count) != len(vg.pv_name):
                     log.error("vg %s has pv_count %s but pv_names %s",
                               vg.name, vg.pv_count, vg.pv_name)
                 self._vgs[vg.name] = vg
                 updatedVGs[vg.name] = vg
+                self._vgsSnapshot.pop(vg.name, None)
             # If we updated all the VGs drop stale flag
             if not vgName:
                 self._stalevg = False
+                self._vgsSnapshot.clear()
                 # Remove stale VGs
                 staleVGs = [staleName for staleName in self._vgs.keys()
-                            if staleName not in updatedVGs.iterkeys()]
+                            if staleName not in updatedVGs]
                 for staleName in staleVGs:
                     removeVgMapping(staleName)
                     log.warning("Removing stale VG: %s", staleName)
@@ -423,7 +523,7 @@ class LVMCache(object):
         else:
             cmd.append(vgName)
 
-        rc, out, err = self.cmd(cmd, self._getVGDevs((vgName,)))
+        rc, out, err = self.report(cmd, self._getVGDevs((vgName,)))
 
         with self._lock:
             if rc != 0:
@@ -436,23 +536,31 @@ class LVMCache(object):
                 return dict(self._lvs)
 
             updatedLVs = {}
+            seqno = None
             for line in out:
-                fields = [field.strip() for field in line.split(SEPARATOR)]
-                lv = makeLV(*fields)
+                lv, seqno = _parseLV(line)
                 # For LV we are only interested in its first extent
                 if lv.seg_start_pe == "0":
                     self._lvs[(lv.vg_name, lv.name)] = lv
                     updatedLVs[(lv.vg_name, lv.name)] = lv
 
+            # If we updated all the LVs in the VG, they are up to date
+            if not lvNames:
+                if seqno is None:
+                    self._lvsSeqno.pop(vgName, None)
+                else:
+                    self._lvsSeqno[vgName] = seqno
+                self._lvsValid.add(vgName)
+
             # Determine if there are stale LVs
             if lvNames:
                 staleLVs = (lvName for lvName in lvNames
-                            if (vgName, lvName) not in updatedLVs.iterkeys())
+                            if (vgName, lvName) not in updatedLVs)
             else:
                 # All the LVs in the VG
-                staleLVs = (lvName for v, lvName in self._lvs.keys()
+                staleLVs = [lvName for v, lvName in self._lvs
                             if (v == vgName) and
-                            ((vgName, lvName) not in updatedLVs.iterkeys()))
+                            ((vgName, lvName) not in updatedLVs)]
 
             for lvName in staleLVs:
                 log.warning("Removing stale lv: %s/%s", vgName, lvName)
@@ -467,25 +575,115 @@ class LVMCache(object):
         Used only during bootstrap.
         """
         cmd = list(LVS_CMD)
-        rc, out, err = self.cmd(cmd)
+        rc, out, err = self.report(cmd)
         if rc == 0:
             updatedLVs = set()
+            seqnos = {}
             for line in out:
-                fields = [field.strip() for field in line.split(SEPARATOR)]
-                lv = makeLV(*fields)
+                lv, seqno = _parseLV(line)
+                seqnos[lv.vg_name] = seqno
                 # For LV we are only interested in its first extent
                 if lv.seg_start_pe == "0":
                     self._lvs[(lv.vg_name, lv.name)] = lv
                     updatedLVs.add((lv.vg_name, lv.name))
 
             # Remove stales
-            for vgName, lvName in self._lvs.keys():
+            for vgName, lvName in list(self._lvs):
                 if (vgName, lvName) not in updatedLVs:
                     self._lvs.pop((vgName, lvName), None)
                     log.error("Removing stale lv: %s/%s", vgName, lvName)
+            self._lvsSeqno = seqnos
+            self._lvsValid = set(seqnos)
             self._stalelv = False
         return dict(self._lvs)
 
+    def _refreshLvs(self):
+        """
+        Reload the LVs after the cache was invalidated, reloading only the
+        LVs of VGs whose seqno changed.
+        """
+        if not self._lvsSeqno:
+            return self._reloadAllLvs()
+
+        vgs = self._reloadvgs()
+        if self._stalevg:
+            # We don't know which VGs changed.
+            return self._reloadAllLvs()
+
+        changed = []
+        with self._lock:
+            for vgName, vg in vgs.items():
+                if isinstance(vg, Stub):
+                    continue
+                if (self._lvsSeqno.get(vgName) == vg.seqno and
+                        not self._hasStubLvs(vgName)):
+                    self._lvsValid.add(vgName)
+                else:
+                    changed.append(vgName)
+
+            # Remove LVs of removed VGs
+            for vgName, lvName in list(self._lvs):
+                if vgName not in vgs:
+                    log.warning("Removing stale lv: %s/%s", vgName, lvName)
+                    self._lvs.pop((vgName, lvName), None)
+                    self._lvsSeqno.pop(vgName, None)
+
+        log.debug("Reloading lvs in changed vgs: %s", changed)
+        for vgName in changed:
+            self._reloadlvs(vgName)
+
+        with self._lock:
+            self._stalelv = not self._lvsValid.issuperset(changed)
+            return dict(self._lvs)
+
+    def _validatelvs(self, vgName):
+        """
+        Return the LVs of vgName after the cache was invalidated, reloading
+        them only if the VG seqno changed.
+        """
+        seqno = self._lvsSeqno.get(vgName)
+        if seqno is not None:
+            vg = self.getVg(vgName)
+            if vg and not isinstance(vg, Stub) and vg.seqno == seqno:
+                with self._lock:
+                    if not self._hasStubLvs(vgName):
+                        self._lvsValid.add(vgName)
+                        return {key: lv for key, lv in self._lvs.items()
+                                if key[0] == vgName}
+
+        return self._reloadlvs(vgName)
+
+    def _hasStubLvs(self, vgName):
+        return any(isinstance(lv, Stub)
+                   for (v, _), lv in self._lvs.items() if v == vgName)
+
+    def _refreshInBackground(self):
+        """
+        Start a thread refreshing the stale VGs and LVs, unless a refresh is
+        already running.
+        """
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            t = concurrent.thread(self._refresh, name="lvm-refresh", log=log)
+            t.start()
+        except:
+            with self._lock:
+                self._refreshing = False
+            raise
+
+    def _refresh(self):
+        try:
+            if self._stalelv:
+                self._refreshLvs()
+            if self._stalevg:
+                self._reloadvgs()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
     def _invalidatepvs(self, pvNames):
         pvNames = _normalizeargs(pvNames)
         with self._lock:
@@ -502,10 +700,14 @@ class LVMCache(object):
         with self._lock:
             for vgName in vgNames:
                 self._vgs[vgName] = Stub(vgName, True)
+                self._vgsSnapshot.pop(vgName, None)
 
     def _invalidateAllVgs(self):
         with self._lock:
             self._stalevg = True
+            self._vgsSnapshot.update(
+                (name, vg) for name, vg in self._vgs.items()
+                if not isinstance(vg, Stub))
             self._vgs.clear()
 
     def _invalidatelvs(self, vgName, lvNames=None):
@@ -524,9 +726,10 @@ class LVMCache(object):
                             self._lvs[(vgName, lv.name)] = Stub(lv.name, True)
 
     def _invalidateAllLvs(self):
+        # Keep the LVs, so we can reload only the LVs of changed VGs.
         with self._lock:
             self._stalelv = True
-            self._lvs.clear()
+            self._lvsValid.clear()
 
     def flush(self):
         self._invalidateAllPvs()
@@ -547,7 +750,7 @@ class LVMCache(object):
             pvs = self._reloadpvs()
         else:
             pvs = dict(self._pvs)
-            stalepvs = [pv.name for pv in pvs.itervalues()
+            stalepvs = [pv.name for pv in pvs.values()
                         if isinstance(pv, Stub)]
             if stalepvs:
                 reloaded = self._reloadpvs(stalepvs)
@@ -574,10 +777,15 @@ class LVMCache(object):
             pvs.extend(reloadedpvs.values())
         return pvs
 
-    def getVg(self, vgName):
+    def getVg(self, vgName, stale_ok=False):
         # Get specific VG
         vg = self._vgs.get(vgName)
         if not vg or isinstance(vg, Stub):
+            if stale_ok:
+                vg = self._vgsSnapshot.get(vgName)
+                if vg:
+                    self._refreshInBackground()
+                    return vg
             vgs = self._reloadvgs(vgName)
             vg = vgs.get(vgName)
         return vg
@@ -589,7 +797,7 @@ class LVMCache(object):
         Fills the cache but not uses it.
         Only returns found VGs.
         """
-        return [vg for vgName, vg in self._reloadvgs(vgNames).iteritems()
+        return [vg for vgName, vg in self._reloadvgs(vgNames).items()
                 if vgName in vgNames]
 
     def getAllVgs(self):
@@ -598,18 +806,14 @@ class LVMCache(object):
             vgs = self._reloadvgs()
         else:
             vgs = dict(self._vgs)
-            stalevgs = [vg.name for vg in vgs.itervalues()
+            stalevgs = [vg.name for vg in vgs.values()
                         if isinstance(vg, Stub)]
             if stalevgs:
                 reloaded = self._reloadvgs(stalevgs)
                 vgs.update(reloaded)
         return vgs.values()
 
-    def getLv(self, vgName, lvName=None):
-        # Checking self._stalelv here is suboptimal, because
-        # unnecessary reloads
-        # are done.
-
+    def getLv(self, vgName, lvName=None, stale_ok=False):
         # Return vgName/lvName info
         # If both 'vgName' and 'lvName' are None then return everything
         # If only 'lvName' is None then return all the LVs in the given VG
@@ -621,6 +825,14 @@ class LVMCache(object):
             if not lv or isinstance(lv, Stub):
                 # while we here reload all the LVs in the VG
                 lvs = self._reloadlvs(vgName)
+            elif vgName in self._lvsValid:
+                lvs = None
+            elif stale_ok:
+                self._refreshInBackground()
+                lvs = None
+            else:
+                lvs = self._validatelvs(vgName)
+            if lvs is not None:
                 lv = lvs.get((vgName, lvName))
                 if not lv:
                     log.warning("lv: %s not found in lvs vg: %s response",
@@ -628,29 +840,33 @@ class LVMCache(object):
             res = lv
         else:
             # vgName, None
-            # If there any stale LVs reload the whole VG, since it would
-            # cost us around same efforts anyhow and these stale LVs can
-            # be in the vg.
-            # Will be better when the pvs dict will be part of the vg.
-            # Fix me: should not be more stubs
-            if self._stalelv or any(isinstance(lv, Stub)
-                                    for lv in self._lvs.values()):
+            # If there any stale LVs in the VG reload the whole VG, since it
+            # would cost us around same efforts anyhow.
+            if self._hasStubLvs(vgName):
                 lvs = self._reloadlvs(vgName)
-            else:
+            elif vgName in self._lvsValid:
                 lvs = dict(self._lvs)
-            # lvs = self._reloadlvs()
+            elif stale_ok and vgName in self._lvsSeqno:
+                self._refreshInBackground()
+                lvs = dict(self._lvs)
+            else:
+                lvs = self._validatelvs(vgName)
             lvs = [lv for lv in lvs.values()
                    if not isinstance(lv, Stub) and (lv.vg_name == vgName)]
             res = lvs
         return res
 
-    def getAllLvs(self):
+    def getAllLvs(self, stale_ok=False):
         # None, None
-        if self._stalelv or any(isinstance(lv, Stub)
-                                for lv in self._lvs.values()):
+        if any(isinstance(lv, Stub) for lv in self._lvs.values()):
             lvs = self._reloadAllLvs()
-        else:
+        elif not self._stalelv:
+            lvs = dict(self._lvs)
+        elif stale_ok and self._lvs:
+            self._refreshInBackground()
             lvs = dict(self._lvs)
+        else:
+            lvs = self._refreshLvs()
         return lvs.values()
 
 _lvminfo = LVMCache()
@@ -813,23 +1029,64 @@ def changelv(vg, lvs, attrs):
     """
 
     lvs = _normalizeargs(lvs)
-    # If it fails or not we (may be) change the lv,
-    # so we invalidate cache to reload these volumes on first occasion
-    lvnames = tuple("%s/%s" % (vg, lv) for lv in lvs)
-    cmd = ["lvchange"]
-    cmd.extend(LVM_NOBACKUP)
-    if isinstance(attrs[0], str):
+    changeLVs(vg, [(lv, attrs) for lv in lvs])
+
+
+def changeLVs(vg, changes):
+    """
+    Change attributes of multiple LVs, using minimal number of lvchange
+    commands.
+
+    vg: VG name
+    changes: an iterable of (lv, attrs) pairs, where attrs is specified as
+            in changelv(), e.g.
+            (("lv1", ("--addtag", "a")), ("lv2", ("--addtag", "a")))
+
+    LVs with the same attributes are changed by a single lvchange command.
+    The commands are run in the order of the first LV using the attributes.
+    If some commands failed, raise se.StorageException after running all the
+    commands.
+    """
+    lvAttrs = OrderedDict()
+    for lv, attrs in changes:
+        lvAttrs.setdefault(lv, []).extend(_attrsPairs(attrs))
+
+    lvGroups = OrderedDict()
+    for lv, attrs in lvAttrs.items():
+        if attrs:
+            lvGroups.setdefault(tuple(attrs), []).append(lv)
+
+    errors = []
+    try:
+        for attrs, lvs in lvGroups.items():
+            lvnames = tuple("%s/%s" % (vg, lv) for lv in lvs)
+            cmd = ["lvchange"]
+            cmd.extend(LVM_NOBACKUP)
+            for attr in attrs:
+                cmd.extend(attr)
+            cmd.extend(lvnames)
+            rc, out, err = _lvminfo.cmd(tuple(cmd),
+                                        _lvminfo._getVGDevs((vg, )))
+            if rc != 0:
+                errors.append("%d %s %s\n%s/%s" % (rc, out, err, vg, lvs))
+    finally:
+        # If it fails or not we (may be) change the lv,
+        # so we invalidate cache to reload these volumes on first occasion
+        _lvminfo._invalidatelvs(vg, list(lvAttrs))
+
+    if errors:
+        raise se.StorageException("\n".join(errors))
+
+
+def _attrsPairs(attrs):
+    if not attrs:
+        return ()
+    elif isinstance(attrs[0], str):
         # ("--attribute", "value")
-        cmd.extend(attrs)
+        return (tuple(attrs),)
     else:
         # (("--aa", "v1"), ("--ab", "v2"))
-        for attr in attrs:
-            cmd.extend(attr)
-    cmd.extend(lvnames)
-    rc, out, err = _lvminfo.cmd(tuple(cmd), _lvminfo._getVGDevs((vg, )))
-    _lvminfo._invalidatelvs(vg, lvs)
-    if rc != 0:
-        raise se.StorageException("%d %s %s\n%s/%s" % (rc, out, err, vg, lvs))
+        return tuple(tuple(attr) for attr in attrs)
 
 
 def _setLVAvailability(vg, lvs, available):
@@ -931,8 +1188,13 @@ def movePV(vgName, src_device, dst_devices):
         raise se.CouldNotMovePVData(pvName, vgName, err)
 
 
-def getVG(vgName):
-    vg = _lvminfo.getVg(vgName)  # returns single VG namedtuple
+def getVG(vgName, stale_ok=False):
+    """
+    Return VG vgName. If stale_ok is True and the cache was invalidated,
+    return the VG loaded before the invalidation, and refresh the cache in
+    the background.
+    """
+    vg = _lvminfo.getVg(vgName, stale_ok=stale_ok)  # returns VG namedtuple
     if not vg:
         raise se.VolumeGroupDoesNotExist(vgName)
     else:
@@ -963,8 +1225,13 @@ def getVGbyUUID(vgUUID):
     raise se.VolumeGroupDoesNotExist("vg_uuid: %s" % vgUUID)
 
 
-def getLV(vgName, lvName=None):
-    lv = _lvminfo.getLv(vgName, lvName)
+def getLV(vgName, lvName=None, stale_ok=False):
+    """
+    Return LV vgName/lvName, or all the LVs in vgName if lvName is None. If
+    stale_ok is True and the cache was invalidated, return the LVs loaded
+    before the invalidation, and refresh the cache in the background.
+    """
+    lv = _lvminfo.getLv(vgName, lvName, stale_ok=stale_ok)
     # getLV() should not return None
     if not lv:
         raise se.LogicalVolumeDoesNotExistError("%s/%s" % (vgName, lvName))
@@ -1180,6 +1447,7 @@ def createLV(vgName, lvName, size, activate=True, contiguous=False,
 def removeLVs(vgName, lvNames):
     lvNames = _normalizeargs(lvNames)
     log.info("Removing LVs (vg=%s, lvs=%s)", vgName, lvNames)
+    _recentlyRefreshed.discard(vgName, lvNames)
     # Assert that the LVs are inactive before remove.
     for lvName in lvNames:
         if _isLVActive(vgName, lvName):
@@ -1211,6 +1479,7 @@ def removeLVs(vgName, lvNames):
 
 def extendLV(vgName, lvName, size_mb):
     log.info("Extending LV %s/%s to %s megabytes", vgName, lvName, size_mb)
+    _recentlyRefreshed.discard(vgName, (lvName,))
     cmd = ("lvextend",) + LVM_NOBACKUP
     cmd += ("--size", "%sm" % (size_mb,), "%s/%s" % (vgName, lvName))
     rc, out, err = _lvminfo.cmd(cmd, _lvminfo._getVGDevs((vgName,)))
@@ -1248,6 +1517,7 @@ def extendLV(vgName, lvName, size_mb):
 def reduceLV(vgName, lvName, size_mb, force=False):
     log.info("Reducing LV %s/%s to %s megabytes (force=%s)",
              vgName, lvName, size_mb, force)
+    _recentlyRefreshed.discard(vgName, (lvName,))
     cmd = ("lvreduce",) + LVM_NOBACKUP
     if force:
         cmd += ("--force",)
@@ -1277,6 +1547,65 @@ def reduceLV(vgName, lvName, size_mb, force=False):
     _lvminfo._invalidatelvs(vgName, lvName)
 
 
+# Seconds after activateLVs() refreshed or activated a chain of LVs, during
+# which a refresh of these LVs can be skipped. Another host may change the
+# LV mapping at any time, so this must cover only a single flow such as
+# preparing an image.
+_REFRESH_SKIP_WINDOW = 10
+
+
+class _RefreshedLVs(object):
+    """
+    Keep LVs refreshed or activated together by activateLVs().
+
+    When preparing an image, the entire chain is activated at once, and then
+    every volume in the chain is activated again. The LVs were just
+    refreshed, so we can skip the second refresh, avoiding one lvchange
+    command per volume.
+
+    Every LV can skip one refresh, within max_age seconds since it was
+    refreshed. An LV is dropped when it is extended, reduced, refreshed,
+    renamed, removed or deactivated, so a refresh is never skipped after the
+    LV mapping was changed by this host.
+    """
+
+    def __init__(self, max_age=_REFRESH_SKIP_WINDOW, clock=monotonic_time):
+        self._max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._lvs = {}  # (vgName, lvName) -> refresh time
+
+    def add(self, vgName, lvNames):
+        now = self._clock()
+        with self._lock:
+            for lvName in lvNames:
+                self._lvs[(vgName, lvName)] = now
+
+    def pop(self, vgName, lvNames):
+        """
+        Return the LVs in lvNames that need a refresh.
+        """
+        now = self._clock()
+        stale = []
+        with self._lock:
+            for lvName in lvNames:
+                refreshed = self._lvs.pop((vgName, lvName), None)
+                if refreshed is None or now - refreshed > self._max_age:
+                    stale.append(lvName)
+        if len(stale) < len(lvNames):
+            log.debug("Skipping refresh of just refreshed lvs: vg=%s lvs=%s",
+                      vgName, [lv for lv in lvNames if lv not in stale])
+        return stale
+
+    def discard(self, vgName, lvNames):
+        with self._lock:
+            for lvName in lvNames:
+                self._lvs.pop((vgName, lvName), None)
+
+
+_recentlyRefreshed = _RefreshedLVs()
+
+
 def activateLVs(vgName, lvNames, refresh=True):
     """
     Ensure that all lvNames are active and reflect the current mapping on
@@ -1294,16 +1623,27 @@ def activateLVs(vgName, lvNames, refresh=True):
         else:
             inactive.append(lvName)
 
+    # LVs mapped to the current metadata by this call.
+    current = []
+
     if refresh and active:
-        log.info("Refreshing active lvs: vg=%s lvs=%s", vgName, active)
-        _refreshLVs(vgName, active)
+        stale = _recentlyRefreshed.pop(vgName, active)
+        if stale:
+            log.info("Refreshing active lvs: vg=%s lvs=%s", vgName, stale)
+            _refreshLVs(vgName, stale)
+            current.extend(stale)
 
     if inactive:
         log.info("Activating lvs: vg=%s lvs=%s", vgName, inactive)
         _setLVAvailability(vgName, inactive, "y")
+        current.extend(inactive)
+
+    if len(lvNames) > 1:
+        _recentlyRefreshed.add(vgName, current)
 
 
 def deactivateLVs(vgName, lvNames):
+    _recentlyRefreshed.discard(vgName, lvNames)
     toDeactivate = [lvName for lvName in lvNames
                     if _isLVActive(vgName, lvName)]
     if toDeactivate:
@@ -1313,6 +1653,7 @@ def deactivateLVs(vgName, lvNames):
 
 def renameLV(vg, oldlv, newlv):
     log.info("Renaming LV (vg=%s, oldlv=%s, newlv=%s)", vg, oldlv, newlv)
+    _recentlyRefreshed.discard(vg, (oldlv, newlv))
     cmd = ("lvrename",) + LVM_NOBACKUP + (vg, oldlv, newlv)
     rc, out, err = _lvminfo.cmd(cmd, _lvminfo._getVGDevs((vg, )))
     if rc != 0:
@@ -1324,6 +1665,8 @@ def renameLV(vg, oldlv, newlv):
 
 def refreshLVs(vgName, lvNames):
     log.info("Refreshing LVs (vg=%s, lvs=%s)", vgName, lvNames)
+    # Called after the LVs were extended by the SPM.
+    _recentlyRefreshed.discard(vgName, lvNames)
     _refreshLVs(vgName, lvNames)
 
 
@@ -1380,6 +1723,35 @@ def changeLVTags(vg, lv, delTags=(), addTags=()):
             (lvname, ", ".join(addTags), ", ".join(delTags), err[-1]))
 
 
+def changeLVsTags(vg, tags):
+    """
+    Change tags of multiple LVs, using minimal number of lvchange commands.
+
+    vg: VG name
+    tags: an iterable of (lv, delTags, addTags) tuples.
+
+    LVs with the same tag changes are changed by a single lvchange command.
+    """
+    tags = list(tags)
+    changes = []
+    for lv, delTags, addTags in tags:
+        delTags = set(delTags)
+        addTags = set(addTags)
+        if delTags.intersection(addTags):
+            raise se.LogicalVolumeReplaceTagError(
+                "Cannot add and delete the same tag lv: `%s/%s` tags: `%s`" %
+                (vg, lv, ", ".join(delTags.intersection(addTags))))
+        attrs = [("--deltag", tag) for tag in sorted(delTags)]
+        attrs.extend(("--addtag", tag) for tag in sorted(addTags))
+        changes.append((lv, attrs))
+
+    log.info("Change LVs tags (vg=%s, tags=%s)", vg, tags)
+    try:
+        changeLVs(vg, changes)
+    except se.StorageException as e:
+        raise se.LogicalVolumeReplaceTagError(str(e))
+
+
 def addLVTags(vg, lv, addTags):
     changeLVTags(vg, lv, addTags=addTags)
 
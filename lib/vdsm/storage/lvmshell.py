@@ -0,0 +1,235 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Run lvm reporting commands in a long lived "lvm shell" process.
+
+Running lvm for every pvs, vgs or lvs command is expensive; most of the time
+is spent starting lvm, not scanning the devices. The lvm shell reads commands
+from stdin, and when configured with log/report_command_log=1 and
+--reportformat json, writes a json report including the command status for
+every command.
+
+The shell runs one command at a time. If the shell is busy, LVMShell.run()
+raises Busy, and the caller should run the command using a new lvm process.
+If the shell fails or times out, it is abandoned and a new shell is started
+on the next call.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import json
+import logging
+import os
+import select
+import threading
+
+from collections import OrderedDict
+
+from vdsm import constants
+from vdsm.common import cmdutils
+from vdsm.common import zombiereaper
+from vdsm.common.compat import subprocess
+from vdsm.common.osutils import uninterruptible_poll
+from vdsm.common.time import monotonic_time
+
+log = logging.getLogger("storage.lvmshell")
+
+PROMPT = b"lvm> "
+
+# Log configuration required to get the command status in the json report.
+LOG_CONFIG = "log { report_command_log=1 command_log_selection='all' }"
+
+# lvm commands return ECMD_PROCESSED (1) on success.
+ECMD_PROCESSED = 1
+
+# Time to wait for the shell to exit after closing its stdin.
+STOP_TIMEOUT = 5
+
+
+class Error(Exception):
+    """ Running a command in the lvm shell failed """
+
+
+class Busy(Error):
+    """ The lvm shell is running another command """
+
+
+class Timeout(Error):
+    """ The lvm shell did not complete a command in time """
+
+
+class LVMShell(object):
+
+    def __init__(self, command=None, timeout=60):
+        if command is None:
+            command = cmdutils.wrap_command(
+                [constants.EXT_LVM, "shell"], with_sudo=True)
+        self._command = command
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._proc = None
+
+    def run(self, args):
+        """
+        Run lvm command args in the shell.
+
+        Arguments:
+            args (sequence): lvm command and arguments, e.g. ["vgs", "-o",
+                "vg_name"]. The command should include the configuration in
+                LOG_CONFIG and "--reportformat json".
+
+        Returns:
+            tuple (rc, report, err), where rc is 0 on success or the lvm
+            return code on failure, report is the json report parsed into
+            OrderedDict, preserving the order of the fields, and err is a
+            list of error messages.
+
+        Raises:
+            ValueError if an argument cannot be quoted, Busy if the shell
+            is running another command, Timeout if the command did not
+            complete in time, or Error if the shell failed.
+        """
+        line = " ".join(_quote(arg) for arg in args) + "\n"
+        if not self._lock.acquire(False):
+            raise Busy("lvm shell is busy")
+        try:
+            if self._proc is None:
+                self._start()
+            try:
+                self._write(line.encode("utf-8"))
+                out = self._read_until_prompt()
+                return _parse(out)
+            except Exception:
+                self._stop()
+                raise
+        finally:
+            self._lock.release()
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._stop()
+
+    def _start(self):
+        log.debug("Starting lvm shell %s", self._command)
+        self._proc = subprocess.Popen(
+            self._command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            close_fds=True)
+        try:
+            self._read_until_prompt()
+        except Exception:
+            self._stop()
+            raise
+
+    def _stop(self):
+        proc = self._proc
+        self._proc = None
+        log.debug("Stopping lvm shell pid=%s", proc.pid)
+        # The shell runs as root, so we cannot kill it. Closing stdin
+        # terminates the shell when it completes the current command.
+        for f in (proc.stdin, proc.stdout):
+            try:
+                f.close()
+            except EnvironmentError as e:
+                log.debug("Error closing lvm shell pipe: %s", e)
+        try:
+            proc.wait(timeout=STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            log.warning("lvm shell pid=%s did not terminate, abandoning it",
+                        proc.pid)
+            zombiereaper.autoReapPID(proc.pid)
+
+    def _write(self, data):
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except EnvironmentError as e:
+            if e.errno != errno.EPIPE:
+                raise
+            raise Error("lvm shell terminated: %s" % e)
+
+    def _read_until_prompt(self):
+        fd = self._proc.stdout.fileno()
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        deadline = monotonic_time() + self._timeout
+        buf = bytearray()
+        while not buf.endswith(PROMPT):
+            remaining = deadline - monotonic_time()
+            if remaining <= 0 or not uninterruptible_poll(
+                    poller.poll, remaining * 1000):
+                raise Timeout("Timeout waiting for lvm shell, output=%r"
+                              % bytes(buf))
+            data = os.read(fd, 65536)
+            if not data:
+                raise Error("lvm shell terminated, output=%r" % bytes(buf))
+            buf += data
+        return bytes(buf[:-len(PROMPT)])
+
+
+def _quote(arg):
+    """
+    Quote arg for the lvm shell, which does not support escaping.
+    """
+    if '"' not in arg:
+        return '"%s"' % arg
+    if "'" not in arg:
+        return "'%s'" % arg
+    raise ValueError("Cannot quote argument: %r" % arg)
+
+
+def _parse(out):
+    """
+    Parse lvm shell command output, returning (rc, report, err).
+
+    Messages written before the report (e.g. warnings) and error messages in
+    the command log are returned in err.
+    """
+    text = out.decode("utf-8", "replace")
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end < start:
+        raise Error("No report in lvm shell output: %r" % text)
+
+    try:
+        report = json.loads(text[start:end + 1],
+                            object_pairs_hook=OrderedDict)
+    except ValueError as e:
+        raise Error("Invalid lvm shell report: %s: %r" % (e, text))
+
+    err = [line.strip() for line in text[:start].splitlines()
+           if line.strip()]
+
+    entries = report.get("log", [])
+    err.extend(entry["log_message"] for entry in entries
+               if entry.get("log_type") == "error")
+
+    if not entries:
+        raise Error("No command status in lvm shell report: %r" % text)
+
+    ret_code = int(entries[-1]["log_ret_code"])
+    rc = 0 if ret_code == ECMD_PROCESSED else ret_code
+
+    return rc, report, err
@@ -20,6 +20,7 @@
 
 from __future__ import absolute_import
 import array
+import mmap
 import os
 import errno
 import time
@@ -34,11 +35,15 @@ from six.moves import queue
 from vdsm.config import config
 from vdsm.storage import misc
 from vdsm.storage import task
+from vdsm.storage import xlease
 from vdsm.storage.exception import InvalidParameterException
 from vdsm.storage.threadPool import ThreadPool
 
 from vdsm import constants
 from vdsm.common import concurrent
+from vdsm.common import exception
+from vdsm.common import histogram
+from vdsm.common.time import monotonic_time
 
 __author__ = "ayalb"
 __date__ = "$Mar 9, 2009 5:25:07 PM$"
@@ -60,6 +65,10 @@ SLOTS_PER_MAILBOX = int(MAILBOX_SIZE // MESSAGE_SIZE)
 # Last message slot is reserved for metadata (checksum, extendable mailbox,
 # etc)
 MESSAGES_PER_MAILBOX = SLOTS_PER_MAILBOX - 1
+# Extend message volume data (version, opcode, domain and volume UUIDs) size
+VOLUME_DATA_SIZE = 5 + 2 * PACKED_UUID_SIZE
+# Minimal interval in seconds for polling the inbox when waiting for replies
+MIN_POLL_INTERVAL = 0.5
 
 
 def checksum(string, numBytes):
@@ -90,6 +99,119 @@ def _mboxExecCmd(*args, **kwargs):
     return misc.execCmd(*args, **kwargs)
 
 
+class DDMailboxIO(object):
+    """
+    Read and write mailbox data using a dd process for every operation.
+
+    Offsets must be aligned to the size of the data read or written.
+    """
+
+    def __init__(self, path):
+        self._path = str(path)
+
+    @property
+    def name(self):
+        return self._path
+
+    def read(self, offset, size):
+        cmd = [constants.EXT_DD,
+               'if=' + self._path,
+               'iflag=direct,fullblock',
+               'bs=' + str(size),
+               'count=1',
+               'skip=' + str(offset // size)]
+        rc, out, err = _mboxExecCmd(cmd, raw=True)
+        if rc:
+            raise IOError(errno.EIO, "Could not read mailbox %s: rc=%s "
+                          "err=%r" % (self._path, rc, err))
+        return out
+
+    def write(self, offset, data):
+        size = len(data)
+        cmd = [constants.EXT_DD,
+               'of=' + self._path,
+               'iflag=fullblock',
+               'oflag=direct',
+               'conv=notrunc',
+               'bs=' + str(size),
+               'count=1',
+               'seek=' + str(offset // size)]
+        rc, out, err = _mboxExecCmd(cmd, data=data)
+        if rc:
+            raise IOError(errno.EIO, "Could not write mailbox %s: rc=%s "
+                          "err=%r" % (self._path, rc, err))
+
+    def close(self):
+        pass
+
+
+class DirectMailboxIO(object):
+    """
+    Read and write mailbox data using direct I/O from the current process.
+
+    Aligned buffers are allocated once for every I/O size and reused, so
+    reading or writing a mailbox costs a single system call instead of
+    running a dd process.
+
+    Unlike DDMailboxIO, I/O is performed by the calling thread, which may
+    block if storage is not responsive.
+    """
+
+    def __init__(self, path):
+        self._file = xlease.DirectFile(str(path))
+        self._buffers = {}
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def read(self, offset, size):
+        buf = self._buffer(size)
+        nread = self._file.pread(offset, buf)
+        if nread != size:
+            raise IOError(errno.EIO, "Short read from mailbox %s: read %d "
+                          "bytes instead of %d" % (self.name, nread, size))
+        return buf[:]
+
+    def write(self, offset, data):
+        buf = self._buffer(len(data))
+        buf[:] = data
+        self._file.pwrite(offset, buf)
+
+    def close(self):
+        for buf in self._buffers.values():
+            buf.close()
+        self._buffers.clear()
+        self._file.close()
+
+    def _buffer(self, size):
+        buf = self._buffers.get(size)
+        if buf is None:
+            # mmap memory is page aligned, as required for direct I/O.
+            buf = mmap.mmap(-1, size, mmap.MAP_SHARED)
+            self._buffers[size] = buf
+        # xlease.DirectFile.pread writes to the buffer on python 2, so we must
+        # start at the beginning of the buffer.
+        buf.seek(0)
+        return buf
+
+
+def mailbox_io(path):
+    """
+    Return an object for reading and writing mailbox at path, using the
+    method configured in irs:mailbox_io.
+    """
+    method = config.get('irs', 'mailbox_io')
+    if method == "dd":
+        return DDMailboxIO(path)
+    elif method == "direct":
+        return DirectMailboxIO(path)
+    else:
+        raise exception.InvalidConfiguration(
+            reason="Unsupported value for irs:mailbox_io",
+            mailbox_io=method)
+
+
 class SPM_Extend_Message:
 
     log = logging.getLogger('storage.SPM.Messages.Extend')
@@ -111,7 +233,14 @@ class SPM_Extend_Message:
 
         self.pool = volumeData['poolID']
         self.volumeData = volumeData
+        self.newSize = newSize
         self.callback = callbackFunction
+        # (callback, volumeData) of this message and of messages coalesced
+        # into it, called when the reply is received.
+        self.callbacks = []
+        if callbackFunction:
+            self.callbacks.append((callbackFunction, volumeData))
+        self.created = monotonic_time()
 
         # Message structure is rigid (order must be kept and is relied upon):
         # Version (1 byte), OpCode (4 bytes), Domain UUID (16 bytes), Volume
@@ -130,9 +259,23 @@ class SPM_Extend_Message:
     def __getitem__(self, index):
         return self.payload[index]
 
+    def isSameVolume(self, other):
+        """
+        Return True if other message extends the same volume.
+        """
+        return (self.payload[0:VOLUME_DATA_SIZE] ==
+                other.payload[0:VOLUME_DATA_SIZE])
+
+    def coalesce(self, other):
+        """
+        Take the callbacks of other message, coalesced into this message, so
+        they are called when this message gets a reply.
+        """
+        self.callbacks.extend(other.callbacks)
+
     def checkReply(self, reply):
         # Sanity check - Make sure reply is for current message
-        sizeOffset = 5 + 2 * PACKED_UUID_SIZE
+        sizeOffset = VOLUME_DATA_SIZE
         if (self.payload[0:sizeOffset] != reply[0:sizeOffset]):
             self.log.error("SPM_Extend_Message: Reply message volume data "
                            "(domainID + volumeID) differs from request "
@@ -223,6 +366,12 @@ class HSM_Mailbox:
     def wait(self, timeout=None):
         return self._mailman.wait(timeout)
 
+    def latency(self):
+        """
+        Return histogram info of extend requests round trip time.
+        """
+        return self._mailman.latency()
+
 
 class HSM_MailMonitor(object):
     log = logging.getLogger('storage.MailBox.HsmMailMonitor')
@@ -237,27 +386,21 @@ class HSM_MailMonitor(object):
         self._queue = queue
         self._activeMessages = {}
         self._monitorInterval = monitorInterval
+        # While waiting for replies, poll the inbox quickly, backing off to
+        # monitorInterval if no reply arrives.
+        self._minPollInterval = min(MIN_POLL_INTERVAL, monitorInterval)
+        self._pollInterval = self._minPollInterval
         self._hostID = int(hostID)
         self._used_slots_array = [0] * MESSAGES_PER_MAILBOX
-        self._outgoingMail = EMPTYMAILBOX
+        # Slots modified since outgoing mail was sent
+        self._unsentSlots = set()
+        self._outgoingMail = bytearray(MAILBOX_SIZE)
         self._incomingMail = EMPTYMAILBOX
+        self._latency = histogram.Histogram()
         # TODO: add support for multiple paths (multiple mailboxes)
-        self._inCmd = [constants.EXT_DD,
-                       'if=' + str(inbox),
-                       'iflag=direct,fullblock',
-                       'bs=' + str(MAILBOX_SIZE),
-                       'count=1',
-                       'skip=' + str(self._hostID)
-                       ]
-        self._outCmd = [constants.EXT_DD,
-                        'of=' + str(outbox),
-                        'iflag=fullblock',
-                        'oflag=direct',
-                        'conv=notrunc',
-                        'bs=' + str(MAILBOX_SIZE),
-                        'count=1',
-                        'seek=' + str(self._hostID)
-                        ]
+        self._mailboxOffset = self._hostID * MAILBOX_SIZE
+        self._inbox = mailbox_io(inbox)
+        self._outbox = mailbox_io(outbox)
         self._init = False
         self._initMailbox()  # Read initial mailbox state
         self._msgCounter = 0
@@ -268,14 +411,15 @@ class HSM_MailMonitor(object):
 
     def _initMailbox(self):
         # Sync initial incoming mail state with storage view
-        (rc, out, err) = _mboxExecCmd(self._inCmd, raw=True)
-        if rc == 0:
-            self._incomingMail = out
-            self._init = True
-        else:
+        try:
+            self._incomingMail = self._inbox.read(self._mailboxOffset,
+                                                  MAILBOX_SIZE)
+        except EnvironmentError as e:
             self.log.warning("HSM_MailboxMonitor - Could not initialize "
                              "mailbox, will not accept requests until init "
-                             "succeeds")
+                             "succeeds: %s", e)
+        else:
+            self._init = True
 
     def immStop(self):
         self._stop = True
@@ -284,6 +428,13 @@ class HSM_MailMonitor(object):
         self._thread.join(timeout=timeout)
         return not self._thread.is_alive()
 
+    def latency(self):
+        """
+        Return histogram info of the time in seconds between sending a
+        request and receiving the reply from the SPM.
+        """
+        return self._latency.info()
+
     def _handleResponses(self, newMsgs):
         rc = False
 
@@ -294,19 +445,17 @@ class HSM_MailMonitor(object):
 
             # Skip empty return messages (messages with version 0)
             start = i * MESSAGE_SIZE
+            end = start + MESSAGE_SIZE
 
             # First byte of message is message version.
             # Check return message version, if 0 then message is empty
-            if newMsgs[start] in ['\0', '0']:
+            if newMsgs[start:start + 1] in (b'\0', b'0'):
                 continue
 
-            for j in range(start, start + MESSAGE_SIZE):
-                if newMsgs[j] != self._incomingMail[j]:
-                    break
+            newMsg = newMsgs[start:end]
 
-            # If search exhausted then message hasn't changed since last read
-            # and can be skipped
-            if j == (start + MESSAGE_SIZE - 1):
+            # If message hasn't changed since last read it can be skipped
+            if newMsg == self._incomingMail[start:end]:
                 continue
 
             #
@@ -316,38 +465,34 @@ class HSM_MailMonitor(object):
             #
             rc = True
 
-            newMsg = newMsgs[start:start + MESSAGE_SIZE]
-
             if newMsg == CLEAN_MESSAGE:
                 del self._activeMessages[i]
                 self._used_slots_array[i] = 0
                 self._msgCounter -= 1
-                self._outgoingMail = self._outgoingMail[0:start] + \
-                    MESSAGE_SIZE * "\0" + self._outgoingMail[start +
-                                                             MESSAGE_SIZE:]
+                self._outgoingMail[start:end] = MESSAGE_SIZE * b"\0"
                 continue
 
             msg = self._activeMessages[i]
             self._activeMessages[i] = CLEAN_MESSAGE
-            self._outgoingMail = self._outgoingMail[0:start] + \
-                CLEAN_MESSAGE + self._outgoingMail[start + MESSAGE_SIZE:]
+            self._outgoingMail[start:end] = CLEAN_MESSAGE
 
             try:
                 self.log.debug("HSM_MailboxMonitor(%s/%s) - Checking reply: "
                                "%s", self._msgCounter, MESSAGES_PER_MAILBOX,
                                repr(newMsg))
+                self._latency.add(monotonic_time() - msg.created)
                 msg.checkReply(newMsg)
-                if msg.callback:
+                for callback, volumeData in msg.callbacks:
                     try:
                         id = str(uuid.uuid4())
-                        if not self.tp.queueTask(id, runTask, (msg.callback,
-                                                 msg.volumeData)):
+                        if not self.tp.queueTask(id, runTask, (callback,
+                                                 volumeData)):
                             raise Exception()
                     except:
                         self.log.error("HSM_MailMonitor: exception caught "
                                        "while running msg callback, for "
                                        "message: %s, callback function: %s",
-                                       repr(msg.payload), msg.callback,
+                                       repr(msg.payload), callback,
                                        exc_info=True)
             except RuntimeError as e:
                 self.log.error("HSM_MailMonitor: exception: %s caught while "
@@ -365,11 +510,11 @@ class HSM_MailMonitor(object):
 
     def _checkForMail(self):
         # self.log.debug("HSM_MailMonitor - checking for mail")
-        # self.log.debug("Running command: " + str(self._inCmd))
-        (rc, in_mail, err) = misc.execCmd(self._inCmd, raw=True)
-        if rc:
-            raise RuntimeError("_handleResponses.Could not read mailbox - rc "
-                               "%s" % rc)
+        try:
+            in_mail = self._inbox.read(self._mailboxOffset, MAILBOX_SIZE)
+        except EnvironmentError as e:
+            raise RuntimeError("_handleResponses.Could not read mailbox - %s"
+                               % e)
         if (len(in_mail) != MAILBOX_SIZE):
             raise RuntimeError("_handleResponses.Could not read mailbox - len "
                                "%s != %s" % (len(in_mail), MAILBOX_SIZE))
@@ -377,17 +522,33 @@ class HSM_MailMonitor(object):
         return self._handleResponses(in_mail)
 
     def _sendMail(self):
-        self.log.info("HSM_MailMonitor sending mail to SPM - " +
-                      str(self._outCmd))
+        self.log.info("HSM_MailMonitor sending mail to SPM - %s",
+                      self._outbox.name)
         chk = checksum(
-            self._outgoingMail[0:MAILBOX_SIZE - CHECKSUM_BYTES],
+            bytes(self._outgoingMail[0:MAILBOX_SIZE - CHECKSUM_BYTES]),
             CHECKSUM_BYTES)
         pChk = struct.pack('<l', chk)  # Assumes CHECKSUM_BYTES equals 4!!!
-        self._outgoingMail = \
-            self._outgoingMail[0:MAILBOX_SIZE - CHECKSUM_BYTES] + pChk
-        _mboxExecCmd(self._outCmd, data=self._outgoingMail)
+        self._outgoingMail[MAILBOX_SIZE - CHECKSUM_BYTES:] = pChk
+        try:
+            self._outbox.write(self._mailboxOffset, bytes(self._outgoingMail))
+        except EnvironmentError as e:
+            self.log.warning("HSM_MailMonitor couldn't write outgoing mail: "
+                             "%s", e)
+        else:
+            self._unsentSlots.clear()
 
     def _handleMessage(self, message):
+        """
+        Add message to outgoing mail.
+
+        A message identical to an active message is ignored. A message
+        extending the same volume as a message that was not sent yet replaces
+        the unsent message, so multiple requests for the same volume use a
+        single slot. The callbacks of an ignored or replaced message are
+        called when the remaining message gets a reply.
+
+        Returns True if outgoing mail was modified.
+        """
         # TODO: add support for multiple mailboxes
         freeSlot = False
         for i in range(0, MESSAGES_PER_MAILBOX):
@@ -395,15 +556,29 @@ class HSM_MailMonitor(object):
                 if not freeSlot:
                     freeSlot = i
                 continue
-            duplicate = True
-            for j in range(0, MESSAGE_SIZE):
-                if message[j] != self._activeMessages[i][j]:
-                    duplicate = False
-                    break
-            if duplicate:
+            active = self._activeMessages[i]
+            if active == CLEAN_MESSAGE:
+                continue
+            if message.payload == active.payload:
                 self.log.debug("HSM_MailMonitor - ignoring duplicate message "
                                "%s" % (repr(message)))
-                return
+                active.coalesce(message)
+                return False
+            if i in self._unsentSlots and message.isSameVolume(active):
+                if message.newSize < active.newSize:
+                    self.log.debug("HSM_MailMonitor - ignoring message %r, "
+                                   "unsent message %r requests bigger size",
+                                   message.payload, active.payload)
+                    active.coalesce(message)
+                    return False
+                self.log.debug("HSM_MailMonitor - replacing unsent message "
+                               "%r with %r", active.payload, message.payload)
+                message.coalesce(active)
+                self._activeMessages[i] = message
+                start = i * MESSAGE_SIZE
+                self._outgoingMail[start:start + MESSAGE_SIZE] = \
+                    message.payload
+                return True
         if not freeSlot:
             raise RuntimeError("HSM_MailMonitor - Active messages list full, "
                                "cannot add new message")
@@ -411,19 +586,50 @@ class HSM_MailMonitor(object):
         self._msgCounter += 1
         self._used_slots_array[freeSlot] = 1
         self._activeMessages[freeSlot] = message
+        self._unsentSlots.add(freeSlot)
         start = freeSlot * MESSAGE_SIZE
         end = start + MESSAGE_SIZE
-        self._outgoingMail = self._outgoingMail[0:start] + message.payload + \
-            self._outgoingMail[end:]
+        self._outgoingMail[start:end] = message.payload
         self.log.debug("HSM_MailMonitor - start: %s, end: %s, len: %s, "
                        "message(%s/%s): %s" %
                        (start, end, len(self._outgoingMail), self._msgCounter,
                         MESSAGES_PER_MAILBOX,
                         repr(self._outgoingMail[start:end])))
+        return True
+
+    def _receiveMessage(self, timeout):
+        """
+        Wait up to timeout seconds for a new message, and add it to the
+        outgoing mail.
+
+        Returns True if outgoing mail was modified.
+        """
+        try:
+            message = self._queue.get(block=True, timeout=timeout)
+        except queue.Empty:
+            return False
+        return self._handleMessage(message)
+
+    def _receiveQueuedMessages(self):
+        """
+        Add all messages waiting in the queue to the outgoing mail.
+
+        Returns True if outgoing mail was modified.
+        """
+        modified = False
+        # TODO: Remove single mailbox limitation
+        while len(self._activeMessages) < MESSAGES_PER_MAILBOX:
+            try:
+                message = self._queue.get(block=False)
+            except queue.Empty:
+                break
+            modified |= self._handleMessage(message)
+        return modified
 
     def _run(self):
         try:
             failures = 0
+            sendMail = False
 
             # Do not start processing requests before incoming mailbox is
             # initialized
@@ -436,40 +642,18 @@ class HSM_MailMonitor(object):
 
             while not self._stop:
                 try:
-                    message = None
-                    sendMail = False
                     # If no message is pending, block_wait until a new message
-                    # or stop command arrives
-                    while not self._stop and not message and \
-                            not self._activeMessages:
-                        try:
-                            # self.log.debug("No requests in queue, going to "
-                            #               "sleep until new requests arrive")
-                            # Check if a new message is waiting to be sent
-                            message = self._queue.get(
-                                block=True, timeout=self._monitorInterval)
-                            self._handleMessage(message)
-                            message = None
-                            sendMail = True
-                        except queue.Empty:
-                            pass
+                    # or stop command arrives, without accessing storage.
+                    while not self._stop and not self._activeMessages:
+                        sendMail |= self._receiveMessage(
+                            self._monitorInterval)
 
                     if self._stop:
                         break
 
                     # If pending messages available, check if there are new
                     # messages waiting in queue as well
-                    empty = False
-                    while (not empty) and \
-                            (len(self._activeMessages) < MESSAGES_PER_MAILBOX):
-                        # TODO: Remove single mailbox limitation
-                        try:
-                            message = self._queue.get(block=False)
-                            self._handleMessage(message)
-                            message = None
-                            sendMail = True
-                        except queue.Empty:
-                            empty = True
+                    sendMail |= self._receiveQueuedMessages()
 
                     try:
                         sendMail |= self._checkForMail()
@@ -482,16 +666,24 @@ class HSM_MailMonitor(object):
 
                     if sendMail:
                         self._sendMail()
+                        sendMail = False
+                        # We sent a new request or got a reply; the next reply
+                        # may be close.
+                        self._pollInterval = self._minPollInterval
 
                     # If there are active messages waiting for SPM reply, wait
-                    # a few seconds before performing another IO op
+                    # before performing another IO op. New messages are
+                    # handled immediately instead of waiting for the next poll.
                     if self._activeMessages and not self._stop:
                         # If recurring failures then sleep for one minute
                         # before retrying
                         if (failures > 9):
                             time.sleep(60)
                         else:
-                            time.sleep(self._monitorInterval)
+                            sendMail |= self._receiveMessage(
+                                self._pollInterval)
+                            self._pollInterval = min(
+                                self._pollInterval * 2, self._monitorInterval)
 
                 except:
                     self.log.error("HSM_MailboxMonitor - Incoming mail"
@@ -500,8 +692,10 @@ class HSM_MailMonitor(object):
         finally:
             self.log.info("HSM_MailboxMonitor - Incoming mail monitoring "
                           "thread stopped, clearing outgoing mail")
-            self._outgoingMail = EMPTYMAILBOX
+            self._outgoingMail = bytearray(MAILBOX_SIZE)
             self._sendMail()  # Clear outgoing mailbox
+            self._inbox.close()
+            self._outbox.close()
 
 
 class SPM_MailMonitor:
@@ -544,30 +738,24 @@ class SPM_MailMonitor:
         self._outMailLen = MAILBOX_SIZE * self._numHosts
         self._monitorInterval = monitorInterval
         # TODO: add support for multiple paths (multiple mailboxes)
-        self._outgoingMail = self._outMailLen * b"\0"
-        self._incomingMail = self._outgoingMail
-        self._inCmd = ['dd',
-                       'if=' + str(self._inbox),
-                       'iflag=direct,fullblock',
-                       'count=1'
-                       ]
-        self._outCmd = ['dd',
-                        'of=' + str(self._outbox),
-                        'oflag=direct',
-                        'iflag=fullblock',
-                        'conv=notrunc',
-                        'count=1'
-                        ]
+        # Mail is kept in mutable buffers, modified in place when messages are
+        # received or sent.
+        self._outgoingMail = bytearray(self._outMailLen)
+        self._incomingMail = bytearray(self._outMailLen)
+        # Set when writing outgoing mail failed, to retry on the next check.
+        self._outgoingMailDirty = False
+        self._inboxIO = mailbox_io(self._inbox)
+        self._outboxIO = mailbox_io(self._outbox)
         self._outLock = threading.Lock()
         self._inLock = threading.Lock()
         # Clear outgoing mail
-        self.log.debug("SPM_MailMonitor - clearing outgoing mail, command is: "
-                       "%s", self._outCmd)
-        cmd = self._outCmd + ['bs=' + str(self._outMailLen)]
-        (rc, out, err) = _mboxExecCmd(cmd, data=self._outgoingMail)
-        if rc:
-            self.log.warning("SPM_MailMonitor couldn't clear outgoing mail, "
-                             "dd failed")
+        self.log.debug("SPM_MailMonitor - clearing outgoing mail %s",
+                       self._outbox)
+        try:
+            self._outboxIO.write(0, bytes(self._outgoingMail))
+        except EnvironmentError as e:
+            self.log.warning("SPM_MailMonitor couldn't clear outgoing mail: "
+                             "%s", e)
 
         self._thread = concurrent.thread(
             self._run, name="mailbox-spm", log=self.log)
@@ -611,22 +799,37 @@ class SPM_MailMonitor:
 
         send = False
 
-        # run through all messages and check if new messages have arrived
+        # Most of the time there is no new mail, and comparing the entire
+        # buffer is much cheaper than looking at every mailbox.
+        if newMail == self._incomingMail:
+            return send
+
+        newView = memoryview(newMail)
+        oldView = memoryview(self._incomingMail)
+
+        # run through all mailboxes and check if new messages have arrived
         # (since last read)
         for host in range(0, self._numHosts):
-            # Check mailbox checksum
             mailboxStart = host * MAILBOX_SIZE
+            mailboxEnd = mailboxStart + MAILBOX_SIZE
+
+            # Skip mailboxes that did not change since last read
+            if newView[mailboxStart:mailboxEnd] == \
+                    oldView[mailboxStart:mailboxEnd]:
+                continue
 
             isMailboxValidated = False
+            isMailboxValid = True
 
             for i in range(0, MESSAGES_PER_MAILBOX):
 
                 msgId = host * SLOTS_PER_MAILBOX + i
                 msgStart = msgId * MESSAGE_SIZE
+                msgEnd = msgStart + MESSAGE_SIZE
 
                 # First byte of message is message version.  Check message
                 # version, if 0 then message is empty and can be skipped
-                if newMail[msgStart] in ['\0', '0']:
+                if newMail[msgStart:msgStart + 1] in (b'\0', b'0'):
                     continue
 
                 # Most mailboxes are probably empty so it costs less to check
@@ -635,55 +838,40 @@ class SPM_MailMonitor:
                 # mailbox
                 if not isMailboxValidated:
                     if not self.validateMailbox(
-                            newMail[mailboxStart:mailboxStart + MAILBOX_SIZE],
-                            host):
-                        # Cleaning invalid mbx in newMail
-                        newMail = newMail[:mailboxStart] + EMPTYMAILBOX + \
-                            newMail[mailboxStart + MAILBOX_SIZE:]
+                            newMail[mailboxStart:mailboxEnd], host):
+                        isMailboxValid = False
                         break
                     self.log.debug("SPM_MailMonitor: Mailbox %s validated, "
                                    "checking mail", host)
                     isMailboxValidated = True
 
-                newMsg = newMail[msgStart:msgStart + MESSAGE_SIZE]
-                msgOffset = msgId * MESSAGE_SIZE
+                # Message isn't empty, check if its new. If the message hasn't
+                # changed since last read, it can be skipped.
+                if newView[msgStart:msgEnd] == oldView[msgStart:msgEnd]:
+                    continue
+
+                newMsg = newMail[msgStart:msgEnd]
                 if newMsg == CLEAN_MESSAGE:
                     # Should probably put a setter on outgoingMail which would
                     # take the lock
                     with self._outLock:
-                        self._outgoingMail = \
-                            self._outgoingMail[0:msgOffset] + CLEAN_MESSAGE + \
-                            self._outgoingMail[msgOffset + MESSAGE_SIZE:
-                                               self._outMailLen]
-                    send = True
-                    continue
-
-                # Message isn't empty, check if its new
-                isMessageNew = False
-                for j in range(msgStart, msgStart + MESSAGE_SIZE):
-                    if newMail[j] != self._incomingMail[j]:
-                        isMessageNew = True
-                        break
-
-                # If search exhausted, i.e. message hasn't changed since last
-                # read, it can be skipped
-                if not isMessageNew:
+                        if self._outgoingMail[msgStart:msgEnd] != newMsg:
+                            self._outgoingMail[msgStart:msgEnd] = newMsg
+                            send = True
                     continue
 
                 # We only get here if there is a novel request
                 try:
-                    msgType = newMail[msgStart + 1:msgStart + 5]
+                    msgType = newMsg[1:5]
                     if msgType in self._messageTypes:
                         # Use message class to process request according to
                         # message specific logic
                         id = str(uuid.uuid4())
                         self.log.debug("SPM_MailMonitor: processing request: "
-                                       "%s" % repr(newMail[
-                                           msgStart:msgStart + MESSAGE_SIZE]))
+                                       "%s" % repr(newMsg))
                         res = self.tp.queueTask(
                             id, runTask, (self._messageTypes[msgType], msgId,
-                                          newMail[msgStart:
-                                                  msgStart + MESSAGE_SIZE])
+                                          newMsg)
                         )
                         if not res:
                             raise Exception()
@@ -693,14 +881,21 @@ class SPM_MailMonitor:
                 except RuntimeError as e:
                     self.log.error("SPM_MailMonitor: exception: %s caught "
                                    "while handling message: %s", str(e),
-                                   newMail[msgStart:msgStart + MESSAGE_SIZE])
+                                   newMsg)
                 except:
                     self.log.error("SPM_MailMonitor: exception caught while "
-                                   "handling message: %s",
-                                   newMail[msgStart:msgStart + MESSAGE_SIZE],
+                                   "handling message: %s", newMsg,
                                    exc_info=True)
 
-        self._incomingMail = newMail
+            # Update the snapshot of this mailbox in place. An invalid mailbox
+            # is kept as empty mailbox, so it will be checked again on the
+            # next read.
+            if isMailboxValid:
+                self._incomingMail[mailboxStart:mailboxEnd] = \
+                    newMail[mailboxStart:mailboxEnd]
+            else:
+                self._incomingMail[mailboxStart:mailboxEnd] = EMPTYMAILBOX
+
         return send
 
     def _checkForMail(self):
@@ -708,50 +903,43 @@ class SPM_MailMonitor:
         # incomingMail is not changed during checkForMail
         with self._inLock:
             # self.log.debug("SPM_MailMonitor -_checking for mail")
-            cmd = self._inCmd + ['bs=' + str(self._outMailLen)]
-            # self.log.debug("SPM_MailMonitor - reading incoming mail, "
-            #               "command: " + str(cmd))
-            (rc, in_mail, err) = misc.execCmd(cmd, raw=True)
-            if rc:
-                raise IOError(errno.EIO, "_handleRequests._checkForMail - "
-                              "Could not read mailbox: %s" % self._inbox)
+            in_mail = self._inboxIO.read(0, self._outMailLen)
 
             if (len(in_mail) != (self._outMailLen)):
-                self.log.error('SPM_MailMonitor: _checkForMail - dd succeeded '
-                               'but read %d bytes instead of %d, cannot check '
-                               'mail.  Read mail contains: %s', len(in_mail),
+                self.log.error('SPM_MailMonitor: _checkForMail - read '
+                               'succeeded but read %d bytes instead of %d, '
+                               'cannot check mail.  Read mail contains: %s',
+                               len(in_mail),
                                self._outMailLen, repr(in_mail[:80]))
                 raise RuntimeError("_handleRequests._checkForMail - Could not "
                                    "read mailbox")
             # self.log.debug("Parsing inbox content: %s", in_mail)
-            if self._handleRequests(in_mail):
+            if self._handleRequests(in_mail) or self._outgoingMailDirty:
                 with self._outLock:
-                    cmd = self._outCmd + ['bs=' + str(self._outMailLen)]
-                    (rc, out, err) = _mboxExecCmd(cmd,
-                                                  data=self._outgoingMail)
-                    if rc:
+                    try:
+                        self._outboxIO.write(0, bytes(self._outgoingMail))
+                    except EnvironmentError as e:
                         self.log.warning("SPM_MailMonitor couldn't write "
-                                         "outgoing mail, dd failed")
+                                         "outgoing mail: %s", e)
+                        self._outgoingMailDirty = True
+                    else:
+                        self._outgoingMailDirty = False
 
     def sendReply(self, msgID, msg):
         # Lock is acquired in order to make sure that
         # outgoingMail is not changed while used
         with self._outLock:
             msgOffset = msgID * MESSAGE_SIZE
-            self._outgoingMail = \
-                self._outgoingMail[0:msgOffset] + msg.payload + \
-                self._outgoingMail[msgOffset + MESSAGE_SIZE:self._outMailLen]
+            self._outgoingMail[msgOffset:msgOffset + MESSAGE_SIZE] = \
+                msg.payload
             mailboxOffset = (msgID // SLOTS_PER_MAILBOX) * MAILBOX_SIZE
-            mailbox = self._outgoingMail[mailboxOffset:
-                                         mailboxOffset + MAILBOX_SIZE]
-            cmd = self._outCmd + ['bs=' + str(MAILBOX_SIZE),
-                                  'seek=' + str(mailboxOffset // MAILBOX_SIZE)]
-            # self.log.debug("Running command: %s, for message id: %s",
-            #               str(cmd), str(msgID))
-            (rc, out, err) = _mboxExecCmd(cmd, data=mailbox)
-            if rc:
+            mailbox = bytes(self._outgoingMail[mailboxOffset:
+                                               mailboxOffset + MAILBOX_SIZE])
+            try:
+                self._outboxIO.write(mailboxOffset, mailbox)
+            except EnvironmentError as e:
                 self.log.error("SPM_MailMonitor: sendReply - couldn't send "
-                               "reply, dd failed")
+                               "reply: %s", e)
 
     def _run(self):
         try:
@@ -764,6 +952,10 @@ class SPM_MailMonitor:
         finally:
             self._stopped = True
             self.tp.joinAll(waitForTasks=False)
+            with self._inLock:
+                self._inboxIO.close()
+            with self._outLock:
+                self._outboxIO.close()
             self.log.info("SPM_MailMonitor - Incoming mail monitoring thread "
                           "stopped")
 
@@ -0,0 +1,175 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+"""
+Inventory of multipath devices, used by getDeviceList.
+
+Reading multipath device info from sysfs and getting the device serial using
+scsi_id is slow. On hosts with hundreds of LUNs, reading all devices takes
+minutes. The inventory keeps the info of every device, and reads again only
+devices added or changed since the last call.
+
+A device is read again when:
+- udev reports that the device was added or its table was reloaded, for
+  example when paths were added or removed, or the device was resized.
+- the device size or slaves in sysfs do not match the kept info. This
+  catches changes made just before the call, when udev events may not have
+  been handled yet.
+
+The paths state is not kept. It is read on every call using one dmsetup
+command. The iscsi connections, which include the session credentials, are
+not kept either. They are read on every call from the current iscsi
+sessions.
+
+Devices are identified by the multipath device name, which is the device
+WWID (vdsm requires user_friendly_names no).
+"""
+
+from __future__ import absolute_import
+
+import copy
+import logging
+import threading
+
+from vdsm.common import supervdsm
+from vdsm.storage import devicemapper
+from vdsm.storage import multipath
+from vdsm.storage import udev
+
+log = logging.getLogger("storage.mpathinventory")
+
+
+class Monitor(udev.MultipathMonitor):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # guid -> (key, devInfo)
+        self._devices = {}
+        # Incremented when devices are invalidated, so info read during an
+        # invalidation is not kept.
+        self._generation = 0
+        self._started = False
+
+    def start(self):
+        """
+        Implementation of the interface udev.MultipathMonitor.start()
+        This method is called by the udev.MultipathListener and should not
+        be called by others.
+
+        Devices are read on the first call to devices(), so events are not
+        missed while reading them.
+        """
+        with self._lock:
+            self._devices.clear()
+            self._generation += 1
+            self._started = True
+
+    def stop(self):
+        """
+        Implementation of the interface udev.MultipathMonitor.stop()
+        Without events the kept info cannot be trusted, so devices are read
+        on every call.
+        """
+        with self._lock:
+            self._devices.clear()
+            self._generation += 1
+            self._started = False
+
+    def handle(self, event):
+        """
+        Implementation of the interface udev.MultipathMonitor.handle()
+        This method is called by the udev.MultipathListener and should not
+        be called by others.
+        """
+        if event.type in (udev.MPATH_CHANGED, udev.MPATH_REMOVED):
+            with self._lock:
+                self._generation += 1
+                if self._devices.pop(event.mpath_uuid, None):
+                    log.debug("Multipath device %r %s, dropping device info",
+                              event.mpath_uuid, event.type)
+
+    def devices(self, guids=()):
+        """
+        Return list of multipath devices info, in the format returned by
+        multipath.deviceInfo(), including the paths state and the iscsi
+        connections.
+
+        Arguments:
+            guids (sequence): if specified, return only these devices.
+        """
+        current = []
+        for dmId, guid in multipath.getMPDevsIter():
+            if guids and guid not in guids:
+                continue
+            try:
+                key = _device_key(dmId)
+            except EnvironmentError as e:
+                # Device removed while listing devices.
+                log.debug("Skipping multipath device %r: %s", guid, e)
+                continue
+            current.append((dmId, guid, key))
+
+        with self._lock:
+            generation = self._generation
+            if self._started:
+                known = dict(self._devices)
+            else:
+                known = {}
+
+        stale = [(dmId, guid, key) for dmId, guid, key in current
+                 if guid not in known or known[guid][0] != key]
+
+        if stale:
+            log.debug("Reading %d multipath devices", len(stale))
+            serials = supervdsm.getProxy().getScsiSerials(
+                [dmId for dmId, _, _ in stale])
+            for dmId, guid, key in stale:
+                devInfo = multipath.deviceInfo(
+                    dmId, guid, serials.get(dmId, ""))
+                known[guid] = (key, devInfo)
+
+        with self._lock:
+            if self._started and self._generation == generation:
+                if guids:
+                    for _, guid, _ in stale:
+                        self._devices[guid] = known[guid]
+                else:
+                    # Drop devices which are gone.
+                    self._devices = {guid: known[guid]
+                                     for _, guid, _ in current}
+
+        pathStatuses = devicemapper.getPathsStatus()
+        knownSessions = {}
+        result = []
+        for _, guid, _ in current:
+            devInfo = copy.deepcopy(known[guid][1])
+            multipath.updatePathsState(devInfo, pathStatuses)
+            multipath.updateConnections(devInfo, knownSessions)
+            result.append(devInfo)
+        return result
+
+
+def _device_key(dmId):
+    """
+    Return a key for detecting changes in multipath device dmId.
+    """
+    return (dmId,
+            multipath.getDeviceSize(dmId),
+            tuple(sorted(devicemapper.getSlaves(dmId))))
@@ -197,6 +197,15 @@ def getScsiSerial(physdev):
                 return line.split("=")[1]
     return ""
 
+
+def getScsiSerials(physdevs):
+    """
+    Return dict mapping device name to scsi serial for all physdevs. Called
+    using supervdsm, so getting the serials of many devices needs one
+    supervdsm call.
+    """
+    return {dev: getScsiSerial(dev) for dev in physdevs}
+
 HBTL = namedtuple("HBTL", "host bus target lun")
 
 
@@ -223,133 +232,155 @@ def getHBTL(physdev):
     return HBTL(*hbtl[0].split(":"))
 
 
-def pathListIter(filterGuids=()):
-    filterLen = len(filterGuids) if filterGuids else -1
-    devsFound = 0
+def deviceInfo(dmId, guid, serial):
+    """
+    Return info about multipath device dmId, read from sysfs.
 
-    knownSessions = {}
+    The paths "state" and the iscsi "connections" are not set; call
+    updatePathsState() and updateConnections() to add the current state of
+    the paths and the current iscsi sessions.
 
-    svdsm = supervdsm.getProxy()
-    pathStatuses = devicemapper.getPathsStatus()
+    Arguments:
+        dmId (str): device mapper device name (e.g. "dm-1")
+        guid (str): multipath device guid
+        serial (str): device scsi serial
+    """
+    devInfo = {
+        "guid": guid,
+        "dm": dmId,
+        "capacity": str(getDeviceSize(dmId)),
+        "serial": serial,
+        "paths": [],
+        "connections": [],
+        "devtypes": [],
+        "devtype": "",
+        "vendor": "",
+        "product": "",
+        "fwrev": "",
+        "logicalblocksize": "",
+        "physicalblocksize": "",
+        "discard_max_bytes": getDeviceDiscardMaxBytes(dmId),
+    }
+
+    for slave in devicemapper.getSlaves(dmId):
+        if not devicemapper.isBlockDevice(slave):
+            log.warning("No such physdev '%s' is ignored" % slave)
+            continue
 
-    for dmId, guid in getMPDevsIter():
-        if devsFound == filterLen:
-            break
+        if not devInfo["vendor"]:
+            try:
+                devInfo["vendor"] = getVendor(slave)
+            except Exception:
+                log.warn("Problem getting vendor from device `%s`",
+                         slave, exc_info=True)
 
-        if filterGuids and guid not in filterGuids:
-            continue
+        if not devInfo["product"]:
+            try:
+                devInfo["product"] = getModel(slave)
+            except Exception:
+                log.warn("Problem getting model name from device `%s`",
+                         slave, exc_info=True)
 
-        devsFound += 1
-
-        devInfo = {
-            "guid": guid,
-            "dm": dmId,
-            "capacity": str(getDeviceSize(dmId)),
-            "serial": svdsm.getScsiSerial(dmId),
-            "paths": [],
-            "connections": [],
-            "devtypes": [],
-            "devtype": "",
-            "vendor": "",
-            "product": "",
-            "fwrev": "",
-            "logicalblocksize": "",
-            "physicalblocksize": "",
-            "discard_max_bytes": getDeviceDiscardMaxBytes(dmId),
-        }
-
-        for slave in devicemapper.getSlaves(dmId):
-            if not devicemapper.isBlockDevice(slave):
-                log.warning("No such physdev '%s' is ignored" % slave)
-                continue
-
-            if not devInfo["vendor"]:
-                try:
-                    devInfo["vendor"] = getVendor(slave)
-                except Exception:
-                    log.warn("Problem getting vendor from device `%s`",
-                             slave, exc_info=True)
-
-            if not devInfo["product"]:
-                try:
-                    devInfo["product"] = getModel(slave)
-                except Exception:
-                    log.warn("Problem getting model name from device `%s`",
-                             slave, exc_info=True)
-
-            if not devInfo["fwrev"]:
-                try:
-                    devInfo["fwrev"] = getFwRev(slave)
-                except Exception:
-                    log.warn("Problem getting fwrev from device `%s`",
-                             slave, exc_info=True)
-
-            if (not devInfo["logicalblocksize"] or
-                    not devInfo["physicalblocksize"]):
-                try:
-                    logBlkSize, phyBlkSize = getDeviceBlockSizes(slave)
-                    devInfo["logicalblocksize"] = str(logBlkSize)
-                    devInfo["physicalblocksize"] = str(phyBlkSize)
-                except Exception:
-                    log.warn("Problem getting blocksize from device `%s`",
-                             slave, exc_info=True)
-
-            pathInfo = {}
-            pathInfo["physdev"] = slave
-            pathInfo["state"] = pathStatuses.get(slave, "failed")
-            pathInfo["capacity"] = str(getDeviceSize(slave))
+        if not devInfo["fwrev"]:
             try:
-                hbtl = getHBTL(slave)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    log.warn("Device has no hbtl: %s", slave)
-                    pathInfo["lun"] = 0
-                else:
-                    log.error("Error: %s while trying to get hbtl of device: "
-                              "%s", str(e.message), slave)
-                    raise
-            else:
-                pathInfo["lun"] = hbtl.lun
-
-            if iscsi.devIsiSCSI(slave):
-                devInfo["devtypes"].append(DEV_ISCSI)
-                pathInfo["type"] = DEV_ISCSI
-                sessionID = iscsi.getiScsiSession(slave)
-                if sessionID not in knownSessions:
-                    # FIXME: This entire part is for BC. It should be moved to
-                    # hsm and not preserved for new APIs. New APIs should keep
-                    # numeric types and sane field names.
-                    sess = iscsi.getSessionInfo(sessionID)
-                    sessionInfo = {
-                        "connection": sess.target.portal.hostname,
-                        "port": str(sess.target.portal.port),
-                        "iqn": sess.target.iqn,
-                        "portal": str(sess.target.tpgt),
-                        "initiatorname": sess.iface.name
-                    }
-
-                    # Note that credentials must be sent back in order for
-                    # the engine to tell vdsm how to reconnect later
-                    if sess.credentials:
-                        cred = sess.credentials
-                        sessionInfo['user'] = cred.username
-                        sessionInfo['password'] = cred.password
-
-                    knownSessions[sessionID] = sessionInfo
-                devInfo["connections"].append(knownSessions[sessionID])
+                devInfo["fwrev"] = getFwRev(slave)
+            except Exception:
+                log.warn("Problem getting fwrev from device `%s`",
+                         slave, exc_info=True)
+
+        if (not devInfo["logicalblocksize"] or
+                not devInfo["physicalblocksize"]):
+            try:
+                logBlkSize, phyBlkSize = getDeviceBlockSizes(slave)
+                devInfo["logicalblocksize"] = str(logBlkSize)
+                devInfo["physicalblocksize"] = str(phyBlkSize)
+            except Exception:
+                log.warn("Problem getting blocksize from device `%s`",
+                         slave, exc_info=True)
+
+        pathInfo = {}
+        pathInfo["physdev"] = slave
+        pathInfo["capacity"] = str(getDeviceSize(slave))
+        try:
+            hbtl = getHBTL(slave)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                log.warn("Device has no hbtl: %s", slave)
+                pathInfo["lun"] = 0
             else:
-                devInfo["devtypes"].append(DEV_FCP)
-                pathInfo["type"] = DEV_FCP
+                log.error("Error: %s while trying to get hbtl of device: "
+                          "%s", str(e.message), slave)
+                raise
+        else:
+            pathInfo["lun"] = hbtl.lun
+
+        if iscsi.devIsiSCSI(slave):
+            devInfo["devtypes"].append(DEV_ISCSI)
+            pathInfo["type"] = DEV_ISCSI
+        else:
+            devInfo["devtypes"].append(DEV_FCP)
+            pathInfo["type"] = DEV_FCP
+
+        if devInfo["devtype"] == "":
+            devInfo["devtype"] = pathInfo["type"]
+        elif (devInfo["devtype"] != DEV_MIXED and
+              devInfo["devtype"] != pathInfo["type"]):
+            devInfo["devtype"] == DEV_MIXED
+
+        devInfo["paths"].append(pathInfo)
+
+    return devInfo
 
-            if devInfo["devtype"] == "":
-                devInfo["devtype"] = pathInfo["type"]
-            elif (devInfo["devtype"] != DEV_MIXED and
-                  devInfo["devtype"] != pathInfo["type"]):
-                devInfo["devtype"] == DEV_MIXED
 
-            devInfo["paths"].append(pathInfo)
+def updateConnections(devInfo, knownSessions=None):
+    """
+    Set the "connections" of devInfo to the current iscsi sessions of its
+    iscsi paths.
+
+    Arguments:
+        devInfo (dict): device info returned by deviceInfo()
+        knownSessions (dict): optional cache of iscsi sessions info, shared
+            by multiple calls.
+    """
+    if knownSessions is None:
+        knownSessions = {}
 
-        yield devInfo
+    devInfo["connections"] = []
+    for pathInfo in devInfo["paths"]:
+        if pathInfo["type"] != DEV_ISCSI:
+            continue
+        sessionID = iscsi.getiScsiSession(pathInfo["physdev"])
+        if sessionID not in knownSessions:
+            # FIXME: This entire part is for BC. It should be moved to
+            # hsm and not preserved for new APIs. New APIs should keep
+            # numeric types and sane field names.
+            sess = iscsi.getSessionInfo(sessionID)
+            sessionInfo = {
+                "connection": sess.target.portal.hostname,
+                "port": str(sess.target.portal.port),
+                "iqn": sess.target.iqn,
+                "portal": str(sess.target.tpgt),
+                "initiatorname": sess.iface.name
+            }
+
+            # Note that credentials must be sent back in order for
+            # the engine to tell vdsm how to reconnect later
+            if sess.credentials:
+                cred = sess.credentials
+                sessionInfo['user'] = cred.username
+                sessionInfo['password'] = cred.password
+
+            knownSessions[sessionID] = sessionInfo
+        devInfo["connections"].append(knownSessions[sessionID])
+
+
+def updatePathsState(devInfo, pathStatuses):
+    """
+    Set the "state" of devInfo paths using pathStatuses returned by
+    devicemapper.getPathsStatus().
+    """
+    for pathInfo in devInfo["paths"]:
+        pathInfo["state"] = pathStatuses.get(pathInfo["physdev"], "failed")
 
 
 TOXIC_REGEX = re.compile(r"[%s]" % re.sub(r"[\-\\\]]",
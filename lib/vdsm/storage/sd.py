@@ -42,6 +42,7 @@ from vdsm.storage import resourceFactories
 from vdsm.storage import resourceManager as rm
 from vdsm.storage import rwlock
 from vdsm.storage import task
+from vdsm.storage import volumegraph
 from vdsm.storage import xlease
 from vdsm.storage.persistent import unicodeEncoder, unicodeDecoder
 
@@ -320,6 +321,12 @@ class StorageDomainManifest(object):
         self.replaceMetadata(metadata)
         self._domainLock = self._makeDomainLock()
         self._external_leases_lock = rwlock.RWLock()
+        # Volume graph returned by volume_graph().
+        self._volume_graph = None
+        # Incremented by invalidate_volume_graph(), to detect volumes that
+        # changed while the graph was built.
+        self._volume_graph_generation = 0
+        self._volume_graph_lock = threading.Lock()
 
     @classmethod
     def special_volumes(cls, version):
@@ -602,6 +609,58 @@ class StorageDomainManifest(object):
         """
         raise NotImplementedError
 
+    def read_volumes_metadata(self):
+        """
+        Return dict {volUUID: VolumeMetadata} of all volumes in the domain,
+        or None if the domain does not support reading all volumes metadata
+        at once.
+        """
+        return None
+
+    # Volume graph
+
+    def volume_graph(self):
+        """
+        Return a volumegraph.VolumeGraph of the domain volumes.
+
+        The graph is built once and kept until invalidate_volume_graph() is
+        called, so queries do not access storage. The graph is invalidated
+        only by changes made on this host; callers must validate the answer
+        against the storage before relying on it.
+        """
+        with self._volume_graph_lock:
+            graph = self._volume_graph
+            generation = self._volume_graph_generation
+
+        if graph is None:
+            graph = self._make_volume_graph()
+            with self._volume_graph_lock:
+                if generation == self._volume_graph_generation:
+                    self._volume_graph = graph
+
+        return graph
+
+    def invalidate_volume_graph(self):
+        """
+        Drop the graph kept by volume_graph(). Must be called after volumes
+        are created, removed or renamed, or their images or parents are
+        changed.
+        """
+        with self._volume_graph_lock:
+            self._volume_graph = None
+            self._volume_graph_generation += 1
+
+    def _make_volume_graph(self):
+        # File domains do not report the parents of non-template volumes;
+        # they are read from the volumes metadata once, when building the
+        # graph.
+        volumes = {}
+        for vol_id, (imgs, parent) in self.getAllVolumes().items():
+            if parent is None:
+                parent = self.produceVolume(imgs[0], vol_id).getParent()
+            volumes[vol_id] = ImgsPar(imgs, parent)
+        return volumegraph.VolumeGraph(volumes)
+
     # External leases support
 
     @classmethod
@@ -715,10 +774,16 @@ class StorageDomain(object):
         return self._manifest.getVAllocSize(imgUUID, volUUID)
 
     def deleteImage(self, sdUUID, imgUUID, volsImgs):
-        self._manifest.deleteImage(sdUUID, imgUUID, volsImgs)
+        try:
+            self._manifest.deleteImage(sdUUID, imgUUID, volsImgs)
+        finally:
+            self._manifest.invalidate_volume_graph()
 
     def purgeImage(self, sdUUID, imgUUID, volsImgs, discard):
-        self._manifest.purgeImage(sdUUID, imgUUID, volsImgs, discard)
+        try:
+            self._manifest.purgeImage(sdUUID, imgUUID, volsImgs, discard)
+        finally:
+            self._manifest.invalidate_volume_graph()
 
     def getAllImages(self):
         return self._manifest.getAllImages()
@@ -726,6 +791,12 @@ class StorageDomain(object):
     def getAllVolumes(self):
         return self._manifest.getAllVolumes()
 
+    def volume_graph(self):
+        return self._manifest.volume_graph()
+
+    def invalidate_volume_graph(self):
+        self._manifest.invalidate_volume_graph()
+
     def prepareMailbox(self):
         """
         This method has been introduced in order to prepare the mailbox
@@ -1144,6 +1215,7 @@ class StorageDomain(object):
         self._manifest.refreshDirTree()
 
     def refresh(self):
+        self._manifest.invalidate_volume_graph()
         self._manifest.refresh()
 
     def extend(self, devlist, force):
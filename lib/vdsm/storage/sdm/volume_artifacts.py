@@ -262,6 +262,8 @@ class FileVolumeArtifacts(VolumeArtifacts):
         if not self.is_image():
             self._oop.os.rename(self.artifacts_dir, self._image_dir)
 
+        self.sd_manifest.invalidate_volume_graph()
+
     def _get_volume_preallocation(self, vol_format):
         # File volumes are always sparse regardless of format
         return sc.SPARSE_VOL
@@ -401,6 +403,7 @@ class BlockVolumeArtifacts(VolumeArtifacts):
                                          self.vol_id)
         lvm.changeLVTags(self.sd_manifest.sdUUID, self.vol_id,
                          delTags=(sc.TEMP_VOL_LVTAG,))
+        self.sd_manifest.invalidate_volume_graph()
 
     def get_volume_preallocation(self, vol_format):
         if vol_format == sc.RAW_FORMAT:
@@ -33,6 +33,7 @@ from vdsm.storage import devicemapper
 MultipathEvent = namedtuple("MultipathEvent",
                             "type, mpath_uuid, path, valid_paths, dm_seqnum")
 
+MPATH_CHANGED = "changed"
 MPATH_REMOVED = "removed"
 PATH_FAILED = "failed"
 PATH_REINSTATED = "reinstated"
@@ -232,7 +233,7 @@ class MultipathListener(object):
             return None
         mpath_uuid = mpath_uuid[6:]
 
-        if device["ACTION"] == "change":
+        if device["ACTION"] == "change" and "DM_ACTION" in device:
             dm_action = device.get("DM_ACTION")
             if dm_action == "PATH_FAILED":
                 event_type = PATH_FAILED
@@ -244,6 +245,13 @@ class MultipathListener(object):
             valid_paths = int(device.get("DM_NR_VALID_PATHS"))
             dm_seqnum = int(device.get("DM_SEQNUM"))
             path = devicemapper.device_name(device.get("DM_PATH"))
+        elif device["ACTION"] in ("add", "change"):
+            # Multipath device added, or its table was reloaded, for example
+            # when adding or removing paths, or resizing the device.
+            event_type = MPATH_CHANGED
+            valid_paths = None
+            path = None
+            dm_seqnum = None
         elif device["ACTION"] == "remove":
             event_type = MPATH_REMOVED
             valid_paths = None
@@ -0,0 +1,119 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+
+from collections import defaultdict
+
+from vdsm.storage import constants as sc
+from vdsm.storage import exception as se
+
+
+class VolumeGraph(object):
+    """
+    Parent and child relations of the volumes in a storage domain.
+
+    The graph is built from a mapping {volUUID: ImgsPar(imgs, parent)},
+    including the parent of every volume, and does not access storage.
+
+    The graph is a snapshot, and is not modified by volume operations.
+    """
+
+    def __init__(self, volumes):
+        self._volumes = volumes
+        # {imgUUID: [volUUID, ...]}, including templates used by the image.
+        self._images = defaultdict(list)
+        for vol_id, (imgs, _) in volumes.items():
+            for img_id in imgs:
+                self._images[img_id].append(vol_id)
+
+    def __contains__(self, vol_id):
+        return vol_id in self._volumes
+
+    def image(self, vol_id):
+        """
+        Return the image owning vol_id. For templates this is the template
+        image.
+        """
+        return self._volumes[vol_id].imgs[0]
+
+    def volumes(self, img_id):
+        """
+        Return the volumes of img_id, including the template if any.
+        """
+        return list(self._images.get(img_id, ()))
+
+    def parent(self, vol_id):
+        return self._volumes[vol_id].parent
+
+    def children(self, vol_id):
+        """
+        Return the volumes whose parent is vol_id. For templates, these are
+        the base volumes of the images using the template.
+        """
+        res = []
+        for img_id in self._volumes[vol_id].imgs:
+            for child_id in self._images[img_id]:
+                if child_id not in res and self.parent(child_id) == vol_id:
+                    res.append(child_id)
+        return res
+
+    def template_users(self, vol_id):
+        """
+        Return the images using vol_id as a template.
+        """
+        return list(self._volumes[vol_id].imgs[1:])
+
+    def leaf(self, img_id):
+        """
+        Return the leaf volume of img_id.
+
+        Raises se.ImageIsNotLegalChain if the image does not have exactly
+        one leaf.
+        """
+        vols = [vol_id for vol_id in self._images.get(img_id, ())
+                if self.image(vol_id) == img_id]
+        parents = set(self.parent(vol_id) for vol_id in vols)
+        leaves = [vol_id for vol_id in vols if vol_id not in parents]
+        if len(leaves) != 1:
+            raise se.ImageIsNotLegalChain(img_id)
+        return leaves[0]
+
+    def chain(self, img_id, vol_id=None):
+        """
+        Return the volumes of img_id from the base volume to vol_id, or to
+        the image leaf if vol_id is None. A template is not included unless
+        img_id is the template image.
+
+        Raises se.ImageIsNotLegalChain if the chain contains a loop, and
+        KeyError if a volume in the chain is not in the graph.
+        """
+        if vol_id is None:
+            vol_id = self.leaf(img_id)
+
+        chain = []
+        seen = set()
+        while vol_id != sc.BLANK_UUID and self.image(vol_id) == img_id:
+            if vol_id in seen:
+                raise se.ImageIsNotLegalChain(img_id)
+            chain.insert(0, vol_id)
+            seen.add(vol_id)
+            vol_id = self.parent(vol_id)
+        return chain
@@ -68,6 +68,7 @@ from vdsm.common.supervdsm import _SuperVdsmManager
 from vdsm.network.initializer import init_privileged_network_components
 
 from vdsm.storage.multipath import getScsiSerial as _getScsiSerial
+from vdsm.storage.multipath import getScsiSerials as _getScsiSerials
 from vdsm.storage import multipath
 from vdsm.constants import METADATA_GROUP, \
     VDSM_USER, GLUSTER_MGMT_ENABLED
@@ -135,6 +136,10 @@ class _SuperVdsm(object):
     def getScsiSerial(self, *args, **kwargs):
         return _getScsiSerial(*args, **kwargs)
 
+    @logDecorator
+    def getScsiSerials(self, *args, **kwargs):
+        return _getScsiSerials(*args, **kwargs)
+
     @logDecorator
     def mount(self, fs_spec, fs_file, mntOpts=None, vfstype=None,
               cgroup=None):
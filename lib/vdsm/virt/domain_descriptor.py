@@ -21,9 +21,11 @@ from __future__ import absolute_import
 from __future__ import division
 
 from contextlib import contextmanager
+import threading
 import xml.etree.ElementTree as etree
 
 from vdsm.common import xmlutils
+from vdsm.common.time import monotonic_time
 from vdsm.virt import metadata
 from vdsm.virt import vmxml
 
@@ -147,3 +149,90 @@ class DomainDescriptor(MutableDomainDescriptor):
     @contextmanager
     def metadata_descriptor(self):
         yield metadata.Descriptor.from_tree(self._dom)
+
+
+class DomainDescriptorCache(object):
+    """
+    Cache the DomainDescriptor of a domain, fetching the domain xml only when
+    it may have changed.
+
+    The cache must be invalidated after modifying the domain, and when
+    libvirt reports an event that may modify the domain xml. The cache is
+    versioned; invalidate() increments the version, and a descriptor is
+    current only if it was fetched after the last invalidation, so an
+    invalidation during a fetch is never lost.
+
+    This class is thread safe.
+    """
+
+    def __init__(self, fetch, desc=None):
+        """
+        Arguments:
+            fetch (callable): called without arguments to fetch the domain
+                xml.
+            desc (DomainDescriptor): initial descriptor, or None to fetch
+                the descriptor on the first access.
+        """
+        self._fetch = fetch
+        self._cond = threading.Condition(threading.Lock())
+        self._desc = desc
+        self._version = 0
+        self._desc_version = 0 if desc is not None else -1
+
+    @property
+    def version(self):
+        with self._cond:
+            return self._version
+
+    @property
+    def last(self):
+        """
+        Return the last known descriptor, which may be stale.
+        """
+        with self._cond:
+            return self._desc
+
+    def get(self):
+        """
+        Return the current descriptor, fetching the domain xml if the cache
+        was invalidated. Errors fetching the xml are propagated to the
+        caller.
+        """
+        with self._cond:
+            if self._desc_version == self._version:
+                return self._desc
+            version = self._version
+        desc = DomainDescriptor(self._fetch())
+        with self._cond:
+            if version > self._desc_version:
+                self._desc = desc
+                self._desc_version = version
+        return desc
+
+    def set(self, desc):
+        """
+        Replace the cached descriptor with desc, known to be current.
+        """
+        with self._cond:
+            self._desc = desc
+            self._desc_version = self._version
+
+    def invalidate(self):
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """
+        Wait until the cache is invalidated after version was returned by
+        the version property. Return True if the cache was invalidated, and
+        False on timeout.
+        """
+        deadline = monotonic_time() + timeout
+        with self._cond:
+            while self._version == version:
+                remaining = deadline - monotonic_time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
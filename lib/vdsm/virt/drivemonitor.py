@@ -20,29 +20,130 @@
 from __future__ import absolute_import
 from __future__ import division
 
+import threading
+
 import libvirt
+import six
 
+from vdsm.common.time import monotonic_time
 from vdsm.config import config
 from vdsm.virt.vmdevices import lookup
 from vdsm.virt.vmdevices import storage
 
 
+# Priority of VMs with drives to check which are not known to be filling up,
+# for example drives without a block threshold.
+LOW_PRIORITY = float('inf')
+
+# Write rate assumed for drives without recent allocation history (bytes per
+# second), used to estimate the time until a drive is full.
+_DEFAULT_WRITE_RATE = 100 * 1024**2
+
+# Allocations older than this are not used to estimate the write rate
+# (seconds).
+_RATE_WINDOW = 60
+
+
 class ImprobableResizeRequestError(RuntimeError):
     pass
 
 
+class ExtensionQueue(object):
+    """
+    Host wide queue of VMs with drives to check, ordered by priority.
+
+    The priority of a VM is the estimated time in seconds until its most
+    urgent drive is full, so VMs writing fast to drives with little free
+    space are checked and extended first.
+
+    A VM stays in the queue until the caller discards it, using the
+    generation returned by items(). If the VM was queued again since, it is
+    not discarded, so an event received while checking the VM is not lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # vm_id -> (priority, generation)
+        self._generation = 0
+
+    def put(self, vm_id, priority=LOW_PRIORITY):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.get(vm_id)
+            if entry is not None:
+                priority = min(priority, entry[0])
+            self._entries[vm_id] = (priority, self._generation)
+
+    def reset(self, vm_id, generation):
+        """
+        Reset the priority of a VM dispatched for checking, so the priority
+        is computed again by the next put(). If the VM was queued again
+        since generation, its priority is kept.
+        """
+        with self._lock:
+            entry = self._entries.get(vm_id)
+            if entry is not None and entry[1] == generation:
+                self._entries[vm_id] = (LOW_PRIORITY, generation)
+
+    def discard(self, vm_id, generation):
+        with self._lock:
+            entry = self._entries.get(vm_id)
+            if entry is not None and entry[1] == generation:
+                del self._entries[vm_id]
+
+    def items(self):
+        """
+        Return list of (vm_id, generation) tuples, most urgent VM first.
+        """
+        with self._lock:
+            entries = sorted(six.iteritems(self._entries),
+                             key=lambda item: item[1])
+        return [(vm_id, generation) for vm_id, (_, generation) in entries]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+extension_queue = ExtensionQueue()
+
+
+def block_info_from_stats(stats):
+    """
+    Return dict mapping drive name to storage.BlockInfo, using the block
+    stats reported by libvirt bulk stats. Drives with incomplete stats are
+    not included.
+    """
+    infos = {}
+    for idx in six.moves.xrange(stats.get('block.count', 0)):
+        prefix = 'block.%d.' % idx
+        try:
+            name = stats[prefix + 'name']
+            capacity = stats[prefix + 'capacity']
+            alloc = stats[prefix + 'allocation']
+            physical = stats[prefix + 'physical']
+        except KeyError:
+            continue
+        infos[name] = storage.BlockInfo(capacity, alloc, physical)
+    return infos
+
+
 class DriveMonitor(object):
     """
     Track the highest allocation of thin-provisioned drives
     of a Vm, triggering the extension flow when needed.
     """
 
-    def __init__(self, vm, log, enabled=True):
+    def __init__(self, vm, log, enabled=True, queue=None):
         self._vm = vm
         self._log = log
         self._enabled = enabled
         self._events_enabled = config.getboolean(
             'irs', 'enable_block_threshold_event')
+        self._queue = extension_queue if queue is None else queue
+        # drive name -> (time, allocation) of the last known allocation,
+        # used to estimate the drive write rate.
+        self._allocations = {}
 
     def events_enabled(self):
         return self._events_enabled
@@ -53,6 +154,7 @@ class DriveMonitor(object):
     def enable(self):
         self._enabled = True
         self._log.info('Enabling drive monitoring')
+        self.schedule()
 
     def disable(self):
         self._enabled = False
@@ -68,6 +170,19 @@ class DriveMonitor(object):
         """
         return self._enabled and bool(self.monitored_drives())
 
+    def schedule(self, priority=LOW_PRIORITY):
+        """
+        Queue the vm for drive monitoring in the next monitoring cycle.
+        Does nothing if the `_events_enabled` attribute is Falsey, since
+        all vms are checked in every cycle.
+
+        Args:
+            priority: Estimated time until a drive is full (seconds). Vms
+                      with lower values are checked first.
+        """
+        if self._events_enabled:
+            self._queue.put(self._vm.id, priority)
+
     def set_threshold(self, drive, apparentsize):
         """
         Set the libvirt block threshold on the given drive, enabling
@@ -119,6 +234,7 @@ class DriveMonitor(object):
             self._log.error(
                 'Failed to set block threshold on %r (%s): %s',
                 drive.name, drive.path, exc)
+            self.schedule()
         else:
             drive.threshold_state = storage.BLOCK_THRESHOLD.SET
 
@@ -170,6 +286,36 @@ class DriveMonitor(object):
                 dev, self._vm.id)
         else:
             drive.on_block_threshold(path)
+            # The threshold is set to physical - watermarkLimit, so the free
+            # space left is watermarkLimit - excess.
+            self.schedule(self._time_to_full(
+                drive, threshold + excess, drive.watermarkLimit - excess))
+
+    def remove_drive(self, drive):
+        """
+        Forget the allocation history of a drive removed from the vm, so a
+        drive hotplugged later with the same name does not use it.
+
+        Args:
+            drive: A storage.Drive object
+        """
+        self._allocations.pop(drive.name, None)
+
+    def _time_to_full(self, drive, alloc, free):
+        """
+        Return the estimated time in seconds until the drive is full, based
+        on the write rate since the last known allocation.
+        """
+        now = monotonic_time()
+        rate = _DEFAULT_WRITE_RATE
+        last = self._allocations.get(drive.name)
+        if last is not None:
+            last_time, last_alloc = last
+            elapsed = now - last_time
+            if 0 < elapsed <= _RATE_WINDOW and alloc > last_alloc:
+                rate = (alloc - last_alloc) / elapsed
+        self._allocations[drive.name] = (now, alloc)
+        return max(0, free) / rate
 
     def monitored_drives(self):
         """
@@ -184,6 +330,7 @@ class DriveMonitor(object):
                 if drive.needs_monitoring(self._events_enabled)]
 
     def should_extend_volume(self, drive, volumeID, capacity, alloc, physical):
+        self._allocations[drive.name] = (monotonic_time(), alloc)
         nextPhysSize = drive.getNextVolumeSize(physical, capacity)
 
         # NOTE: the intent of this check is to prevent faulty images to
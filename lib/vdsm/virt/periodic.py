@@ -24,6 +24,7 @@ from __future__ import division
 Code to perform periodic maintenance and bookkeeping of the VMs.
 """
 
+from collections import OrderedDict
 import logging
 import threading
 
@@ -37,7 +38,9 @@ from vdsm import throttledlog
 from vdsm.common import errors
 from vdsm.common import exception
 from vdsm.common import libvirtconnection
+from vdsm.common.time import monotonic_time
 from vdsm.config import config
+from vdsm.virt import drivemonitor
 from vdsm.virt import migration
 from vdsm.virt import recovery
 from vdsm.virt import sampling
@@ -383,6 +386,50 @@ class DriveWatermarkMonitor(_RunnableOnVm):
         self._vm.monitor_drives()
 
 
+class DriveWatermarkVms(object):
+    """
+    Return the vms for the DriveWatermarkMonitor operation.
+
+    When block threshold events are enabled, return only the vms in the
+    extension queue, most urgent first, and all other vms only every
+    scan_interval seconds, to find drives missed by events. Otherwise, all
+    vms are returned in every cycle.
+    """
+
+    def __init__(self, get_vms, queue, events_enabled, scan_interval,
+                 clock=monotonic_time):
+        self._get_vms = get_vms
+        self._queue = queue
+        self._events_enabled = events_enabled
+        self._scan_interval = scan_interval
+        self._clock = clock
+        self._last_scan = None
+
+    def __call__(self):
+        vms = self._get_vms()
+        if not self._events_enabled:
+            return vms
+
+        result = OrderedDict()
+        for vm_id, generation in self._queue.items():
+            vm_obj = vms.get(vm_id)
+            if (vm_obj is None or
+                    not vm_obj.drive_monitor.monitoring_needed()):
+                self._queue.discard(vm_id, generation)
+            else:
+                self._queue.reset(vm_id, generation)
+                result[vm_id] = vm_obj
+
+        now = self._clock()
+        if (self._last_scan is None or
+                now - self._last_scan >= self._scan_interval):
+            self._last_scan = now
+            for vm_id, vm_obj in six.viewitems(vms):
+                result.setdefault(vm_id, vm_obj)
+
+        return result
+
+
 def _kill_long_paused_vms(cif):
     log = logging.getLogger("virt.periodic")
     log.debug("Looking for stale paused VMs")
@@ -393,9 +440,9 @@ def _kill_long_paused_vms(cif):
 
 
 def _create(cif, scheduler):
-    def per_vm_operation(func, period):
+    def per_vm_operation(func, period, get_vms=cif.getVMs):
         disp = VmDispatcher(
-            cif.getVMs, _executor, func, _timeout_from(period))
+            get_vms, _executor, func, _timeout_from(period))
         return Operation(disp, period, scheduler)
 
     ops = [
@@ -410,12 +457,18 @@ def _create(cif, scheduler):
             BlockjobMonitor,
             config.getint('vars', 'vm_sample_jobs_interval')),
 
-        # We do this only until we get high water mark notifications
-        # from QEMU. It accesses storage and/or QEMU monitor, so can block,
-        # thus we need dispatching.
+        # With block threshold events, only vms reported by events or
+        # needing a new threshold are checked in most cycles. It accesses
+        # storage and/or QEMU monitor, so can block, thus we need
+        # dispatching.
         per_vm_operation(
             DriveWatermarkMonitor,
-            config.getint('vars', 'vm_watermark_interval')),
+            config.getint('vars', 'vm_watermark_interval'),
+            get_vms=DriveWatermarkVms(
+                cif.getVMs,
+                drivemonitor.extension_queue,
+                config.getboolean('irs', 'enable_block_threshold_event'),
+                config.getint('vars', 'vm_watermark_scan_interval'))),
 
         Operation(
             lambda: recovery.lookup_external_vms(cif),
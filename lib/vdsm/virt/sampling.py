@@ -28,13 +28,18 @@ from six.moves import map
 Support for VM and host statistics sampling.
 """
 
-from collections import defaultdict, deque, namedtuple
+from collections import deque, namedtuple
+import array
 import logging
 import os
-import re
 import threading
 import time
 
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
 from vdsm import hugepages
 from vdsm import numa
 from vdsm import utils
@@ -42,6 +47,7 @@ import vdsm.common.time
 from vdsm.config import config
 from vdsm.constants import P_VDSM_RUN
 from vdsm.host import api as hostapi
+from vdsm.virt import vmstats
 from vdsm.virt.utils import ExpiringCache
 
 
@@ -51,16 +57,22 @@ if not os.path.exists(_THP_STATE_PATH):
 _METRICS_ENABLED = config.getboolean('metrics', 'enabled')
 
 
+def _read_proc_stat():
+    with open('/proc/stat') as f:
+        return f.readlines()
+
+
 class TotalCpuSample(object):
     """
     A sample of total CPU consumption.
 
     The sample is taken at initialization time and can't be updated.
     """
-    def __init__(self):
-        with open('/proc/stat') as f:
-            self.user, userNice, self.sys, self.idle = \
-                map(int, f.readline().split()[1:5])
+    def __init__(self, stat_lines=None):
+        if stat_lines is None:
+            stat_lines = _read_proc_stat()
+        self.user, userNice, self.sys, self.idle = \
+            map(int, stat_lines[0].split()[1:5])
         self.user += userNice
 
 
@@ -69,27 +81,26 @@ class CpuCoreSample(object):
     A sample of the CPU consumption of each core
 
     The sample is taken at initialization time and can't be updated.
+
+    The counters are kept in packed arrays; user[i] and sys[i] are the
+    counters of core cores[i], so samples can be compared column by column.
     """
-    CPU_CORE_STATS_PATTERN = re.compile(r'cpu(\d+)\s+(.*)')
 
-    def __init__(self):
-        self.coresSample = {}
-        with open('/proc/stat') as src:
-            for line in src:
-                match = self.CPU_CORE_STATS_PATTERN.match(line)
-                if match:
-                    coreSample = {}
-                    user, userNice, sys, idle = \
-                        map(int, match.group(2).split()[0:4])
-                    coreSample['user'] = user
-                    coreSample['userNice'] = userNice
-                    coreSample['sys'] = sys
-                    coreSample['idle'] = idle
-                    self.coresSample[match.group(1)] = coreSample
-
-    def getCoreSample(self, coreId):
-        strCoreId = str(coreId)
-        return self.coresSample.get(strCoreId)
+    def __init__(self, stat_lines=None):
+        if stat_lines is None:
+            stat_lines = _read_proc_stat()
+        cores = []
+        self.user = array.array('d')
+        self.sys = array.array('d')
+        # The per core lines follow the "cpu" line, in cpu order.
+        for line in stat_lines[1:]:
+            if not line.startswith('cpu'):
+                break
+            fields = line.split(None, 4)
+            cores.append(int(fields[0][3:]))
+            self.user.append(int(fields[1]))
+            self.sys.append(int(fields[3]))
+        self.cores = tuple(cores)
 
 
 class NumaNodeMemorySample(object):
@@ -161,7 +172,8 @@ class HostSample(object):
         self.timestamp = time.time()
         self.pidcpu = PidCpuSample(pid)
         self.ncpus = os.sysconf('SC_NPROCESSORS_ONLN')
-        self.totcpu = TotalCpuSample()
+        stat_lines = _read_proc_stat()
+        self.totcpu = TotalCpuSample(stat_lines)
         meminfo = utils.readMemInfo()
         freeOrCached = (meminfo['MemFree'] +
                         meminfo['Cached'] + meminfo['Buffers'])
@@ -180,7 +192,7 @@ class HostSample(object):
         except:
             self.thpState = 'never'
         self.hugepages = hugepages.state()
-        self.cpuCores = CpuCoreSample()
+        self.cpuCores = CpuCoreSample(stat_lines)
         self.numaNodeMem = NumaNodeMemorySample()
 
 
@@ -237,6 +249,8 @@ _StatsSample = namedtuple('StatsSample',
 
 
 class StatsSample(_StatsSample):
+    __slots__ = ()
+
     def is_empty(self):
         return (
             self.first_value is None and
@@ -274,12 +288,16 @@ class StatsCache(object):
 
     _log = logging.getLogger("virt.sampling.StatsCache")
 
-    def __init__(self, clock=vdsm.common.time.monotonic_time):
+    def __init__(self, clock=vdsm.common.time.monotonic_time, history=None):
         self._clock = clock
         self._lock = threading.Lock()
         self._samples = SampleWindow(size=2, timefn=self._clock)
+        self._history = history
         self._last_sample_time = 0
-        self._vm_last_timestamp = defaultdict(int)
+        # VMs in the last sample are timestamped by the last sample time,
+        # see _vm_timestamp(). Here we keep the timestamp of VMs added to
+        # the cache or which left the last sample.
+        self._vm_last_timestamp = {}
 
     def add(self, vmid):
         """
@@ -295,7 +313,9 @@ class StatsCache(object):
         Remove any data from the cache related to the given VM.
         """
         with self._lock:
-            del self._vm_last_timestamp[vmid]
+            self._vm_last_timestamp.pop(vmid, None)
+            if self._history is not None:
+                self._history.remove(vmid)
 
     def get(self, vmid):
         """
@@ -303,7 +323,7 @@ class StatsCache(object):
         """
         with self._lock:
             first_batch, last_batch, interval = self._samples.stats()
-            stats_age = self._clock() - self._vm_last_timestamp[vmid]
+            stats_age = self._clock() - self._vm_timestamp(vmid, last_batch)
 
             if first_batch is None:
                 return StatsSample(None, None, None, stats_age)
@@ -319,7 +339,9 @@ class StatsCache(object):
 
     def get_batch(self):
         """
-        Return the available StatSample for the all VMs.
+        Return the available StatSample for the all VMs, as a read only
+        mapping from vmid to StatsSample. The samples are created when
+        accessed.
         """
         with self._lock:
             first_batch, last_batch, interval = self._samples.stats()
@@ -327,15 +349,23 @@ class StatsCache(object):
             if first_batch is None:
                 return None
 
-            ts = self._clock()
-            return {
-                vm_id: StatsSample(
-                    first_batch[vm_id], last_batch[vm_id], interval,
-                    ts - self._vm_last_timestamp[vm_id]
-                )
-                for vm_id in last_batch if (vm_id in first_batch and
-                                            vm_id in self._vm_last_timestamp)
-            }
+            stats_age = self._clock() - self._last_sample_time
+            vm_ids = (six.viewkeys(last_batch) & six.viewkeys(first_batch) &
+                      six.viewkeys(self._vm_last_timestamp))
+            return StatsBatch(first_batch, last_batch, interval, stats_age,
+                              vm_ids)
+
+    def get_history(self, vmid, resolution=None):
+        """
+        Return the rates history of the given VM, as a dict mapping the
+        resolution name to a list of points, oldest first. If resolution is
+        specified, return only this resolution.
+        Return None if the history is disabled.
+        """
+        if self._history is None:
+            return None
+        with self._lock:
+            return self._history.get(vmid, self._clock(), resolution)
 
     def clock(self):
         """
@@ -355,22 +385,193 @@ class StatsCache(object):
         with self._lock:
             last_sample_time = self._last_sample_time
             if monotonic_ts >= last_sample_time:
+                _, prev_stats = self._samples.last()
                 self._samples.append(bulk_stats)
                 self._last_sample_time = monotonic_ts
 
-                self._update_ts(bulk_stats, monotonic_ts)
+                self._update_ts(prev_stats, last_sample_time, bulk_stats,
+                                monotonic_ts)
+                if self._history is not None and prev_stats:
+                    self._history.update(prev_stats, bulk_stats,
+                                         monotonic_ts - last_sample_time,
+                                         monotonic_ts)
             else:
                 self._log.warning(
                     'dropped stale old sample: sampled %f stored %f',
                     monotonic_ts, last_sample_time)
 
-    def _update_ts(self, bulk_stats, monotonic_ts):
-        # FIXME: this is expected to be costly performance-wise.
-        for vmid in bulk_stats:
-            self._vm_last_timestamp[vmid] = monotonic_ts
+    def _update_ts(self, prev_stats, prev_ts, bulk_stats, monotonic_ts):
+        # Update only the VMs leaving or entering the last sample; the set
+        # operations on the dict keys are much cheaper than updating every
+        # VM on every sample.
+        timestamps = self._vm_last_timestamp
+        if prev_stats:
+            for vmid in six.viewkeys(prev_stats) - six.viewkeys(bulk_stats):
+                if vmid in timestamps:
+                    timestamps[vmid] = prev_ts
+        for vmid in six.viewkeys(bulk_stats) - six.viewkeys(timestamps):
+            timestamps[vmid] = monotonic_ts
+
+    def _vm_timestamp(self, vmid, last_batch):
+        ts = self._vm_last_timestamp.get(vmid, 0)
+        if last_batch is not None and vmid in last_batch:
+            # The VM may be added after the last sample was taken.
+            return max(ts, self._last_sample_time)
+        return ts
+
+
+class StatsBatch(Mapping):
+    """
+    Read only mapping of StatsSample for all VMs, returned by
+    StatsCache.get_batch().
+
+    Keep references to the bulk samples, creating the StatsSample for a VM
+    only when accessed.
+    """
+
+    def __init__(self, first_batch, last_batch, interval, stats_age, vm_ids):
+        self._first_batch = first_batch
+        self._last_batch = last_batch
+        self._interval = interval
+        self._stats_age = stats_age
+        self._vm_ids = vm_ids
+
+    def __getitem__(self, vm_id):
+        if vm_id not in self._vm_ids:
+            raise KeyError(vm_id)
+        return StatsSample(self._first_batch[vm_id], self._last_batch[vm_id],
+                           self._interval, self._stats_age)
 
+    def __iter__(self):
+        return iter(self._vm_ids)
+
+    def __len__(self):
+        return len(self._vm_ids)
+
+    def __contains__(self, vm_id):
+        return vm_id in self._vm_ids
+
+
+class StatsHistory(object):
+    """
+    Per-VM history of the rates computed from consecutive bulk stats samples
+    (see vmstats.rates()), kept in several resolutions.
+
+    Each resolution is a tuple (name, period, size). Resolutions with zero
+    period keep the raw rates. Other resolutions keep the average rate during
+    each period, weighted by the sampling interval. A point is added when the
+    period is complete. Every resolution keeps at most size points.
+
+    This class is not thread safe; StatsCache serializes the access.
+    """
+
+    FIELDS = ('cpu', 'netRx', 'netTx', 'diskRead', 'diskWrite')
+
+    def __init__(self, resolutions):
+        self._resolutions = tuple(resolutions)
+        self._series = {}
+
+    @property
+    def resolutions(self):
+        return tuple(name for name, _, _ in self._resolutions)
+
+    def update(self, prev_stats, bulk_stats, interval, timestamp):
+        for vmid in six.viewkeys(prev_stats) & six.viewkeys(bulk_stats):
+            values = vmstats.rates(prev_stats[vmid], bulk_stats[vmid],
+                                   interval)
+            if values is None:
+                continue
+            series = self._series.get(vmid)
+            if series is None:
+                series = [_Series(period, size)
+                          for _, period, size in self._resolutions]
+                self._series[vmid] = series
+            for s in series:
+                s.add(timestamp, interval, values)
+
+    def remove(self, vmid):
+        self._series.pop(vmid, None)
+
+    def get(self, vmid, now, resolution=None):
+        """
+        Return dict mapping resolution name to list of points. Every point is
+        a dict with the rates in FIELDS, and the point age in seconds.
+        Raise ValueError if resolution is unknown.
+        """
+        names = self.resolutions
+        if resolution is not None and resolution not in names:
+            raise ValueError("Unknown resolution %r, expecting one of %s" %
+                             (resolution, names))
+        series = self._series.get(vmid)
+        history = {}
+        for i, name in enumerate(names):
+            if resolution is not None and name != resolution:
+                continue
+            if series is None:
+                history[name] = []
+                continue
+            history[name] = [self._format(point, now)
+                             for point in series[i].points()]
+        return history
+
+    def _format(self, point, now):
+        info = dict(zip(self.FIELDS, point[1:]))
+        info['age'] = max(now - point[0], 0.0)
+        return info
+
+
+class _Series(object):
+    """
+    Fixed size series of (timestamp, value...) points. If period is not zero,
+    average the values added during each period into one point, timestamped
+    by the end of the period.
+    """
 
-stats_cache = StatsCache()
+    __slots__ = ('_period', '_points', '_start', '_elapsed', '_sums')
+
+    def __init__(self, period, size):
+        self._period = period
+        self._points = deque(maxlen=size)
+        self._start = None
+        self._elapsed = 0
+        self._sums = None
+
+    def add(self, timestamp, interval, values):
+        if not self._period:
+            self._points.append((timestamp,) + tuple(values))
+            return
+        start = timestamp - timestamp % self._period
+        if start != self._start:
+            self._flush()
+            self._start = start
+            self._elapsed = 0
+            self._sums = [0] * len(values)
+        self._elapsed += interval
+        for i, value in enumerate(values):
+            self._sums[i] += value * interval
+
+    def points(self):
+        return list(self._points)
+
+    def _flush(self):
+        if self._start is None or self._elapsed <= 0:
+            return
+        self._points.append(
+            (self._start + self._period,) +
+            tuple(s / self._elapsed for s in self._sums))
+
+
+def _create_history():
+    if not config.getboolean('sampling', 'history_enable'):
+        return None
+    return StatsHistory((
+        ('raw', 0, config.getint('sampling', 'history_raw_samples')),
+        ('1m', 60, config.getint('sampling', 'history_1m_samples')),
+        ('5m', 300, config.getint('sampling', 'history_5m_samples')),
+    ))
+
+
+stats_cache = StatsCache(history=_create_history())
 
 
 # this value can be tricky to tune.
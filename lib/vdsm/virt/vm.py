@@ -87,6 +87,7 @@ from vdsm.virt import vmtune
 from vdsm.virt import vmxml
 from vdsm.virt import xmlconstants
 from vdsm.virt.domain_descriptor import DomainDescriptor
+from vdsm.virt.domain_descriptor import DomainDescriptorCache
 from vdsm.virt.domain_descriptor import MutableDomainDescriptor
 from vdsm.virt import vmdevices
 from vdsm.virt.vmdevices import drivename
@@ -339,6 +340,8 @@ class Vm(object):
         self.conf.update(params)
         self._external = params.get('external', False)
         self.arch = cpuarch.effective()
+        self._domain_cache = DomainDescriptorCache(self._fetch_domain_xml)
+        self._stats_memo = vmstats.StatsMemo()
         self._src_domain_xml = params.get('_srcDomXML')
         if self._src_domain_xml is not None:
             self._domain = DomainDescriptor(self._src_domain_xml)
@@ -831,7 +834,7 @@ class Vm(object):
         return mem_size_mb
 
     def hibernate(self, dst):
-        hooks.before_vm_hibernate(self._dom.XMLDesc(0), self._custom)
+        hooks.before_vm_hibernate(self._domain.xml, self._custom)
         fname = self.cif.prepareVolumePath(dst)
         try:
             self._dom.save(fname)
@@ -842,7 +845,7 @@ class Vm(object):
         for dev in self._customDevices():
             hooks.before_device_migrate_source(
                 dev._deviceXML, self._custom, dev.custom)
-        hooks.before_vm_migrate_source(self._dom.XMLDesc(0), self._custom)
+        hooks.before_vm_migrate_source(self._domain.xml, self._custom)
 
     def _startUnderlyingVm(self):
         self.log.debug("Start")
@@ -1160,12 +1163,17 @@ class Vm(object):
                 if (drive.chunked or drive.replicaChunked) and not
                 drive.readonly]
 
-    def _getExtendInfo(self, drive):
+    def _getExtendInfo(self, drive, blockinfo=None):
         """
         Return extension info for a chunked drive or drive replicating to
         chunked replica volume.
+
+        If blockinfo is specified, use it instead of querying libvirt for
+        the drive block info.
         """
-        capacity, alloc, physical = self._dom.blockInfo(drive.path, 0)
+        if blockinfo is None:
+            blockinfo = self._dom.blockInfo(drive.path, 0)
+        capacity, alloc, physical = blockinfo
 
         # Libvirt reports watermarks only for the source drive, but for
         # file-based drives it reports the same alloc and physical, which
@@ -1194,17 +1202,54 @@ class Vm(object):
         Return True if at least one drive is being extended, False otherwise.
         """
         extended = False
+        drives = self.drive_monitor.monitored_drives()
+
+        # With a single drive, a bulk query is not cheaper than blockInfo().
+        if len(drives) > 1:
+            infos = self._query_block_info()
+        else:
+            infos = {}
 
         try:
-            for drive in self.drive_monitor.monitored_drives():
-                if self.extend_drive_if_needed(drive):
+            for drive in drives:
+                if self.extend_drive_if_needed(drive, infos.get(drive.name)):
                     extended = True
         except drivemonitor.ImprobableResizeRequestError:
             return False
 
         return extended
 
-    def extend_drive_if_needed(self, drive):
+    def _query_block_info(self):
+        """
+        Return dict mapping drive name to BlockInfo for all drives, using one
+        bulk stats query instead of one blockInfo() call per drive.
+
+        If the last sample taken by VMBulkstatsMonitor is not older than the
+        drive monitoring interval, use it; otherwise query libvirt. Drives
+        missing in the result must be queried using blockInfo().
+        """
+        sample = sampling.stats_cache.get(self.id)
+        max_age = config.getint('vars', 'vm_watermark_interval')
+        if sample.last_value is not None and sample.stats_age <= max_age:
+            return drivemonitor.block_info_from_stats(sample.last_value)
+
+        if not self._dom.connected:
+            return {}
+
+        try:
+            bulk_stats = self._connection.domainListGetStats(
+                [self._dom._dom], stats=libvirt.VIR_DOMAIN_STATS_BLOCK)
+        except libvirt.libvirtError as e:
+            self.log.warning("Unable to get block stats: %s", e)
+            return {}
+
+        if not bulk_stats:
+            return {}
+
+        _, stats = bulk_stats[0]
+        return drivemonitor.block_info_from_stats(stats)
+
+    def extend_drive_if_needed(self, drive, blockinfo=None):
         """
         Check if a drive should be extended, and start extension flow if
         needed.
@@ -1221,6 +1266,9 @@ class Vm(object):
         - SET: this method should never receive a drive in this state,
                emit warning and exit.
 
+        If blockinfo is specified, use it instead of querying libvirt for
+        the drive block info.
+
         Return True if started an extension flow, False otherwise.
         """
 
@@ -1231,7 +1279,7 @@ class Vm(object):
             return
 
         try:
-            capacity, alloc, physical = self._getExtendInfo(drive)
+            capacity, alloc, physical = self._getExtendInfo(drive, blockinfo)
         except libvirt.libvirtError as e:
             self.log.error("Unable to get watermarks for drive %s: %s",
                            drive.name, e)
@@ -1739,10 +1787,13 @@ class Vm(object):
                 ] + self._build_device_conf_from_objects(self._devices)
             return ret
 
-    def getStats(self):
+    def getStats(self, groups=None):
         """
         Used by vdsm.API.Vm.getStats.
 
+        If groups is specified, compute only these vmstats groups (see
+        vmstats.GROUPS). Other stats are always reported.
+
         WARNING: This method should only gather statistics by copying data.
         Especially avoid costly and dangerous direct calls to the _dom
         attribute. Use the periodic operations instead!
@@ -1759,7 +1810,7 @@ class Vm(object):
                 stats['migrationProgress'] = self._get_vm_migration_progress()
                 stats.update(self._getVmPauseCodeStats())
             else:
-                stats.update(self._getRunningVmStats())
+                stats.update(self._getRunningVmStats(groups))
                 oga_stats = self._getGuestStats()
                 if 'memoryStats' in stats and 'memoryStats' in oga_stats:
                     # prefer balloon stats over OGA stats
@@ -1795,7 +1846,7 @@ class Vm(object):
             'acpiEnable': 'true' if self.acpi_enabled() else 'false'}
         return stats
 
-    def _getRunningVmStats(self):
+    def _getRunningVmStats(self, groups=None):
         """
         gathers all the stats which can change while a VM is running.
         """
@@ -1823,7 +1874,9 @@ class Vm(object):
             decStats = vmstats.produce(self,
                                        vm_sample.first_value,
                                        vm_sample.last_value,
-                                       vm_sample.interval)
+                                       vm_sample.interval,
+                                       groups=groups,
+                                       memo=self._stats_memo)
             if monitorable:
                 self._setUnresponsiveIfTimeout(stats, vm_sample.stats_age)
         except Exception:
@@ -1844,6 +1897,16 @@ class Vm(object):
         stats.update(self._getVmTuneStats())
         return stats
 
+    def stats_history(self, resolution=None):
+        try:
+            history = sampling.stats_cache.get_history(self.id, resolution)
+        except ValueError as e:
+            raise exception.UnsupportedOperation(str(e), vmId=self.id)
+        if history is None:
+            raise exception.UnsupportedOperation(
+                "VM stats history is disabled", vmId=self.id)
+        return history
+
     def _getVmTuneStats(self):
         stats = {}
 
@@ -2850,7 +2913,8 @@ class Vm(object):
                 self._update_metadata()
                 dom.createWithFlags(flags)
                 self._dom = virdomain.Notifying(dom, self._timeoutExperienced)
-                hooks.after_vm_start(self._dom.XMLDesc(0), self._custom)
+                self._updateDomainDescriptor()
+                hooks.after_vm_start(self._domain.xml, self._custom)
                 for dev in self._customDevices():
                     hooks.after_device_create(dev._deviceXML, self._custom,
                                               dev.custom)
@@ -3824,6 +3888,8 @@ class Vm(object):
 
             self._updateDomainDescriptor()
             vmdevices.storage.Drive.update_device_info(self, device_conf)
+            # The new drive has no block threshold yet.
+            self.drive_monitor.schedule()
             hooks.after_disk_hotplug(driveXml, self._custom,
                                      params=drive.custom)
 
@@ -3877,6 +3943,7 @@ class Vm(object):
             return response.error('hotunplugDisk', str(e))
         else:
             self._devices[hwclass.DISK].remove(drive)
+            self.drive_monitor.remove_drive(drive)
 
             # Find and remove disk device from vm's conf
             for dev in self.conf['devices'][:]:
@@ -3972,11 +4039,27 @@ class Vm(object):
         with utils.stopwatch("Hotunplug %r" % device):
             deadline = (vdsm.common.time.monotonic_time() +
                         config.getfloat('vars', 'hotunplug_timeout'))
-            sleep_time = config.getfloat('vars', 'hotunplug_check_interval')
-            while device.is_attached_to(self._dom.XMLDesc(0)):
-                time.sleep(sleep_time)
-                if vdsm.common.time.monotonic_time() > deadline:
+            check_interval = config.getfloat('vars',
+                                             'hotunplug_check_interval')
+            # The device was detached, so the cached xml is stale. Later the
+            # xml is fetched when a DEVICE_REMOVED event invalidates it, or
+            # if no event was received, after an increasing interval.
+            self._updateDomainDescriptor()
+            while True:
+                version = self._domain_cache.version
+                if not device.is_attached_to(self._domain.xml):
+                    break
+                remaining = deadline - vdsm.common.time.monotonic_time()
+                if remaining <= 0:
                     raise HotunplugTimeout("Timeout detaching %r" % device)
+                timeout = min(check_interval, remaining)
+                if not self._domain_cache.wait_for_change(version, timeout):
+                    if timeout < check_interval:
+                        # Waited until the deadline without an event.
+                        raise HotunplugTimeout(
+                            "Timeout detaching %r" % device)
+                    self._updateDomainDescriptor()
+                    check_interval *= 2
 
     def _readPauseCode(self):
         state, reason = self._dom.state(0)
@@ -4034,7 +4117,7 @@ class Vm(object):
             self.cont()
             fromSnapshot = self._altered_state.from_snapshot
             self._altered_state = _AlteredState()
-            hooks.after_vm_dehibernate(self._dom.XMLDesc(0), self._custom,
+            hooks.after_vm_dehibernate(self._domain.xml, self._custom,
                                        {'FROM_SNAPSHOT': fromSnapshot})
             self._syncGuestTime()
         elif self._altered_state.origin == _MIGRATION_ORIGIN:
@@ -4052,7 +4135,7 @@ class Vm(object):
             self._domDependentInit()
             self._altered_state = _AlteredState()
             hooks.after_vm_migrate_destination(
-                self._dom.XMLDesc(0), self._custom)
+                self._domain.xml, self._custom)
 
             for dev in self._customDevices():
                 hooks.after_device_migrate_destination(
@@ -4152,11 +4235,11 @@ class Vm(object):
                 self.log.info("Failed to make VM persistent: %s'", e)
 
     def _underlyingCont(self):
-        hooks.before_vm_cont(self._dom.XMLDesc(0), self._custom)
+        hooks.before_vm_cont(self._domain.xml, self._custom)
         self._dom.resume()
 
     def _underlyingPause(self):
-        hooks.before_vm_pause(self._dom.XMLDesc(0), self._custom)
+        hooks.before_vm_pause(self._domain.xml, self._custom)
         self._dom.suspend()
 
     def _findDriveByUUIDs(self, drive):
@@ -5084,9 +5167,36 @@ class Vm(object):
     def name(self):
         return self._domain.name
 
+    @property
+    def _domain(self):
+        """
+        The cached domain descriptor. If the domain xml cannot be fetched,
+        for example when the domain is not running, the last known
+        descriptor is returned.
+        """
+        try:
+            return self._domain_cache.get()
+        except (virdomain.NotConnectedError, libvirt.libvirtError) as e:
+            self.log.debug("Using last known domain xml: %s", e)
+            return self._domain_cache.last
+
+    @_domain.setter
+    def _domain(self, desc):
+        self._domain_cache.set(desc)
+
+    def _fetch_domain_xml(self):
+        return self._dom.XMLDesc(0)
+
     def _updateDomainDescriptor(self, xml=None):
-        domxml = self._dom.XMLDesc(0) if xml is None else xml
-        self._domain = DomainDescriptor(domxml)
+        """
+        Update the domain descriptor after the domain was modified. If xml is
+        not specified, the domain xml is fetched from libvirt on the next
+        access to the descriptor, so several updates cost one fetch.
+        """
+        if xml is None:
+            self._domain_cache.invalidate()
+        else:
+            self._domain = DomainDescriptor(xml)
 
     def _updateMetadataDescriptor(self):
         # load will overwrite any existing content, as per doc.
@@ -5424,6 +5534,11 @@ class Vm(object):
     def onLibvirtLifecycleEvent(self, event, detail, opaque):
         self.log.debug('event %s detail %s opaque %s',
                        eventToString(event), detail, opaque)
+        # The xml of a domain that stopped is not interesting, and fetching
+        # it would fail.
+        if event not in (libvirt.VIR_DOMAIN_EVENT_STOPPED,
+                         libvirt.VIR_DOMAIN_EVENT_UNDEFINED):
+            self._updateDomainDescriptor()
         if event == libvirt.VIR_DOMAIN_EVENT_STOPPED:
             if (detail == libvirt.VIR_DOMAIN_EVENT_STOPPED_MIGRATED and
                     self.lastStatus == vmstatus.MIGRATION_SOURCE):
@@ -5460,12 +5575,8 @@ class Vm(object):
                 # when migration completes, see qemuMigrationFinish function).
                 # In this case self._dom is disconnected because the function
                 # _completeIncomingMigration didn't update it yet.
-                try:
-                    domxml = self._dom.XMLDesc(0)
-                except virdomain.NotConnectedError:
-                    pass
-                else:
-                    hooks.after_vm_pause(domxml, self._custom)
+                if self._dom.connected:
+                    hooks.after_vm_pause(self._domain.xml, self._custom)
             elif detail == libvirt.VIR_DOMAIN_EVENT_SUSPENDED_POSTCOPY:
                 self._post_copy = migration.PostCopyPhase.RUNNING
                 self.log.debug("Migration entered post-copy mode")
@@ -5484,12 +5595,8 @@ class Vm(object):
                 # creating self._dom.
                 # The event handler delivers the domain instance in the
                 # callback however we do not use it.
-                try:
-                    domxml = self._dom.XMLDesc(0)
-                except virdomain.NotConnectedError:
-                    pass
-                else:
-                    hooks.after_vm_cont(domxml, self._custom)
+                if self._dom.connected:
+                    hooks.after_vm_cont(self._domain.xml, self._custom)
             elif detail == libvirt.VIR_DOMAIN_EVENT_RESUMED_MIGRATED:
                 if self.lastStatus == vmstatus.MIGRATION_DESTINATION:
                     self._incoming_migration_vm_running.set()
@@ -5986,6 +6093,8 @@ class Vm(object):
             drive.volumeID = volumeID
             drive.volumeInfo = volInfo
             update_active_path(drive.volumeChain, volumeID, activePath)
+            # Changing the path unset the drive block threshold.
+            self.drive_monitor.schedule()
 
         # Remove any components of the volumeChain which are no longer present
         drive.volumeChain = clean_volume_chain(drive.volumeChain, volumes)
@@ -6029,6 +6138,8 @@ class Vm(object):
 
     def onDeviceRemoved(self, device_alias):
         self.log.info("Device removal reported: %s", device_alias)
+        # Wakes up _waitForDeviceRemoval().
+        self._updateDomainDescriptor()
 
         # We currently hotunplug all devices synchronously, except for memory.
         device_hwclass = hwclass.MEMORY
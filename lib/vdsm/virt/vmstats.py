@@ -22,6 +22,7 @@ from __future__ import division
 
 import contextlib
 import logging
+import threading
 
 import six
 
@@ -34,24 +35,114 @@ from vdsm.virt.utils import isVdsmImage
 _log = logging.getLogger('virt.vmstats')
 
 
-def produce(vm, first_sample, last_sample, interval):
+# Stats groups, computed independently by produce().
+CPU = 'cpu'
+NETWORK = 'network'
+DISKS = 'disks'
+BALLOON = 'balloon'
+TUNE_IO = 'tuneio'
+MEMORY = 'memory'
+
+GROUPS = (CPU, NETWORK, DISKS, BALLOON, TUNE_IO, MEMORY)
+
+# Groups computed only from the samples, which do not change until the next
+# sampling. The network, disks, balloon and ioTune stats depend also on the
+# vm state, for example the nics and the drive sizes, so they are always
+# computed.
+_MEMOIZED_GROUPS = frozenset([CPU, MEMORY])
+
+
+def produce(vm, first_sample, last_sample, interval, groups=None,
+            memo=None):
     """
     Translates vm samples into stats.
+
+    Only the stats groups in `groups' are computed, or all groups if
+    `groups' is None. If a StatsMemo is specified, groups computed only
+    from the samples are computed once for the same samples.
     """
 
     stats = {}
 
-    cpu(stats, first_sample, last_sample, interval)
-    networks(vm, stats, first_sample, last_sample, interval)
-    disks(vm, stats, first_sample, last_sample, interval)
-    balloon(vm, stats, last_sample)
-    cpu_count(stats, last_sample)
-    tune_io(vm, stats)
-    memory(stats, first_sample, last_sample, interval)
+    for group in GROUPS:
+        if groups is not None and group not in groups:
+            continue
+        if memo is not None and group in _MEMOIZED_GROUPS:
+            group_stats = memo.get(
+                group, first_sample, last_sample,
+                lambda: _produce_group(
+                    group, vm, first_sample, last_sample, interval))
+        else:
+            group_stats = _produce_group(
+                group, vm, first_sample, last_sample, interval)
+        stats.update(group_stats)
 
     return stats
 
 
+def _produce_group(group, vm, first_sample, last_sample, interval):
+    stats = {}
+    if group == CPU:
+        cpu(stats, first_sample, last_sample, interval)
+        cpu_count(stats, last_sample)
+    elif group == NETWORK:
+        networks(vm, stats, first_sample, last_sample, interval)
+    elif group == DISKS:
+        disks(vm, stats, first_sample, last_sample, interval)
+    elif group == BALLOON:
+        balloon(vm, stats, last_sample)
+    elif group == TUNE_IO:
+        tune_io(vm, stats)
+    elif group == MEMORY:
+        memory(stats, first_sample, last_sample, interval)
+    return stats
+
+
+class StatsMemo(object):
+    """
+    Keep the stats groups computed from the last samples of a vm, so
+    repeated requests during one sampling interval do not compute the same
+    stats again. The kept stats are dropped when new samples are used.
+
+    The returned stats are shared, and must not be modified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._first_sample = None
+        self._last_sample = None
+        self._groups = {}
+
+    def get(self, group, first_sample, last_sample, compute):
+        """
+        Return the stats of group for the given samples, calling compute()
+        if they were not computed yet.
+        """
+        with self._lock:
+            if self._same_samples(first_sample, last_sample):
+                try:
+                    return self._groups[group]
+                except KeyError:
+                    pass
+
+        group_stats = compute()
+
+        with self._lock:
+            if not self._same_samples(first_sample, last_sample):
+                self._first_sample = first_sample
+                self._last_sample = last_sample
+                self._groups = {}
+            self._groups[group] = group_stats
+
+        return group_stats
+
+    def _same_samples(self, first_sample, last_sample):
+        # Samples are compared by identity; the stats cache keeps the same
+        # objects until the next sampling.
+        return (first_sample is self._first_sample and
+                last_sample is self._last_sample)
+
+
 def translate(vm_stats):
     stats = {}
 
@@ -76,6 +167,43 @@ def translate(vm_stats):
     return stats
 
 
+def rates(first_sample, last_sample, interval):
+    """
+    Compute the rates kept in the stats history from two bulk stats samples
+    of the same VM.
+    Return a tuple (cpu, net_rx, net_tx, disk_read, disk_write), where cpu
+    is the total cpu usage in percent, and the rest are the total network and
+    disk throughput of all devices in bytes per second.
+    Devices are matched by name, since the indexes may change between
+    samples; devices missing in one of the samples are skipped.
+    Return None if the cpu time is missing or the interval is invalid.
+    """
+    if interval <= 0:
+        return None
+
+    try:
+        cpu_time = last_sample['cpu.time'] - first_sample['cpu.time']
+    except KeyError:
+        return None
+
+    first_nets = _find_bulk_stats_reverse_map(first_sample, 'net')
+    last_nets = _find_bulk_stats_reverse_map(last_sample, 'net')
+    first_blocks = _find_bulk_stats_reverse_map(first_sample, 'block')
+    last_blocks = _find_bulk_stats_reverse_map(last_sample, 'block')
+
+    return (
+        _usage_percentage(max(cpu_time, 0), interval),
+        _total_rate(first_sample, first_nets, last_sample, last_nets,
+                    'net.%d.rx.bytes', interval),
+        _total_rate(first_sample, first_nets, last_sample, last_nets,
+                    'net.%d.tx.bytes', interval),
+        _total_rate(first_sample, first_blocks, last_sample, last_blocks,
+                    'block.%d.rd.bytes', interval),
+        _total_rate(first_sample, first_blocks, last_sample, last_blocks,
+                    'block.%d.wr.bytes', interval),
+    )
+
+
 def tune_io(vm, stats):
     """
     Collect the current ioTune settings for all disks VDSM knows about.
@@ -411,6 +539,22 @@ def _usage_percentage(val, interval):
     return 100 * val / interval / 1000 ** 3
 
 
+def _total_rate(first_sample, first_indexes, last_sample, last_indexes,
+                key, interval):
+    total = 0
+    for name, last_index in six.iteritems(last_indexes):
+        if name not in first_indexes:
+            continue
+        try:
+            delta = (last_sample[key % last_index] -
+                     first_sample[key % first_indexes[name]])
+        except KeyError:
+            continue
+        # Counters are reset if the device was replaced.
+        total += max(delta, 0)
+    return total / interval
+
+
 def _find_bulk_stats_reverse_map(stats, group):
     name_to_idx = {}
     for idx in six.moves.xrange(stats.get('%s.count' % group, 0)):
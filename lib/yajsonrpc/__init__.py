@@ -258,6 +258,10 @@ class JsonRpcTask(object):
         self._ctx = ctx
         self._req = req
 
+    @property
+    def method(self):
+        return self._req.method
+
     def __call__(self):
         self._handler(self._ctx, self._req)
 
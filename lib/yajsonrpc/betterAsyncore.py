@@ -139,6 +139,32 @@ class Dispatcher(asyncore.dispatcher):
             self.handle_close()
             return ''
 
+    def recv_into(self, buffer):
+        """
+        Like recv(), but read data into buffer, avoiding allocation of a new
+        string for every read. Return the number of bytes read, 0 if the
+        connection was closed, or None if no data is available.
+        """
+        try:
+            nbytes = self.socket.recv_into(buffer)
+            if nbytes == 0:
+                # a closed connection is indicated by signaling
+                # a read condition, and having recv_into() return 0.
+                self.handle_close()
+            return nbytes
+        except socket.error as why:
+            if why.args[0] in _BLOCKING_IO_ERRORS:
+                return None
+            elif why.args[0] in asyncore._DISCONNECTED:
+                self.handle_close()
+                return 0
+            else:
+                raise
+        except sslutils.SSLError as e:
+            self._log.debug('SSL error receiving from %s: %s', self, e)
+            self.handle_close()
+            return 0
+
     def send(self, data):
         try:
             result = self.socket.send(data)
@@ -40,6 +40,10 @@ NR_RETRIES = 1
 # This is the value used by engine
 GRACE_PERIOD_FACTOR = 0.2
 
+# Frames bigger than this are rejected, so a peer cannot make us allocate
+# unbounded memory.
+MAX_FRAME_SIZE = 64 * 1024**2
+
 _RE_ESCAPE_SEQUENCE = re.compile(br"\\(.)")
 
 _RE_ENCODE_CHARS = re.compile(br"[\r\n\\:]")
@@ -105,6 +109,10 @@ class Disconnected(RuntimeError):
     pass
 
 
+class FrameTooLarge(RuntimeError):
+    pass
+
+
 class _HeartBeatFrame(object):
     def encode(self):
         return "\n"
@@ -185,11 +193,30 @@ def encodeValue(s):
 
 
 class Parser(object):
+    """
+    Parse STOMP frames from a stream of bytes.
+
+    Data is read directly into the parser buffer using read_from(), or
+    appended using parse(). The buffer is reused for all frames. Command and
+    header lines are located in the buffer without copying the data, and
+    when a frame has a content-length header, the parser waits until the
+    entire body was received, without scanning it. The body is copied once,
+    when creating the frame.
+
+    The buffer grows only as data is received. Frames bigger than
+    max_frame_size bytes raise FrameTooLarge.
+    """
     _STATE_CMD = "Parsing command"
     _STATE_HEADER = "Parsing headers"
     _STATE_BODY = "Receiving body"
 
-    def __init__(self):
+    # Initial buffer size, and the size the buffer is shrinked to after
+    # receiving a frame larger than _MAX_IDLE_BUFFER.
+    _BUFFER_SIZE = 64 * 1024
+    _MAX_IDLE_BUFFER = 1024**2
+
+    def __init__(self, max_frame_size=MAX_FRAME_SIZE):
+        self._max_frame_size = max_frame_size
         self._states = {
             self._STATE_CMD: self._parse_command,
             self._STATE_HEADER: self._parse_header,
@@ -197,39 +224,66 @@ class Parser(object):
         self._frames = deque()
         self._change_state(self._STATE_CMD)
         self._contentLength = -1
-        self._flush()
+        self._buffer = bytearray(self._BUFFER_SIZE)
+        # Unparsed data is self._buffer[self._start:self._end].
+        self._start = 0
+        self._end = 0
+        # Offset where searching for the next terminator should start, to
+        # avoid scanning the same data again.
+        self._scanned = 0
 
     def _change_state(self, new_state):
         self._state = new_state
         self._state_cb = self._states[new_state]
 
-    def _flush(self):
-        self._buffer = ""
+    def _reserve(self, size):
+        """
+        Make sure there are at least size free bytes at the end of the
+        buffer. The buffer is at least doubled when it grows, so a large
+        frame is moved only a few times while it is received.
+        """
+        unparsed = self._end - self._start
+        if len(self._buffer) - self._end >= size:
+            return
+
+        if unparsed == 0 and len(self._buffer) > self._MAX_IDLE_BUFFER:
+            self._buffer = bytearray(self._BUFFER_SIZE)
+        elif self._start > 0:
+            self._buffer[:unparsed] = self._buffer[self._start:self._end]
 
-    def _write_buffer(self, buff):
-        self._buffer += buff
+        self._scanned -= self._start
+        self._start = 0
+        self._end = unparsed
 
-    def _get_buffer(self):
-        return self._buffer
+        missing = size - (len(self._buffer) - self._end)
+        if missing > 0:
+            self._buffer.extend(bytearray(max(missing, len(self._buffer))))
 
     def _handle_terminator(self, term):
-        res, sep, rest = self._buffer.partition(term)
-        if not sep:
+        """
+        Return the data up to term, excluding term, or None if term was not
+        received yet.
+        """
+        pos = self._buffer.find(
+            term, max(self._start, self._scanned), self._end)
+        if pos == -1:
+            self._scanned = self._end
             return None
 
-        self._buffer = rest
-
+        res = memoryview(self._buffer)[self._start:pos].tobytes()
+        self._start = pos + 1
+        self._scanned = self._start
         return res
 
     def _parse_command(self):
-        cmd = self._handle_terminator('\n')
+        cmd = self._handle_terminator(b'\n')
         if cmd is None:
             return False
 
-        if len(cmd) > 0 and cmd[-1] == '\r':
+        if cmd.endswith(b'\r'):
             cmd = cmd[:-1]
 
-        if cmd == "":
+        if cmd == b"":
             return True
 
         cmd = decodeValue(cmd)
@@ -239,20 +293,24 @@ class Parser(object):
         return True
 
     def _parse_header(self):
-        header = self._handle_terminator('\n')
+        header = self._handle_terminator(b'\n')
         if header is None:
             return False
 
-        if len(header) > 0 and header[-1] == '\r':
+        if header.endswith(b'\r'):
             header = header[:-1]
 
         headers = self._tmpFrame.headers
-        if header == "":
+        if header == b"":
             self._contentLength = int(headers.get('content-length', -1))
+            if self._contentLength >= self._max_frame_size:
+                raise FrameTooLarge(
+                    "Frame content-length %d exceeds the maximum frame size"
+                    " %d" % (self._contentLength, self._max_frame_size))
             self._change_state(self._STATE_BODY)
             return True
 
-        key, value = header.split(":", 1)
+        key, value = header.split(b":", 1)
         key = decodeValue(key)
         value = decodeValue(value)
 
@@ -277,7 +335,7 @@ class Parser(object):
             return self._parse_body_terminator()
 
     def _parse_body_terminator(self):
-        body = self._handle_terminator('\0')
+        body = self._handle_terminator(b'\0')
         if body is None:
             return False
 
@@ -286,18 +344,17 @@ class Parser(object):
         return True
 
     def _parse_body_length(self):
-        buf = self._get_buffer()
         cl = self._contentLength
-        ndata = len(buf)
-        if ndata < (cl + 1):
+        if self._end - self._start < cl + 1:
             return False
 
-        if buf[cl] != "\0":
+        end = self._start + cl
+        if self._buffer[end] != 0:
             raise RuntimeError("Frame end is missing \\0")
 
-        self._flush()
-        self._write_buffer(buf[cl + 1:])
-        body = buf[:cl]
+        body = memoryview(self._buffer)[self._start:end].tobytes()
+        self._start = end + 1
+        self._scanned = self._start
 
         self._tmpFrame.body = body
         self._pushFrame()
@@ -309,9 +366,30 @@ class Parser(object):
         return len(self._frames)
 
     def parse(self, data):
-        self._write_buffer(data)
-        while self._state_cb():
-            pass
+        self._reserve(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+        self._parse()
+
+    def read_from(self, recv_into, size):
+        """
+        Read up to size bytes directly into the parser buffer by calling
+        recv_into(buffer), and parse the data.
+
+        Return the value returned by recv_into(), the number of bytes read,
+        or None or 0 if no data was read.
+        """
+        self._reserve(size)
+        view = memoryview(self._buffer)[self._end:self._end + size]
+        try:
+            nbytes = recv_into(view)
+        finally:
+            # The buffer cannot be resized while a view exists.
+            del view
+        if nbytes:
+            self._end += nbytes
+            self._parse()
+        return nbytes
 
     def popFrame(self):
         try:
@@ -319,6 +397,15 @@ class Parser(object):
         except IndexError:
             return None
 
+    def _parse(self):
+        while self._state_cb():
+            pass
+        # Unparsed data is the part of the current frame received so far.
+        if self._end - self._start > self._max_frame_size:
+            raise FrameTooLarge(
+                "Frame exceeds the maximum frame size %d" %
+                self._max_frame_size)
+
 
 class AsyncDispatcher(object):
     log = logging.getLogger("stomp.AsyncDispatcher")
@@ -399,16 +486,15 @@ class AsyncDispatcher(object):
 
         while todo:
             try:
-                data = dispatcher.recv(todo)
+                nbytes = parser.read_from(dispatcher.recv_into, todo)
             except socket.error:
                 dispatcher.handle_error()
                 return
 
             # When a socket is closed data is not available so we do not
             # need to parse it.
-            if not data:
+            if not nbytes:
                 return
-            parser.parse(data)
             todo = pending()
 
         while parser.pending > 0:
@@ -503,7 +589,8 @@ class AsyncDispatcher(object):
 
             self._update_outgoing_heartbeat()
             if numSent < len(data):
-                self._outbuf = data[numSent:]
+                # Avoid copying the rest of the frame.
+                self._outbuf = memoryview(data)[numSent:]
                 return
 
             self._outbuf = None
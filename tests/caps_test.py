@@ -291,3 +291,119 @@ class TestCaps(TestCaseBase):
         self.assertEqual(t.sockets, 1)
         self.assertEqual(t.online_cpus,
                          ['0', '1', '2', '3', '4', '5', '6', '7'])
+
+
+class FakeSection(object):
+
+    def __init__(self, value, stamp=0):
+        self.value = value
+        self.stamp = stamp
+        self.collected = 0
+
+    def collect(self):
+        self.collected += 1
+        return dict(self.value)
+
+    def get_stamp(self):
+        return self.stamp
+
+
+class TestCapsCache(TestCaseBase):
+
+    def setUp(self):
+        self.static = FakeSection({'a': 1})
+        self.volatile = FakeSection({'b': {'c': 2}})
+        self.cache = caps.Cache([
+            caps.Section('static', self.static.collect,
+                         stamp=self.static.get_stamp),
+            caps.Section('volatile', self.volatile.collect),
+        ], clock=lambda: 1)
+
+    def test_get(self):
+        c = self.cache.get()
+        self.assertEqual(c, {'a': 1, 'b': {'c': 2}, 'capsGeneration': 1002})
+
+    def test_collect_once(self):
+        self.cache.get()
+        self.cache.get()
+        self.assertEqual(self.static.collected, 1)
+        self.assertEqual(self.volatile.collected, 2)
+
+    def test_stamp_changed(self):
+        self.cache.get()
+        self.static.stamp = 1
+        self.cache.get()
+        self.assertEqual(self.static.collected, 2)
+
+    def test_no_stamp(self):
+        self.static.stamp = None
+        self.cache.get()
+        self.cache.get()
+        self.assertEqual(self.static.collected, 2)
+
+    def test_unchanged(self):
+        c1 = self.cache.get()
+        self.static.stamp = 1
+        c2 = self.cache.get()
+        self.assertEqual(c1['capsGeneration'], c2['capsGeneration'])
+        self.assertEqual(self.cache.get(since=c2['capsGeneration']),
+                         {'capsGeneration': c2['capsGeneration']})
+
+    def test_since(self):
+        c1 = self.cache.get()
+        self.volatile.value = {'b': 3}
+        c2 = self.cache.get(since=c1['capsGeneration'])
+        self.assertEqual(c2, {'b': 3, 'capsGeneration': 1003})
+
+    def test_since_previous_instance(self):
+        c = self.cache.get(since=500)
+        self.assertEqual(c, {'a': 1, 'b': {'c': 2}, 'capsGeneration': 1002})
+
+    def test_since_future(self):
+        c = self.cache.get(since=2000)
+        self.assertEqual(c, {'a': 1, 'b': {'c': 2}, 'capsGeneration': 1002})
+
+    def test_modify(self):
+        def modify(c):
+            c['a'] = 2
+            c['d'] = 4
+            return c
+        c = self.cache.get(modify=modify)
+        self.assertEqual(c, {'a': 2, 'b': {'c': 2}, 'd': 4,
+                             'capsGeneration': 1002})
+
+    def test_modify_since(self):
+        c1 = self.cache.get()
+        modified = []
+
+        def modify(c):
+            modified.append(dict(c))
+            c['d'] = 4
+            return c
+        c2 = self.cache.get(since=c1['capsGeneration'], modify=modify)
+        # Modified with all capabilities, reporting only the changes.
+        self.assertEqual(modified, [{'a': 1, 'b': {'c': 2}}])
+        self.assertEqual(c2, {'d': 4, 'capsGeneration': 1002})
+
+    def test_modify_unmodified_section(self):
+        c1 = self.cache.get()
+
+        def modify(c):
+            c['a'] = 2
+            return c
+        c2 = self.cache.get(since=c1['capsGeneration'], modify=modify)
+        self.assertEqual(c2, {'a': 2, 'capsGeneration': 1002})
+
+    def test_stamp_error(self):
+        def fail():
+            raise RuntimeError("no stamp")
+        section = FakeSection({'a': 1})
+        cache = caps.Cache([caps.Section('fail', section.collect,
+                                         stamp=fail)])
+        cache.get()
+        cache.get()
+        self.assertEqual(section.collected, 2)
+
+    def test_modify_result(self):
+        self.cache.get()['b']['c'] = 4
+        self.assertEqual(self.cache.get()['b'], {'c': 2})
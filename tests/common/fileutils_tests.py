@@ -74,3 +74,30 @@ class AtomicFileWriteTest(TestCaseBase):
         with open(path) as f:
             content = f.read()
             self.assertEqual(content, expected_content)
+
+
+class StatStampTest(TestCaseBase):
+
+    def test_missing(self):
+        with namedTemporaryDir() as tmp_dir:
+            path = os.path.join(tmp_dir, 'missing')
+            self.assertEqual(fileutils.stat_stamp([path]), (None,))
+
+    def test_modified(self):
+        with namedTemporaryDir() as tmp_dir:
+            path = os.path.join(tmp_dir, 'file')
+            with open(path, 'w') as f:
+                f.write('a')
+            os.utime(path, (1000, 1000))
+            stamp = fileutils.stat_stamp([path])
+
+            with open(path, 'w') as f:
+                f.write('ab')
+            os.utime(path, (1000, 1000))
+            self.assertNotEqual(fileutils.stat_stamp([path]), stamp)
+
+    def test_modified_recently(self):
+        with namedTemporaryDir() as tmp_dir:
+            path = os.path.join(tmp_dir, 'file')
+            fileutils.touch_file(path)
+            self.assertIsNone(fileutils.stat_stamp([path]))
@@ -0,0 +1,63 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import pytest
+
+from vdsm.common import histogram
+
+
+def test_empty():
+    h = histogram.Histogram(bounds=(1, 10))
+    assert h.info() == {
+        "count": 0,
+        "total": 0,
+        "max": 0,
+        "buckets": {"1": 0, "10": 0, "inf": 0},
+    }
+
+
+def test_add():
+    h = histogram.Histogram(bounds=(1, 10))
+    for value in (0.5, 1, 2, 10, 11, 100):
+        h.add(value)
+    assert h.info() == {
+        "count": 6,
+        "total": 124.5,
+        "max": 100,
+        "buckets": {"1": 2, "10": 2, "inf": 2},
+    }
+
+
+def test_default_bounds():
+    h = histogram.Histogram()
+    assert h.bounds == histogram.DEFAULT_BOUNDS
+
+
+def test_unsorted_bounds():
+    with pytest.raises(ValueError):
+        histogram.Histogram(bounds=(10, 1))
+
+
+def test_repr():
+    h = histogram.Histogram(bounds=(1,))
+    h.add(2)
+    assert repr(h) == "<Histogram count=1 total=2 max=2>"
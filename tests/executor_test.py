@@ -264,6 +264,116 @@ class ExecutorTests(TestCaseBase):
             for (level, text, _) in log.messages))
 
 
+class ExecutorTaskClassesTests(TestCaseBase):
+
+    def setUp(self):
+        self.scheduler = schedule.Scheduler()
+        self.scheduler.start()
+        self.executor = executor.Executor(
+            'test',
+            workers_count=2,
+            max_tasks=10,
+            scheduler=self.scheduler,
+            task_classes=[executor.TaskClass('fast', 1, 5)])
+        self.executor.start()
+        time.sleep(0.1)  # Give time to start all threads
+
+    def tearDown(self):
+        self.executor.stop()
+        self.scheduler.stop()
+
+    def test_unknown_class(self):
+        with self.assertRaises(ValueError):
+            self.executor.dispatch(Task(), task_class='unknown')
+
+    def test_duplicate_class(self):
+        with self.assertRaises(ValueError):
+            executor.Executor(
+                'test', 2, 10, None,
+                task_classes=[executor.TaskClass(executor.DEFAULT, 1, 5)])
+
+    def test_class_queue_bounded(self):
+        blocked = threading.Event()
+        try:
+            # Block all workers.
+            barrier = concurrent.Barrier(2)
+            self.executor.dispatch(
+                Task(event=blocked, start_barrier=barrier), task_class='fast')
+            barrier.wait(3)
+            barrier = concurrent.Barrier(3)
+            for i in range(2):
+                self.executor.dispatch(
+                    Task(event=blocked, start_barrier=barrier))
+            barrier.wait(3)
+            for i in range(5):
+                self.executor.dispatch(Task(), task_class='fast')
+            with self.assertRaises(exception.ResourceExhausted):
+                self.executor.dispatch(Task(), task_class='fast')
+            # The default class queue is not affected.
+            self.executor.dispatch(Task())
+        finally:
+            blocked.set()
+
+    def test_fast_not_blocked_by_slow_tasks(self):
+        blocked = threading.Event()
+        try:
+            barrier = concurrent.Barrier(3)
+            # Block the default class workers and fill their queue.
+            for i in range(2):
+                self.executor.dispatch(
+                    Task(event=blocked, start_barrier=barrier))
+            barrier.wait(3)
+            slow_tasks = [Task() for i in range(10)]
+            for task in slow_tasks:
+                self.executor.dispatch(task)
+
+            task = Task()
+            self.executor.dispatch(task, task_class='fast')
+            self.assertTrue(task.executed.wait(1))
+
+            # The fast worker does not steal tasks from the default class.
+            self.assertEqual([t for t in slow_tasks if t.started.is_set()],
+                             [])
+        finally:
+            blocked.set()
+        self.assertFalse([t for t in slow_tasks if not t.executed.wait(1)])
+
+    def test_steal_from_higher_priority(self):
+        blocked = threading.Event()
+        try:
+            barrier = concurrent.Barrier(2)
+            # Block the fast class worker.
+            self.executor.dispatch(
+                Task(event=blocked, start_barrier=barrier), task_class='fast')
+            barrier.wait(3)
+            # The default workers are idle and run the fast tasks.
+            tasks = [Task() for i in range(4)]
+            for task in tasks:
+                self.executor.dispatch(task, task_class='fast')
+            self.assertFalse([t for t in tasks if not t.executed.wait(1)])
+        finally:
+            blocked.set()
+
+    def test_stats(self):
+        done = concurrent.Barrier(3)
+        self.executor.dispatch(lambda: done.wait(3), task_class='fast')
+        self.executor.dispatch(lambda: done.wait(3))
+        done.wait(3)
+        # Wait until the tasks are accounted.
+        deadline = time.time() + 1
+        while time.time() < deadline:
+            stats = self.executor.stats()
+            if (stats['fast']['run']['count'] == 1 and
+                    stats['default']['run']['count'] == 1):
+                break
+            time.sleep(0.01)
+        self.assertEqual(sorted(stats), ['default', 'fast'])
+        for name in ('default', 'fast'):
+            self.assertEqual(stats[name]['queued'], 0)
+            self.assertEqual(stats[name]['wait']['count'], 1)
+            self.assertEqual(stats[name]['run']['count'], 1)
+
+
 class TestWorkerSystemNames(TestCaseBase):
 
     def test_worker_thread_system_name(self):
@@ -319,6 +429,15 @@ class ExecutorTaskTests(TestCaseBase):
             time.sleep(STEP)
             self.assertGreaterEqual(task.duration, i * STEP)
 
+    def test_wait_time(self):
+        task = executor.Task(lambda: None, None)
+        time.sleep(0.1)
+        task()
+        wait_time = task.wait_time
+        self.assertGreater(wait_time, 0)
+        time.sleep(0.1)
+        self.assertEqual(task.wait_time, wait_time)
+
     def test_repr_timeout(self):
         # temporaries only for readability
         timeout = None
@@ -24,6 +24,7 @@ from __future__ import division
 
 
 import contextlib
+import json
 import libvirt
 import tempfile
 import os
@@ -33,6 +34,7 @@ from monkeypatch import MonkeyPatchScope
 from testlib import VdsmTestCase as TestCaseBase
 from testlib import namedTemporaryDir
 
+from vdsm.common import fileutils
 from vdsm.common import hooks
 
 
@@ -160,3 +162,167 @@ domXMLFile.close()
                     self.assertTrue(os.path.exists(flags_file))
                     hooks.remove_vm_launch_flags_file(vm_id)
                     self.assertFalse(os.path.exists(flags_file))
+
+    def writeScript(self, path, code, descriptor=None):
+        with open(path, 'w') as f:
+            f.write(code)
+        os.chmod(path, 0o775)
+        if descriptor is not None:
+            with open(path + hooks._DESCRIPTOR_EXT, 'w') as f:
+                json.dump(descriptor, f)
+
+    def test_scriptsCache(self):
+        with namedTemporaryDir() as dirName:
+            with MonkeyPatchScope([(fileutils, 'MTIME_GRANULARITY', -1)]):
+                first = os.path.join(dirName, '01_first')
+                self.writeScript(first, "#!/bin/sh\n")
+                os.utime(dirName, (1000, 1000))
+                self.assertEqual([first], hooks._scriptsPerDir(dirName))
+
+                # Not modifying the directory, cached listing is used.
+                os.chmod(first, 0o664)
+                self.assertEqual([first], hooks._scriptsPerDir(dirName))
+
+                second = os.path.join(dirName, '02_second')
+                self.writeScript(second, "#!/bin/sh\n")
+                os.utime(dirName, (2000, 2000))
+                self.assertEqual([second], hooks._scriptsPerDir(dirName))
+
+    def test_installedStamp(self):
+        with namedTemporaryDir() as dirName:
+            hookDir = os.path.join(dirName, 'before_vm_start')
+            os.mkdir(hookDir)
+            script = os.path.join(hookDir, '01_hook')
+            self.writeScript(script, "#!/bin/sh\n")
+            os.utime(script, (1000, 1000))
+            os.utime(hookDir, (1000, 1000))
+            with MonkeyPatchScope([(hooks, 'P_VDSM_HOOKS', dirName + '/')]):
+                stamp = hooks.installed_stamp()
+                self.assertEqual(stamp, hooks.installed_stamp())
+
+                # Modifying a script in place.
+                with open(script, 'a') as f:
+                    f.write("exit 0\n")
+                os.utime(script, (2000, 2000))
+                self.assertNotEqual(stamp, hooks.installed_stamp())
+
+                # Modified too recently to tell.
+                os.utime(script, None)
+                self.assertIsNone(hooks.installed_stamp())
+
+    def test_scriptsCacheMissingDir(self):
+        with namedTemporaryDir() as dirName:
+            path = os.path.join(dirName, 'missing')
+            self.assertEqual([], hooks._scriptsPerDir(path))
+            self.assertEqual("data", hooks._runHooksDir("data", path))
+
+    def test_pythonRunnerDomxml(self):
+        with namedTemporaryDir() as dirName:
+            # Executed hook, using the data file.
+            self.writeScript(os.path.join(dirName, '01_exec'), """#!/bin/sh
+echo -n '<b/>' > "$_hook_domxml"
+""")
+            # Hook running in the worker, without a data file.
+            self.writeScript(os.path.join(dirName, '02_worker'), """
+import os
+import hooking
+
+assert os.environ['_hook_domxml'] == ''
+domxml = hooking.read_domxml()
+tag = domxml.documentElement.tagName
+domxml.documentElement.setAttribute('from', tag + os.environ['value'])
+hooking.write_domxml(domxml)
+""", descriptor={'runner': 'python'})
+            res = hooks._runHooksDir("<a/>", dirName, params={'value': 'x'})
+            self.assertIn('<b from="bx"/>', res)
+
+    def test_pythonRunnerJson(self):
+        with namedTemporaryDir() as dirName:
+            self.writeScript(os.path.join(dirName, 'worker'), """
+import hooking
+
+data = hooking.read_json()
+data['count'] += 1
+hooking.write_json(data)
+""", descriptor={'runner': 'python'})
+            res = hooks._runHooksDir({'count': 1}, dirName,
+                                     hookType=hooks._JSON_HOOK)
+            self.assertEqual({'count': 2}, res)
+
+    def test_pythonRunnerStop(self):
+        with namedTemporaryDir() as dirName:
+            self.writeScript(os.path.join(dirName, '01_worker'), """
+import hooking
+hooking.exit_hook('stop here')
+""", descriptor={'runner': 'python'})
+            self.writeScript(os.path.join(dirName, '02_exec'), """#!/bin/sh
+echo -n 'modified' > "$_hook_domxml"
+""")
+            errors = []
+            res = hooks._runHooksDir("data", dirName, raiseError=False,
+                                     errors=errors)
+            self.assertEqual("data", res)
+            self.assertEqual(['stop here\n'], errors)
+
+    def test_independentConcurrent(self):
+        with namedTemporaryDir() as dirName, \
+                namedTemporaryDir() as markers:
+            # Each script waits for the other script, so they must run
+            # concurrently.
+            code = """#!/bin/sh
+touch %(markers)s/%(me)s
+for i in $(seq 50); do
+    test -e %(markers)s/%(other)s && exit 0
+    sleep 0.1
+done
+exit 1
+"""
+            for me, other in (('a', 'b'), ('b', 'a')):
+                self.writeScript(
+                    os.path.join(dirName, me),
+                    code % dict(markers=markers, me=me, other=other),
+                    descriptor={'independent': True})
+            self.assertEqual("data", hooks._runHooksDir("data", dirName))
+
+    def test_independentDataDiscarded(self):
+        with namedTemporaryDir() as dirName:
+            self.writeScript(os.path.join(dirName, '01_independent'),
+                             """#!/bin/sh
+echo -n 'modified' > "$_hook_domxml"
+""", descriptor={'independent': True})
+            self.writeScript(os.path.join(dirName, '02_exec'), """#!/bin/sh
+echo -n ' seen' >> "$_hook_domxml"
+""")
+            self.assertEqual("data seen", hooks._runHooksDir("data", dirName))
+
+    def test_timeout(self):
+        with namedTemporaryDir() as dirName:
+            script = os.path.join(dirName, 'slow')
+            self.writeScript(script, """#!/bin/sh
+echo -n 'modified' > "$_hook_domxml"
+sleep 10
+""", descriptor={'timeout': 0.5})
+            errors = []
+            res = hooks._runHooksDir("data", dirName, raiseError=False,
+                                     errors=errors)
+            self.assertEqual("data", res)
+            self.assertEqual(1, len(errors))
+            self.assertIn("timed out", errors[0])
+
+            name = os.path.join(os.path.basename(dirName), 'slow')
+            info = hooks.stats()[name]
+            self.assertEqual(1, info['count'])
+            self.assertEqual(1, info['timeouts'])
+            self.assertGreaterEqual(info['max'], 0.5)
+
+    def test_pythonRunnerTimeout(self):
+        with namedTemporaryDir() as dirName:
+            self.writeScript(os.path.join(dirName, 'slow'), """
+import time
+time.sleep(10)
+""", descriptor={'runner': 'python', 'timeout': 0.5})
+            errors = []
+            res = hooks._runHooksDir("data", dirName, raiseError=False,
+                                     errors=errors)
+            self.assertEqual("data", res)
+            self.assertIn("timed out", errors[0])
@@ -169,6 +169,35 @@ class HostStatsThreadTests(TestCaseBase):
             self.assertEqual(len(result), 1)
             self.assertEqual(result['0'], self._core_zero_stats)
 
+    def testCpuCoreStatsUsage(self):
+        first_sample = fake.HostSample(1.0, {
+            0: {'user': 100.0, 'sys': 200.0},
+            1: {'user': 100.0, 'sys': 200.0}})
+        last_sample = fake.HostSample(3.0, {
+            0: {'user': 150.0, 'sys': 210.0},
+            1: {'user': 100.0, 'sys': 300.0}})
+
+        with MonkeyPatchScope([(numa, 'topology',
+                                self._fakeNumaTopology)]):
+            result = hoststats._get_cpu_core_stats(first_sample, last_sample)
+            self.assertEqual(result, {
+                '0': {'cpuIdle': '70.00', 'cpuSys': '5.00',
+                      'cpuUser': '25.00', 'nodeIndex': 0},
+                '1': {'cpuIdle': '50.00', 'cpuSys': '50.00',
+                      'cpuUser': '0.00', 'nodeIndex': 1},
+            })
+
+    def testSkipStatsOnCoreMissingInTopology(self):
+        cpu_sample = {'user': 1.0, 'sys': 2.0}
+
+        first_sample = fake.HostSample(1.0, {0: cpu_sample, 2: cpu_sample})
+        last_sample = fake.HostSample(2.0, {0: cpu_sample, 2: cpu_sample})
+
+        with MonkeyPatchScope([(numa, 'topology',
+                                self._fakeNumaTopology)]):
+            result = hoststats._get_cpu_core_stats(first_sample, last_sample)
+            self.assertEqual(result, {'0': self._core_zero_stats})
+
     def testOutputWithNoSamples(self):
         expected = {
             'cpuIdle': 100.0,
@@ -0,0 +1,185 @@
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+import time
+import unittest
+
+from six.moves import queue
+
+from network.compat import mock
+
+from vdsm.network.link import stats as link_stats
+from vdsm.network.netlink import libnl
+
+
+class FakeMonitor(object):
+
+    def __init__(self, groups=()):
+        self.events = queue.Queue()
+        self.iterating = threading.Event()
+
+    def start(self):
+        pass
+
+    def __iter__(self):
+        self.iterating.set()
+        for event in iter(self.events.get, None):
+            yield event
+            self.events.task_done()
+
+
+class FailingMonitor(FakeMonitor):
+
+    def start(self):
+        raise RuntimeError("cannot monitor")
+
+
+class FakeSpeed(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, dev, link_type):
+        self.calls.append(dev)
+        return 1000
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise RuntimeError("Timeout waiting for %s" % predicate)
+        time.sleep(0.01)
+
+
+@mock.patch.object(link_stats.nic, 'duplex', lambda dev: 'full')
+class SpeedCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = FakeMonitor()
+        self.speed = FakeSpeed()
+        self.cache = link_stats._SpeedCache()
+
+    def tearDown(self):
+        self.monitor.events.put(None)
+
+    def start_monitoring(self):
+        # Using another link, since this call may or may not be cached.
+        with mock.patch.object(link_stats, '_speed', FakeSpeed()):
+            self.cache.get('eth1', 'nic')
+        self.assertTrue(self.monitor.iterating.wait(5))
+
+    def test_cached(self):
+        with mock.patch.object(link_stats.monitor, 'Monitor',
+                               lambda groups: self.monitor):
+            self.start_monitoring()
+            with mock.patch.object(link_stats, '_speed', self.speed):
+                self.assertEqual(self.cache.get('eth0', 'nic'),
+                                 (1000, 'full'))
+                self.assertEqual(self.cache.get('eth0', 'nic'),
+                                 (1000, 'full'))
+        self.assertEqual(self.speed.calls, ['eth0'])
+
+    def test_dropped_on_event(self):
+        with mock.patch.object(link_stats.monitor, 'Monitor',
+                               lambda groups: self.monitor):
+            self.start_monitoring()
+            with mock.patch.object(link_stats, '_speed', self.speed):
+                self.cache.get('eth0', 'nic')
+                self.monitor.events.put({'name': 'eth1', 'event': 'new_link'})
+                self.monitor.events.join()
+                self.cache.get('eth0', 'nic')
+        self.assertEqual(self.speed.calls, ['eth0', 'eth0'])
+
+    def test_not_cached_without_monitor(self):
+        with mock.patch.object(link_stats.monitor, 'Monitor',
+                               FailingMonitor):
+            with mock.patch.object(link_stats, '_speed', self.speed):
+                self.cache.get('eth0', 'nic')
+                _wait_for(lambda: not self.cache._watcher._running)
+                self.cache.get('eth0', 'nic')
+                _wait_for(lambda: not self.cache._watcher._running)
+        self.assertEqual(self.speed.calls, ['eth0', 'eth0'])
+
+
+class ReportTests(unittest.TestCase):
+
+    LINKS = [
+        {
+            'name': 'eth0',
+            'type': 'nic',
+            'flags': (libnl.IfaceStatus.IFF_UP |
+                      libnl.IfaceStatus.IFF_RUNNING),
+            'stats': {
+                'rx_bytes': 1, 'tx_bytes': 2,
+                'rx_dropped': 3, 'tx_dropped': 4,
+                'rx_errors': 5, 'tx_errors': 6,
+            },
+        },
+        {
+            'name': 'vnet0',
+            'flags': libnl.IfaceStatus.IFF_UP,
+            'stats': {
+                'rx_bytes': 0, 'tx_bytes': 0,
+                'rx_dropped': 0, 'tx_dropped': 0,
+                'rx_errors': 0, 'tx_errors': 0,
+            },
+        },
+    ]
+
+    @mock.patch.object(link_stats.dpdk, 'get_dpdk_devices', lambda: {})
+    @mock.patch.object(link_stats, '_speed_cache')
+    @mock.patch.object(link_stats.link, 'iter_links')
+    def test_report(self, iter_links, speed_cache):
+        iter_links.return_value = iter(self.LINKS)
+        speed_cache.get.side_effect = lambda dev, link_type: (
+            (1000, 'full') if link_type == 'nic' else (0, 'unknown'))
+
+        stats = link_stats.report()
+
+        iter_links.assert_called_once_with(stats=True)
+        self.assertEqual(stats, {
+            'eth0': {
+                'name': 'eth0',
+                'rx': 1,
+                'tx': 2,
+                'state': 'up',
+                'rxDropped': 3,
+                'txDropped': 4,
+                'rxErrors': 5,
+                'txErrors': 6,
+                'speed': 1000,
+                'duplex': 'full',
+            },
+            'vnet0': {
+                'name': 'vnet0',
+                'rx': 0,
+                'tx': 0,
+                'state': 'down',
+                'rxDropped': 0,
+                'txDropped': 0,
+                'rxErrors': 0,
+                'txErrors': 0,
+                'speed': 0,
+                'duplex': 'unknown',
+            },
+        })
@@ -0,0 +1,143 @@
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import threading
+import time
+import unittest
+
+from six.moves import queue
+
+from network.compat import mock
+
+from vdsm.network.netinfo import cache as netinfo_cache
+
+
+class FakeMonitor(object):
+
+    def __init__(self, groups=()):
+        self.events = queue.Queue()
+        self.iterating = threading.Event()
+
+    def start(self):
+        pass
+
+    def __iter__(self):
+        self.iterating.set()
+        for event in iter(self.events.get, None):
+            yield event
+            self.events.task_done()
+
+
+class FailingMonitor(FakeMonitor):
+
+    def start(self):
+        raise RuntimeError("cannot monitor")
+
+
+class FakeReport(object):
+
+    def __init__(self):
+        self.builds = 0
+
+    def __call__(self):
+        self.builds += 1
+        return {'nics': {'eth0': {'mtu': 1500}}, 'build': self.builds}
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise RuntimeError("Timeout waiting for %s" % predicate)
+        time.sleep(0.01)
+
+
+class ReportCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.monitor = FakeMonitor()
+        self.report = FakeReport()
+        self.stamp = 1
+        patches = [
+            mock.patch.object(netinfo_cache.monitor, 'Monitor',
+                              lambda groups: self.monitor),
+            mock.patch.object(netinfo_cache, '_get', self.report),
+            mock.patch.object(netinfo_cache, '_report_stamp',
+                              lambda: self.stamp),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.cache = netinfo_cache._ReportCache()
+
+    def tearDown(self):
+        self.monitor.events.put(None)
+
+    def start_monitoring(self):
+        self.cache.get()
+        self.assertTrue(self.monitor.iterating.wait(5))
+        # The report built while starting may or may not be cached.
+        self.cache.drop()
+
+    def test_cached(self):
+        self.start_monitoring()
+        first = self.cache.get()
+        self.assertEqual(self.cache.get(), first)
+
+    def test_result_is_a_copy(self):
+        self.start_monitoring()
+        self.cache.get()['nics']['eth0']['mtu'] = '1500'
+        self.assertEqual(self.cache.get()['nics']['eth0']['mtu'], 1500)
+
+    def test_dropped_on_event(self):
+        self.start_monitoring()
+        first = self.cache.get()
+        self.monitor.events.put({'name': 'eth0', 'event': 'new_addr'})
+        self.monitor.events.join()
+        self.assertNotEqual(self.cache.get(), first)
+
+    def test_dropped_on_stamp_change(self):
+        self.start_monitoring()
+        first = self.cache.get()
+        self.stamp = 2
+        self.assertNotEqual(self.cache.get(), first)
+
+    def test_not_cached_without_stamp(self):
+        self.start_monitoring()
+        self.stamp = None
+        first = self.cache.get()
+        self.assertNotEqual(self.cache.get(), first)
+
+    def test_invalidate(self):
+        with mock.patch.object(netinfo_cache, '_report_cache', self.cache):
+            self.start_monitoring()
+            first = netinfo_cache.get_cached()
+            netinfo_cache.invalidate()
+            self.assertNotEqual(netinfo_cache.get_cached(), first)
+
+    def test_not_cached_without_monitor(self):
+        with mock.patch.object(netinfo_cache.monitor, 'Monitor',
+                               FailingMonitor):
+            self.cache.get()
+            _wait_for(lambda: not self.cache._watcher._running)
+            self.cache.get()
+            _wait_for(lambda: not self.cache._watcher._running)
+        self.assertEqual(self.report.builds, 2)
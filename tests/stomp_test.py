@@ -19,6 +19,8 @@
 #
 from __future__ import absolute_import
 from __future__ import division
+import io
+
 from six.moves import queue
 from uuid import uuid4
 
@@ -28,6 +30,7 @@ from testlib import VdsmTestCase as TestCaseBase, \
     dummyTextGenerator
 
 import yajsonrpc
+from yajsonrpc import stomp
 from integration.jsonRpcHelper import constructAcceptor
 from yajsonrpc.stompclient import StandAloneRpcClient
 from vdsm import utils
@@ -118,3 +121,64 @@ class StompTests(TestCaseBase):
                     self.fail("Event queue timed out.")
                 self.assertEqual(event, 'vdsm.event')
                 self.assertEqual(event_params['content'], True)
+
+
+class ParserTests(TestCaseBase):
+
+    FRAMES = (b"SEND\ncontent-length:5\ndestination:a\n\nhello\0"
+              b"SEND\r\ndestination:b\r\n\r\nworld\0")
+
+    def test_parse_split(self):
+        for size in (1, 3, 7, len(self.FRAMES)):
+            parser = stomp.Parser()
+            for i in range(0, len(self.FRAMES), size):
+                parser.parse(self.FRAMES[i:i + size])
+            self.check_frames(parser)
+
+    def test_read_from(self):
+        src = io.BytesIO(self.FRAMES)
+        parser = stomp.Parser()
+        while parser.read_from(src.readinto, 4):
+            pass
+        self.check_frames(parser)
+
+    def test_large_body(self):
+        body = b"x" * (stomp.Parser._MAX_IDLE_BUFFER + 1)
+        data = b"SEND\ncontent-length:%d\n\n%s\0" % (len(body), body)
+        src = io.BytesIO(data * 2)
+        parser = stomp.Parser()
+        while parser.read_from(src.readinto, 4096):
+            pass
+        self.assertEqual(parser.pending, 2)
+        self.assertEqual(parser.popFrame().body, body)
+        self.assertEqual(parser.popFrame().body, body)
+
+    def test_missing_terminator(self):
+        parser = stomp.Parser()
+        with self.assertRaises(RuntimeError):
+            parser.parse(b"SEND\ncontent-length:1\n\nxy")
+
+    def test_content_length_too_large(self):
+        parser = stomp.Parser(max_frame_size=1024)
+        with self.assertRaises(stomp.FrameTooLarge):
+            parser.parse(b"SEND\ncontent-length:4000000000\n\nx")
+        # The buffer was not sized from the content-length header.
+        self.assertLess(len(parser._buffer), 1024**2)
+
+    def test_frame_too_large(self):
+        parser = stomp.Parser(max_frame_size=1024)
+        parser.parse(b"SEND\ndestination:a\n\n")
+        with self.assertRaises(stomp.FrameTooLarge):
+            for i in range(3):
+                parser.parse(b"x" * 512)
+
+    def check_frames(self, parser):
+        self.assertEqual(parser.pending, 2)
+        frame = parser.popFrame()
+        self.assertEqual(frame.command, stomp.Command.SEND)
+        self.assertEqual(frame.headers["destination"], "a")
+        self.assertEqual(frame.body, b"hello")
+        frame = parser.popFrame()
+        self.assertEqual(frame.headers["destination"], "b")
+        self.assertEqual(frame.body, b"world")
+        self.assertIsNone(parser.popFrame())
@@ -23,17 +23,21 @@ from __future__ import absolute_import
 from __future__ import division
 
 import os
+import uuid
 
 from monkeypatch import MonkeyPatch
 
 import pytest
 
 from storage.storagefakelib import fake_vg
+from storage.storagetestlib import fake_block_env
 from testValidation import xfail
 from testlib import VdsmTestCase
 from vdsm.storage import blockSD
+from vdsm.storage import constants as sc
 from vdsm.storage import exception as se
 from vdsm.storage import lvm
+from vdsm.storage import sd
 from vdsm import constants
 
 
@@ -163,3 +167,77 @@ def test_meta_size_max_val(monkeypatch):
         free=str(1024 * constants.MEGAB)))
     meta_size = blockSD.BlockStorageDomain.metaSize('sd-uuid')
     assert meta_size == 513
+
+
+def test_read_volumes_metadata():
+    with fake_block_env() as env:
+        img_id = str(uuid.uuid4())
+        base_id = str(uuid.uuid4())
+        top_id = str(uuid.uuid4())
+        env.make_volume(constants.MEGAB, img_id, base_id,
+                        vol_type=sc.INTERNAL_VOL)
+        env.make_volume(constants.MEGAB, img_id, top_id,
+                        parent_vol_id=base_id)
+
+        volumes_md = env.sd_manifest.read_volumes_metadata()
+
+        assert sorted(volumes_md) == sorted([base_id, top_id])
+        assert volumes_md[base_id].puuid == sc.BLANK_UUID
+        assert volumes_md[base_id].voltype == "INTERNAL"
+        assert volumes_md[top_id].puuid == base_id
+        assert volumes_md[top_id].voltype == "LEAF"
+
+
+def test_read_volumes_metadata_empty():
+    with fake_block_env() as env:
+        assert env.sd_manifest.read_volumes_metadata() == {}
+
+
+def test_read_metadata_block_after_extend(monkeypatch):
+    with fake_block_env() as env:
+        manifest = env.sd_manifest
+        path = manifest.metadata_volume_path()
+        size = os.path.getsize(path)
+        manifest.read_metadata_block(0, sc.METADATA_SIZE)
+
+        refreshed = []
+
+        def refreshLVs(vg_name, lv_names):
+            # Simulate the metadata volume extended on the SPM.
+            with open(path, "r+b") as f:
+                f.truncate(size + sc.METADATA_SIZE)
+            refreshed.append((vg_name, lv_names))
+
+        monkeypatch.setattr(env.lvm, "refreshLVs", refreshLVs, raising=False)
+
+        manifest.read_metadata_block(size, sc.METADATA_SIZE)
+        assert refreshed == [(manifest.sdUUID, [sd.METADATA])]
+
+        # The volume is not refreshed again for reads within the volume.
+        manifest.read_metadata_block(size, sc.METADATA_SIZE)
+        assert len(refreshed) == 1
+
+
+def test_volume_graph():
+    with fake_block_env() as env:
+        img_id = str(uuid.uuid4())
+        base_id = str(uuid.uuid4())
+        top_id = str(uuid.uuid4())
+        env.make_volume(constants.MEGAB, img_id, base_id,
+                        vol_type=sc.INTERNAL_VOL)
+        env.make_volume(constants.MEGAB, img_id, top_id,
+                        parent_vol_id=base_id)
+
+        graph = env.sd_manifest.volume_graph()
+        assert graph.chain(img_id) == [base_id, top_id]
+
+        # The graph is kept until a volume is changed.
+        assert env.sd_manifest.volume_graph() is graph
+
+        # Simulate a live merge on this host, removing the base volume from
+        # the chain.
+        top = env.sd_manifest.produceVolume(img_id, top_id)
+        top.setParentMeta(sc.BLANK_UUID)
+
+        graph = env.sd_manifest.volume_graph()
+        assert graph.chain(img_id, top_id) == [top_id]
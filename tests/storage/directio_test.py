@@ -97,3 +97,32 @@ class TestDirectFile(VdsmTestCase):
                 directio.DirectFile(srcPath, "r") as direct_file, \
                 io.open(srcPath, "rb") as buffered_file:
             self.assertEqual(direct_file.read(), buffered_file.read())
+
+    @permutations([[0, BLOCK_SIZE], [BLOCK_SIZE, 2 * BLOCK_SIZE]])
+    def test_pread(self, offset, size):
+        with temporaryPath(data=self.DATA) as srcPath, \
+                directio.DirectFile(srcPath, "r") as f:
+            self.assertEqual(f.pread(offset, size),
+                             self.DATA[offset:offset + size])
+            # Position is not changed by pread().
+            self.assertEqual(f.tell(), 0)
+
+    def test_pread_reuse_buffer(self):
+        with temporaryPath(data=self.DATA) as srcPath, \
+                directio.DirectFile(srcPath, "r") as f:
+            for offset in range(0, len(self.DATA), BLOCK_SIZE):
+                self.assertEqual(f.pread(offset, BLOCK_SIZE),
+                                 self.DATA[offset:offset + BLOCK_SIZE])
+
+    def test_pread_end_of_file(self):
+        with temporaryPath(data=self.DATA) as srcPath, \
+                directio.DirectFile(srcPath, "r") as f:
+            offset = len(self.DATA) - BLOCK_SIZE
+            self.assertEqual(f.pread(offset, 2 * BLOCK_SIZE),
+                             self.DATA[offset:])
+
+    def test_pread_unaligned(self):
+        with temporaryPath(data=self.DATA) as srcPath, \
+                directio.DirectFile(srcPath, "r") as f:
+            self.assertRaises(ValueError, f.pread, 0, 511)
+            self.assertRaises(ValueError, f.pread, 1, BLOCK_SIZE)
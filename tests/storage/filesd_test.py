@@ -71,10 +71,26 @@ class FakeGlob(object):
         return fnmatch.filter(self.files, pattern)
 
 
+class FakePath(object):
+
+    def __init__(self, dirs):
+        self.dirs = dirs
+
+    def isdir(self, path):
+        return path in self.dirs
+
+
+class FakeOS(object):
+
+    def __init__(self, dirs):
+        self.path = FakePath(dirs)
+
+
 class FakeOOP(object):
 
-    def __init__(self, glob=None):
+    def __init__(self, glob=None, os=None):
         self.glob = glob
+        self.os = os
 
 
 class TestGetAllVolumes(VdsmTestCase):
@@ -176,6 +192,39 @@ class TestGetAllVolumes(VdsmTestCase):
         self.assertTrue(elapsed < 1.0, "Elapsed time: %f seconds" % elapsed)
 
 
+class TestGetAllImages(VdsmTestCase):
+
+    MOUNTPOINT = "/rhev/data-center/%s" % uuid.uuid4()
+    SD_UUID = str(uuid.uuid4())
+    IMAGES_DIR = os.path.join(MOUNTPOINT, SD_UUID, sd.DOMAIN_IMAGES)
+
+    def test_images(self):
+        img1 = str(uuid.uuid4())
+        img2 = str(uuid.uuid4())
+        empty_img = str(uuid.uuid4())
+        vol1 = str(uuid.uuid4())
+        vol2 = str(uuid.uuid4())
+        dirs = set(os.path.join(self.IMAGES_DIR, img)
+                   for img in (img1, img2, empty_img))
+        files = [
+            os.path.join(self.IMAGES_DIR, img1, vol1),
+            os.path.join(self.IMAGES_DIR, img1, vol1 + ".meta"),
+            os.path.join(self.IMAGES_DIR, img1, vol1 + ".lease"),
+            os.path.join(self.IMAGES_DIR, img2, vol2 + ".meta"),
+            os.path.join(self.IMAGES_DIR, "not-an-image"),
+        ]
+        oop = FakeOOP(FakeGlob(sorted(dirs) + files), FakeOS(dirs))
+        dom = FileStorageDomain(self.SD_UUID, self.MOUNTPOINT, oop)
+
+        inventory = dom._manifest.getImagesInventory()
+        self.assertEqual(sorted(inventory[img1]),
+                         sorted([vol1, vol1 + ".meta", vol1 + ".lease"]))
+        self.assertEqual(inventory[img2], [vol2 + ".meta"])
+        self.assertNotIn(empty_img, inventory)
+
+        self.assertEqual(dom.getAllImages(), set([img1, img2, empty_img]))
+
+
 SDInfo = collections.namedtuple("SDInfo",
                                 "uuid, remote_path, mountpoint, dom_dir")
 
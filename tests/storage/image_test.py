@@ -22,11 +22,15 @@ from __future__ import absolute_import
 from __future__ import division
 
 from monkeypatch import MonkeyPatch
+from monkeypatch import MonkeyPatchScope
 from testlib import expandPermutations, permutations
 from testlib import VdsmTestCase
 
 from vdsm.storage import constants as sc
+from vdsm.storage import exception as se
 from vdsm.storage import image
+from vdsm.storage import sd
+from vdsm.storage import volumegraph
 
 GB_IN_BLK = 1024**3 // 512
 
@@ -99,3 +103,99 @@ class TestCalculateVolAlloc(VdsmTestCase):
         alloc_blk = img.calculate_vol_alloc("src_sd_id", src_params,
                                             "dst_sd_id", dest_format)
         self.assertEqual(alloc_blk, expected_blk)
+
+
+class FakeChainDomain(object):
+    """
+    Domain with one image, keeping the volume graph like
+    sd.StorageDomainManifest. Other hosts modify the volumes parents in
+    self.parents without invalidating the graph.
+    """
+
+    def __init__(self, parents):
+        self.parents = parents
+        self.graph = None
+        self.invalidated = 0
+        dom = self
+
+        class FakeVolume(object):
+
+            def __init__(self, repoPath, sdUUID, imgUUID, volUUID):
+                if volUUID not in dom.parents:
+                    raise se.VolumeDoesNotExist(volUUID)
+                self.volUUID = volUUID
+
+            @classmethod
+            def getImageVolumes(cls, sdUUID, imgUUID):
+                return sorted(dom.parents)
+
+            def isLeaf(self):
+                return self.volUUID not in dom.parents.values()
+
+            def isShared(self):
+                return False
+
+            def getParent(self):
+                return dom.parents[self.volUUID]
+
+            def getParentVolume(self):
+                return FakeVolume(None, None, None, self.getParent())
+
+        self.volclass = FakeVolume
+
+    def getVolumeClass(self):
+        return self.volclass
+
+    def volume_graph(self):
+        if self.graph is None:
+            self.graph = volumegraph.VolumeGraph(dict(
+                (vol_id, sd.ImgsPar(("img",), parent))
+                for vol_id, parent in self.parents.items()))
+        return self.graph
+
+    def invalidate_volume_graph(self):
+        self.graph = None
+        self.invalidated += 1
+
+
+class TestGetChain(VdsmTestCase):
+
+    def setUp(self):
+        self.dom = FakeChainDomain({"base": sc.BLANK_UUID, "top": "base"})
+        self.image = image.Image("/repo")
+
+    def get_chain(self, vol_id=None):
+        with MonkeyPatchScope([(image, "sdCache", self)]):
+            chain = self.image.getChain("sd", "img", vol_id)
+        return [vol.volUUID for vol in chain]
+
+    def produce(self, sdUUID):
+        return self.dom
+
+    def test_graph(self):
+        self.assertEqual(self.get_chain(), ["base", "top"])
+        self.assertEqual(self.get_chain(), ["base", "top"])
+        self.assertEqual(self.dom.invalidated, 0)
+
+    def test_volume_created_elsewhere(self):
+        self.get_chain()
+        self.dom.parents["new"] = "top"
+        self.assertEqual(self.get_chain(), ["base", "top", "new"])
+        self.assertEqual(self.dom.invalidated, 1)
+
+    def test_volume_merged_elsewhere(self):
+        self.dom.parents["new"] = "top"
+        self.get_chain()
+        # "top" merged into "base" and removed.
+        self.dom.parents["new"] = "base"
+        del self.dom.parents["top"]
+        self.assertEqual(self.get_chain(), ["base", "new"])
+        self.assertEqual(self.dom.invalidated, 1)
+
+    def test_parent_changed_elsewhere(self):
+        self.dom.parents["new"] = "top"
+        self.get_chain()
+        # "top" merged into "base", not removed yet.
+        self.dom.parents["new"] = "base"
+        self.assertEqual(self.get_chain("new"), ["base", "new"])
+        self.assertEqual(self.dom.invalidated, 1)
@@ -22,9 +22,16 @@
 from __future__ import absolute_import
 from __future__ import division
 
+import time
+
+from collections import OrderedDict
+
+import pytest
+
 from testlib import VdsmTestCase
 
 import vdsm.storage.lvm as lvm
+from vdsm.storage import exception as se
 
 
 class TestLvm(VdsmTestCase):
@@ -40,3 +47,350 @@ class TestLvm(VdsmTestCase):
                           "\\\\x22\\\\x28|\', \'r|.*|\' ]"
                           )
         self.assertEqual(expectedFilter, filter)
+
+    def test_shellArgs(self):
+        cmd = [lvm.constants.EXT_LVM, "vgs", "--config",
+               'devices { preferred_names = ["^/dev/mapper/"] }', "-o",
+               "uuid"]
+        args = lvm._shellArgs(cmd)
+        self.assertEqual(args, [
+            "vgs", "--config",
+            "devices { preferred_names = ['^/dev/mapper/'] } " +
+            lvm.lvmshell.LOG_CONFIG,
+            "-o", "uuid", "--reportformat", "json"])
+
+    def test_reportLines(self):
+        report = {"report": [{"lv": [
+            OrderedDict([("lv_uuid", "uuid1"), ("lv_name", "lv1")]),
+            OrderedDict([("lv_uuid", "uuid2"), ("lv_name", "lv2")]),
+        ]}]}
+        self.assertEqual(lvm._reportLines(report),
+                         ["uuid1|lv1", "uuid2|lv2"])
+
+
+class FakeLVMReport(object):
+    """
+    Fake LVMCache.report(), reporting vgs and lvs from vgs and lvs dicts,
+    and recording the commands.
+    """
+
+    def __init__(self):
+        self.vgs = {}  # vg_name: seqno
+        self.lvs = {}  # (vg_name, lv_name): size
+        self.calls = []
+
+    def __call__(self, cmd, devices=()):
+        names = cmd[len(lvm.VGS_CMD):]
+        self.calls.append((cmd[0],) + tuple(names))
+        if cmd[0] == "vgs":
+            return 0, [self._vg_line(vg) for vg in sorted(self.vgs)
+                       if not names or vg in names], []
+        if cmd[0] == "lvs":
+            return 0, [self._lv_line(vg, lv) for vg, lv in sorted(self.lvs)
+                       if not names or vg in names], []
+        raise AssertionError("Unexpected command %s" % cmd)
+
+    def _vg_line(self, vg):
+        fields = ("uuid-" + vg, vg, "wz--n-", "1073741824", "536870912",
+                  "134217728", "8", "4", "", "134217728", "67108864",
+                  str(len([k for k in self.lvs if k[0] == vg])), "1",
+                  str(self.vgs[vg]), "/dev/mapper/" + vg)
+        return lvm.SEPARATOR.join(fields)
+
+    def _lv_line(self, vg, lv):
+        fields = ("uuid-" + lv, lv, vg, "-wi-a-----",
+                  str(self.lvs[(vg, lv)]), "0", "/dev/mapper/" + vg + "(0)",
+                  "", str(self.vgs[vg]))
+        return lvm.SEPARATOR.join(fields)
+
+
+@pytest.fixture
+def fake_report():
+    return FakeLVMReport()
+
+
+@pytest.fixture
+def cache(monkeypatch, fake_report):
+    cache = lvm.LVMCache()
+    monkeypatch.setattr(cache, "report", fake_report)
+    fake_report.vgs = {"vg1": 1, "vg2": 1}
+    fake_report.lvs = {("vg1", "lv1"): 1024, ("vg2", "lv2"): 1024}
+    return cache
+
+
+def wait_for_refresh(cache, timeout=5):
+    deadline = time.time() + timeout
+    while cache._refreshing:
+        assert time.time() < deadline, "Timeout waiting for refresh"
+        time.sleep(0.01)
+
+
+def test_invalidate_unchanged_vg(cache, fake_report):
+    cache.getLv("vg1")
+    cache.invalidateCache()
+    del fake_report.calls[:]
+
+    lvs = cache.getLv("vg1")
+
+    assert [lv.name for lv in lvs] == ["lv1"]
+    # VG was not modified, no need to reload the LVs.
+    assert fake_report.calls == [("vgs", "vg1")]
+
+
+def test_invalidate_changed_vg(cache, fake_report):
+    cache.getLv("vg1")
+    cache.invalidateCache()
+    fake_report.lvs[("vg1", "lv3")] = 2048
+    fake_report.vgs["vg1"] = 2
+    del fake_report.calls[:]
+
+    lvs = cache.getLv("vg1")
+
+    assert sorted(lv.name for lv in lvs) == ["lv1", "lv3"]
+    assert fake_report.calls == [("vgs", "vg1"), ("lvs", "vg1")]
+
+
+def test_invalidate_get_lv(cache, fake_report):
+    cache.getLv("vg1", "lv1")
+    cache.invalidateCache()
+    fake_report.lvs[("vg1", "lv1")] = 2048
+    fake_report.vgs["vg1"] = 2
+
+    lv = cache.getLv("vg1", "lv1")
+
+    assert lv.size == "2048"
+
+
+def test_get_all_lvs_reloads_changed_vgs(cache, fake_report):
+    cache.getAllLvs()
+    cache.invalidateCache()
+    fake_report.lvs[("vg2", "lv2")] = 2048
+    fake_report.vgs["vg2"] = 2
+    del fake_report.calls[:]
+
+    lvs = cache.getAllLvs()
+
+    assert sorted((lv.name, lv.size) for lv in lvs) == [
+        ("lv1", "1024"), ("lv2", "2048")]
+    assert fake_report.calls == [("vgs",), ("lvs", "vg2")]
+
+
+def test_get_all_lvs_removed_vg(cache, fake_report, monkeypatch):
+    monkeypatch.setattr(lvm, "removeVgMapping", lambda vg: None)
+    cache.getAllLvs()
+    cache.invalidateCache()
+    del fake_report.vgs["vg2"]
+    del fake_report.lvs[("vg2", "lv2")]
+
+    lvs = cache.getAllLvs()
+
+    assert [lv.name for lv in lvs] == ["lv1"]
+
+
+def test_stale_ok_lv(cache, fake_report):
+    cache.getLv("vg1", "lv1")
+    cache.invalidateCache()
+    fake_report.lvs[("vg1", "lv1")] = 2048
+    fake_report.vgs["vg1"] = 2
+
+    # Return the previous LV, refreshing in the background.
+    lv = cache.getLv("vg1", "lv1", stale_ok=True)
+    assert lv.size == "1024"
+
+    wait_for_refresh(cache)
+    lv = cache.getLv("vg1", "lv1", stale_ok=True)
+    assert lv.size == "2048"
+
+
+def test_stale_ok_vg(cache, fake_report):
+    cache.getVg("vg1")
+    cache.invalidateCache()
+    fake_report.vgs["vg1"] = 2
+
+    vg = cache.getVg("vg1", stale_ok=True)
+    assert vg.seqno == "1"
+
+    wait_for_refresh(cache)
+    vg = cache.getVg("vg1", stale_ok=True)
+    assert vg.seqno == "2"
+
+
+def test_stale_ok_invalidated_lv(cache, fake_report):
+    cache.getLv("vg1", "lv1")
+    cache._invalidatelvs("vg1", "lv1")
+    fake_report.lvs[("vg1", "lv1")] = 2048
+
+    # Explicitly invalidated LV is never stale.
+    lv = cache.getLv("vg1", "lv1", stale_ok=True)
+    assert lv.size == "2048"
+
+
+class FakeLVMCommand(object):
+    """
+    Fake LVMCache.cmd(), recording the commands.
+    """
+
+    def __init__(self, rc=0):
+        self.rc = rc
+        self.calls = []
+
+    def __call__(self, cmd, devices=()):
+        self.calls.append(tuple(cmd))
+        return self.rc, [], ["error"] if self.rc else []
+
+
+@pytest.fixture
+def fake_cmd(monkeypatch):
+    cache = lvm.LVMCache()
+    fake_cmd = FakeLVMCommand()
+    monkeypatch.setattr(cache, "cmd", fake_cmd)
+    monkeypatch.setattr(lvm, "_lvminfo", cache)
+    monkeypatch.setattr(lvm, "_recentlyRefreshed", lvm._RefreshedLVs())
+    return fake_cmd
+
+
+def test_change_lvs_same_attrs(fake_cmd):
+    lvm.changeLVs("vg", [
+        ("lv1", ("--permission", "rw")),
+        ("lv2", ("--permission", "rw")),
+        ("lv3", ("--permission", "rw")),
+    ])
+    assert fake_cmd.calls == [
+        ("lvchange",) + lvm.LVM_NOBACKUP +
+        ("--permission", "rw", "vg/lv1", "vg/lv2", "vg/lv3"),
+    ]
+
+
+def test_change_lvs_different_attrs(fake_cmd):
+    lvm.changeLVs("vg", [
+        ("lv1", ("--permission", "rw")),
+        ("lv2", (("--addtag", "a"), ("--deltag", "b"))),
+        ("lv3", ("--permission", "rw")),
+        ("lv2", ("--permission", "rw")),
+    ])
+    assert fake_cmd.calls == [
+        ("lvchange",) + lvm.LVM_NOBACKUP +
+        ("--permission", "rw", "vg/lv1", "vg/lv3"),
+        ("lvchange",) + lvm.LVM_NOBACKUP +
+        ("--addtag", "a", "--deltag", "b", "--permission", "rw", "vg/lv2"),
+    ]
+
+
+def test_change_lvs_failure(fake_cmd):
+    fake_cmd.rc = 5
+    with pytest.raises(se.StorageException):
+        lvm.changeLVs("vg", [
+            ("lv1", ("--addtag", "a")),
+            ("lv2", ("--addtag", "b")),
+        ])
+    # All commands run even if the first failed.
+    assert len(fake_cmd.calls) == 2
+    # And all the LVs were invalidated.
+    for lv in ("lv1", "lv2"):
+        assert isinstance(lvm._lvminfo._lvs[("vg", lv)], lvm.Stub)
+
+
+def test_change_lvs_tags(fake_cmd):
+    lvm.changeLVsTags("vg", [
+        ("lv1", ["PU_x"], ["PU_y"]),
+        ("lv2", ["PU_x"], ["PU_y"]),
+        ("lv3", [], ["IU_z"]),
+    ])
+    assert fake_cmd.calls == [
+        ("lvchange",) + lvm.LVM_NOBACKUP +
+        ("--deltag", "PU_x", "--addtag", "PU_y", "vg/lv1", "vg/lv2"),
+        ("lvchange",) + lvm.LVM_NOBACKUP +
+        ("--addtag", "IU_z", "vg/lv3"),
+    ]
+
+
+def test_change_lvs_tags_same_tag(fake_cmd):
+    with pytest.raises(se.LogicalVolumeReplaceTagError):
+        lvm.changeLVsTags("vg", [("lv1", ["a"], ["a"])])
+    assert fake_cmd.calls == []
+
+
+def test_activate_chain_skips_second_refresh(fake_cmd, monkeypatch):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+    chain = ["lv1", "lv2", "lv3"]
+
+    lvm.activateLVs("vg", chain)
+    for lv in chain:
+        lvm.activateLVs("vg", [lv])
+
+    assert fake_cmd.calls == [
+        ("lvchange", "--refresh", "vg/lv1", "vg/lv2", "vg/lv3"),
+    ]
+
+    # The next activation refreshes the lv again.
+    lvm.activateLVs("vg", ["lv1"])
+    assert fake_cmd.calls[-1] == ("lvchange", "--refresh", "vg/lv1")
+
+
+def test_activate_chain_refresh_expired(fake_cmd, monkeypatch):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+    now = [100]
+    monkeypatch.setattr(lvm, "_recentlyRefreshed",
+                        lvm._RefreshedLVs(max_age=10, clock=lambda: now[0]))
+
+    lvm.activateLVs("vg", ["lv1", "lv2"])
+    now[0] += 10
+    lvm.activateLVs("vg", ["lv1"])
+    now[0] += 1
+    # lv2 was recorded 11 seconds ago, and may have been changed by another
+    # host since.
+    lvm.activateLVs("vg", ["lv2"])
+
+    assert fake_cmd.calls == [
+        ("lvchange", "--refresh", "vg/lv1", "vg/lv2"),
+        ("lvchange", "--refresh", "vg/lv2"),
+    ]
+
+
+def test_activate_without_refresh_not_recorded(fake_cmd, monkeypatch):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+
+    # The active lvs were not refreshed, so the next activation must refresh
+    # them.
+    lvm.activateLVs("vg", ["lv1", "lv2"], refresh=False)
+    lvm.activateLVs("vg", ["lv1"])
+
+    assert fake_cmd.calls == [("lvchange", "--refresh", "vg/lv1")]
+
+
+def test_activate_inactive_recorded(fake_cmd, monkeypatch):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: lv == "lv1")
+    monkeypatch.setattr(lvm, "_setLVAvailability", lambda vg, lvs, a: None)
+
+    lvm.activateLVs("vg", ["lv1", "lv2"], refresh=False)
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+    lvm.activateLVs("vg", ["lv1"])
+    lvm.activateLVs("vg", ["lv2"])
+
+    # Only lv2 was activated with the current mapping.
+    assert fake_cmd.calls == [("lvchange", "--refresh", "vg/lv1")]
+
+
+@pytest.mark.parametrize("change", [
+    lambda: lvm.extendLV("vg", "lv1", 2048),
+    lambda: lvm.reduceLV("vg", "lv1", 1024),
+    lambda: lvm.refreshLVs("vg", ["lv1"]),
+])
+def test_change_drops_refreshed(fake_cmd, monkeypatch, change):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+
+    lvm.activateLVs("vg", ["lv1", "lv2"])
+    change()
+    lvm.activateLVs("vg", ["lv1"])
+
+    assert fake_cmd.calls[-1] == ("lvchange", "--refresh", "vg/lv1")
+
+
+def test_deactivate_drops_refreshed(fake_cmd, monkeypatch):
+    monkeypatch.setattr(lvm, "_isLVActive", lambda vg, lv: True)
+
+    lvm.activateLVs("vg", ["lv1", "lv2"])
+    lvm.deactivateLVs("vg", ["lv1"])
+    lvm.activateLVs("vg", ["lv1"])
+
+    assert fake_cmd.calls[-1] == ("lvchange", "--refresh", "vg/lv1")
@@ -0,0 +1,150 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+from __future__ import absolute_import
+from __future__ import division
+
+import sys
+
+import pytest
+
+from vdsm.storage import lvmshell
+
+# Fake lvm shell, reporting the command arguments, or simulating errors.
+FAKE_SHELL = """
+import json
+import shlex
+import sys
+import time
+
+def report(rows, ret_code=1, errors=()):
+    log = [{"log_type": "error", "log_message": msg, "log_ret_code": "0"}
+           for msg in errors]
+    log.append({"log_type": "status", "log_message": "",
+                "log_ret_code": str(ret_code)})
+    sys.stdout.write(json.dumps({"report": [{"vg": rows}], "log": log}))
+    sys.stdout.write("\\n")
+
+while True:
+    sys.stdout.write("lvm> ")
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        break
+    args = shlex.split(line)
+    if args[0] == "exit":
+        break
+    elif args[0] == "fail":
+        report([], ret_code=5, errors=["Volume group not found"])
+    elif args[0] == "warn":
+        sys.stdout.write("  WARNING: something is wrong\\n")
+        report([])
+    elif args[0] == "garbage":
+        sys.stdout.write("garbage\\n")
+    elif args[0] == "sleep":
+        time.sleep(float(args[1]))
+        report([])
+    else:
+        report([{"arg": arg} for arg in args])
+"""
+
+
+@pytest.fixture
+def shell():
+    s = lvmshell.LVMShell(
+        command=[sys.executable, "-c", FAKE_SHELL], timeout=2)
+    yield s
+    s.close()
+
+
+def test_run(shell):
+    args = ["vgs", "--config", "devices { filter = [ 'a|.*|' ] }", "-o",
+            "vg_name"]
+    rc, report, err = shell.run(args)
+    assert rc == 0
+    assert err == []
+    rows = report["report"][0]["vg"]
+    assert [row["arg"] for row in rows] == args
+
+
+def test_run_many(shell):
+    for i in range(10):
+        rc, report, err = shell.run(["vgs", str(i)])
+        assert report["report"][0]["vg"][1]["arg"] == str(i)
+
+
+def test_failure(shell):
+    rc, report, err = shell.run(["fail"])
+    assert rc == 5
+    assert err == ["Volume group not found"]
+
+
+def test_warnings(shell):
+    rc, report, err = shell.run(["warn"])
+    assert rc == 0
+    assert err == ["WARNING: something is wrong"]
+
+
+def test_invalid_output(shell):
+    with pytest.raises(lvmshell.Error):
+        shell.run(["garbage"])
+    # The shell was restarted.
+    rc, report, err = shell.run(["vgs"])
+    assert rc == 0
+
+
+def test_shell_terminated(shell):
+    with pytest.raises(lvmshell.Error):
+        shell.run(["exit"])
+    # The shell was restarted.
+    rc, report, err = shell.run(["vgs"])
+    assert rc == 0
+
+
+def test_timeout():
+    shell = lvmshell.LVMShell(
+        command=[sys.executable, "-c", FAKE_SHELL], timeout=0.5)
+    try:
+        with pytest.raises(lvmshell.Timeout):
+            shell.run(["sleep", "1"])
+        # The shell was restarted.
+        rc, report, err = shell.run(["vgs"])
+        assert rc == 0
+    finally:
+        shell.close()
+
+
+def test_busy(shell):
+    with shell._lock:
+        with pytest.raises(lvmshell.Busy):
+            shell.run(["vgs"])
+
+
+@pytest.mark.parametrize("arg,quoted", [
+    ("vg_name", '"vg_name"'),
+    ("filter = [ 'a|.*|' ]", "\"filter = [ 'a|.*|' ]\""),
+    ('name = "value"', "'name = \"value\"'"),
+])
+def test_quote(arg, quoted):
+    assert lvmshell._quote(arg) == quoted
+
+
+def test_quote_unsupported():
+    with pytest.raises(ValueError):
+        lvmshell._quote("'single' and \"double\"")
@@ -25,25 +25,39 @@ import collections
 import contextlib
 import io
 import threading
+import time
 import struct
 
 import pytest
 
+from testlib import make_config
 from testlib import mock
 
+from vdsm.common import exception
 import vdsm.storage.mailbox as sm
 
 MAX_HOSTS = 10
 MAILER_TIMEOUT = 6
 MONITOR_INTERVAL = 0.1
 SPUUID = '5d928855-b09b-47a7-b920-bd2d2eb5808c'
+VOL_DATA = dict(
+    poolID=SPUUID,
+    domainID='8adbc85e-e554-4ae0-b318-8a5465fe5fe1',
+    volumeID='d772f1c6-3ebb-43c3-a42e-73fcd8255a5f')
 
 
 MboxFiles = collections.namedtuple("MboxFiles", "inbox, outbox")
 
 
+@pytest.fixture(params=["dd", "direct"])
+def mailbox_io(request, monkeypatch):
+    cfg = make_config([('irs', 'mailbox_io', request.param)])
+    monkeypatch.setattr(sm, "config", cfg)
+    return request.param
+
+
 @pytest.fixture()
-def mboxfiles(tmpdir):
+def mboxfiles(tmpdir, mailbox_io):
     data = sm.EMPTYMAILBOX * MAX_HOSTS
     inbox = tmpdir.join('inbox')
     outbox = tmpdir.join('outbox')
@@ -91,6 +105,18 @@ def make_spm_mailbox(mboxfiles):
             raise RuntimeError('Timemout waiting for spm mailbox')
 
 
+@pytest.fixture
+def spm_mailer(mboxfiles):
+    mailer = sm.SPM_MailMonitor(
+        SPUUID,
+        MAX_HOSTS,
+        inbox=mboxfiles.inbox,
+        outbox=mboxfiles.outbox,
+        monitorInterval=MONITOR_INTERVAL)
+    yield mailer
+    mailer.tp.joinAll(waitForTasks=False)
+
+
 class TestSPMMailMonitor:
 
     def test_thread_leak(self, mboxfiles):
@@ -116,6 +142,42 @@ class TestSPMMailMonitor:
                 data = f.read()
             assert data == sm.EMPTYMAILBOX * MAX_HOSTS
 
+    def test_handle_new_requests_once(self, spm_mailer, monkeypatch):
+        mailer = spm_mailer
+        mailer.registerMessageType(b"xtnd", lambda msg_id, data: None)
+        monkeypatch.setattr(
+            mailer.tp, "queueTask", mock.MagicMock(return_value=True))
+        host_id = 3
+        mail = bytearray(sm.MAILBOX_SIZE * MAX_HOSTS)
+        mail[host_id * sm.MAILBOX_SIZE:(host_id + 1) * sm.MAILBOX_SIZE] = \
+            make_mailbox([b"1xtnd" + b"x" * (sm.MESSAGE_SIZE - 5)])
+        mail = bytes(mail)
+
+        assert not mailer._handleRequests(mail)
+        assert mailer.tp.queueTask.call_count == 1
+
+        # Reading the same mail again must not handle the request again.
+        assert not mailer._handleRequests(mail)
+        assert mailer.tp.queueTask.call_count == 1
+
+    def test_handle_clean_message(self, spm_mailer):
+        mailer = spm_mailer
+        host_id = 3
+        mail = bytearray(sm.MAILBOX_SIZE * MAX_HOSTS)
+        mail[host_id * sm.MAILBOX_SIZE:(host_id + 1) * sm.MAILBOX_SIZE] = \
+            make_mailbox([sm.CLEAN_MESSAGE])
+        mail = bytes(mail)
+
+        # Clean message must be copied to the outgoing mail once.
+        assert mailer._handleRequests(mail)
+        assert not mailer._handleRequests(mail)
+
+        msg_offset = host_id * sm.MAILBOX_SIZE
+        outgoing = bytes(mailer._outgoingMail)
+        assert outgoing[msg_offset:msg_offset + sm.MESSAGE_SIZE] == \
+            sm.CLEAN_MESSAGE
+        assert outgoing[:msg_offset] == b"\0" * msg_offset
+
 
 class TestHSMMailbox:
 
@@ -148,6 +210,83 @@ class TestHSMMailbox:
                 data = f.read()
             assert data == dirty_outbox
 
+    def test_coalesce_unsent_messages(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            pass
+        monitor = hsm_mb._mailman
+        msg1 = sm.SPM_Extend_Message(VOL_DATA, 100)
+        msg2 = sm.SPM_Extend_Message(VOL_DATA, 200)
+
+        assert monitor._handleMessage(msg1)
+        assert monitor._handleMessage(msg2)
+
+        # The second message replaced the first in the same slot.
+        assert list(monitor._activeMessages.values()) == [msg2]
+        slot = list(monitor._activeMessages.keys())[0]
+        start = slot * sm.MESSAGE_SIZE
+        assert monitor._outgoingMail[start:start + sm.MESSAGE_SIZE] == \
+            msg2.payload
+
+    def test_ignore_smaller_unsent_message(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            pass
+        monitor = hsm_mb._mailman
+        msg1 = sm.SPM_Extend_Message(VOL_DATA, 200)
+        msg2 = sm.SPM_Extend_Message(VOL_DATA, 100)
+
+        assert monitor._handleMessage(msg1)
+        assert not monitor._handleMessage(msg2)
+        assert list(monitor._activeMessages.values()) == [msg1]
+
+    def test_ignore_duplicate_message(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            pass
+        monitor = hsm_mb._mailman
+        msg1 = sm.SPM_Extend_Message(VOL_DATA, 100)
+        msg2 = sm.SPM_Extend_Message(VOL_DATA, 100)
+
+        assert monitor._handleMessage(msg1)
+        monitor._unsentSlots.clear()
+        assert not monitor._handleMessage(msg2)
+        assert list(monitor._activeMessages.values()) == [msg1]
+
+    def test_coalesce_callbacks(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            pass
+        monitor = hsm_mb._mailman
+        vol_data1 = dict(VOL_DATA, name="vda")
+        vol_data2 = dict(VOL_DATA, name="vdb")
+        msg1 = sm.SPM_Extend_Message(vol_data1, 100, "callback1")
+        msg2 = sm.SPM_Extend_Message(vol_data2, 200, "callback2")
+        msg3 = sm.SPM_Extend_Message(VOL_DATA, 100, "callback3")
+        msg4 = sm.SPM_Extend_Message(VOL_DATA, 200, "callback4")
+
+        # msg2 replaces msg1, msg3 is ignored, and msg4 is a duplicate.
+        for msg in (msg1, msg2, msg3, msg4):
+            monitor._handleMessage(msg)
+
+        assert list(monitor._activeMessages.values()) == [msg2]
+        assert sorted(msg2.callbacks) == [
+            ("callback1", vol_data1),
+            ("callback2", vol_data2),
+            ("callback3", VOL_DATA),
+            ("callback4", VOL_DATA),
+        ]
+
+    def test_no_coalesce_sent_messages(self, mboxfiles):
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            pass
+        monitor = hsm_mb._mailman
+        msg1 = sm.SPM_Extend_Message(VOL_DATA, 100)
+        msg2 = sm.SPM_Extend_Message(VOL_DATA, 200)
+
+        assert monitor._handleMessage(msg1)
+        # Simulate sending the outgoing mail.
+        monitor._unsentSlots.clear()
+        assert monitor._handleMessage(msg2)
+        assert sorted(monitor._activeMessages.values(),
+                      key=lambda m: m.newSize) == [msg1, msg2]
+
 
 class TestCommunicate:
 
@@ -180,6 +319,27 @@ class TestCommunicate:
             b"\xd8\xfcs.\xa4\xc3C\xbb>\xc6\xf1r\xd700000000000000640"
             b"0000000000"))]
 
+    def test_round_trip_latency(self, mboxfiles):
+        def spm_callback(msg_id, data):
+            reply = sm.SPM_Extend_Message(VOL_DATA, REQUESTED_SIZE)
+            spm_mm.sendReply(msg_id, reply)
+
+        REQUESTED_SIZE = 100
+
+        with make_hsm_mailbox(mboxfiles, 7) as hsm_mb:
+            with make_spm_mailbox(mboxfiles) as spm_mm:
+                spm_mm.registerMessageType(b"xtnd", spm_callback)
+                hsm_mb.sendExtendMsg(VOL_DATA, REQUESTED_SIZE)
+
+                deadline = time.time() + 20 * MONITOR_INTERVAL
+                while hsm_mb.latency()["count"] == 0:
+                    assert time.time() < deadline, "no reply received"
+                    time.sleep(MONITOR_INTERVAL / 2)
+
+        latency = hsm_mb.latency()
+        assert latency["count"] == 1
+        assert latency["max"] < 20 * MONITOR_INTERVAL
+
     def test_send_reply(self, mboxfiles):
         HOST_ID = 3
         MSG_ID = HOST_ID * sm.SLOTS_PER_MAILBOX + 12
@@ -251,6 +411,52 @@ class TestExtendMessage:
         assert called_msg.callback is None
 
 
+class TestMailboxIO:
+
+    @pytest.mark.parametrize("offset", [0, sm.MAILBOX_SIZE * 3])
+    def test_read(self, mboxfiles, offset):
+        data = bytes(bytearray(range(256))) * (sm.MAILBOX_SIZE // 256)
+        with io.open(mboxfiles.inbox, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+        mbox = sm.mailbox_io(mboxfiles.inbox)
+        try:
+            assert mbox.read(offset, sm.MAILBOX_SIZE) == data
+            # Reading again must not be affected by the previous read.
+            assert mbox.read(0, sm.MAILBOX_SIZE) == (
+                data if offset == 0 else sm.EMPTYMAILBOX)
+        finally:
+            mbox.close()
+
+    @pytest.mark.parametrize("offset", [0, sm.MAILBOX_SIZE * 3])
+    def test_write(self, mboxfiles, offset):
+        data = b"x" * sm.MAILBOX_SIZE
+        mbox = sm.mailbox_io(mboxfiles.outbox)
+        try:
+            mbox.write(offset, data)
+        finally:
+            mbox.close()
+        with io.open(mboxfiles.outbox, "rb") as f:
+            outbox = f.read()
+        assert outbox[:offset] == b"\0" * offset
+        assert outbox[offset:offset + sm.MAILBOX_SIZE] == data
+        assert outbox[offset + sm.MAILBOX_SIZE:] == (
+            b"\0" * (len(outbox) - offset - sm.MAILBOX_SIZE))
+
+    def test_invalid_config(self, monkeypatch, tmpdir):
+        cfg = make_config([('irs', 'mailbox_io', 'invalid')])
+        monkeypatch.setattr(sm, "config", cfg)
+        with pytest.raises(exception.InvalidConfiguration):
+            sm.mailbox_io(str(tmpdir.join("inbox")))
+
+
+def make_mailbox(messages):
+    data = b"".join(messages)
+    data += b"\0" * (sm.MAILBOX_SIZE - sm.CHECKSUM_BYTES - len(data))
+    n = sm.checksum(data, sm.CHECKSUM_BYTES)
+    return data + struct.pack('<l', n)
+
+
 class TestValidation:
 
     def test_empty_mailbox(self):
@@ -0,0 +1,237 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pytest
+
+from vdsm.common import supervdsm
+from vdsm.storage import devicemapper
+from vdsm.storage import mpathinventory
+from vdsm.storage import multipath
+from vdsm.storage import udev
+
+
+class FakeSupervdsm(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def getScsiSerials(self, devs):
+        self.calls.append(devs)
+        return {dev: "serial-" + dev for dev in devs}
+
+
+class FakeSystem(object):
+
+    def __init__(self):
+        # guid -> [dmId, size, slaves]
+        self.devices = {
+            "guid-1": ["dm-1", 1024, ["sda", "sdb"]],
+            "guid-2": ["dm-2", 2048, ["sdc"]],
+        }
+        # physdev -> iscsi session info
+        self.sessions = {
+            "sda": {"iqn": "iqn-1", "password": "password-1"},
+        }
+        self.read = []
+        self.supervdsm = FakeSupervdsm()
+
+    def getMPDevsIter(self):
+        for guid, (dmId, _, _) in sorted(self.devices.items()):
+            yield dmId, guid
+
+    def _device(self, dmId):
+        for dev in self.devices.values():
+            if dev[0] == dmId:
+                return dev
+        raise OSError("No such device %s" % dmId)
+
+    def getDeviceSize(self, dmId):
+        return self._device(dmId)[1]
+
+    def getSlaves(self, dmId):
+        return self._device(dmId)[2]
+
+    def deviceInfo(self, dmId, guid, serial):
+        self.read.append(guid)
+        _, size, slaves = self._device(dmId)
+        return {
+            "guid": guid,
+            "dm": dmId,
+            "capacity": str(size),
+            "serial": serial,
+            "paths": [{"physdev": slave} for slave in slaves],
+        }
+
+    def updateConnections(self, devInfo, knownSessions=None):
+        devInfo["connections"] = [
+            self.sessions[path["physdev"]] for path in devInfo["paths"]
+            if path["physdev"] in self.sessions]
+
+    def getPathsStatus(self):
+        return {"sda": "active", "sdb": "failed", "sdc": "active"}
+
+
+@pytest.fixture
+def system(monkeypatch):
+    system = FakeSystem()
+    monkeypatch.setattr(multipath, "getMPDevsIter", system.getMPDevsIter)
+    monkeypatch.setattr(multipath, "getDeviceSize", system.getDeviceSize)
+    monkeypatch.setattr(multipath, "deviceInfo", system.deviceInfo)
+    monkeypatch.setattr(multipath, "updateConnections",
+                        system.updateConnections)
+    monkeypatch.setattr(devicemapper, "getSlaves", system.getSlaves)
+    monkeypatch.setattr(devicemapper, "getPathsStatus",
+                        system.getPathsStatus)
+    monkeypatch.setattr(supervdsm, "getProxy", lambda: system.supervdsm)
+    return system
+
+
+@pytest.fixture
+def monitor(system):
+    monitor = mpathinventory.Monitor()
+    monitor.start()
+    return monitor
+
+
+def test_devices(system, monitor):
+    devices = monitor.devices()
+    assert devices == [
+        {
+            "guid": "guid-1",
+            "dm": "dm-1",
+            "capacity": "1024",
+            "serial": "serial-dm-1",
+            "paths": [
+                {"physdev": "sda", "state": "active"},
+                {"physdev": "sdb", "state": "failed"},
+            ],
+            "connections": [
+                {"iqn": "iqn-1", "password": "password-1"},
+            ],
+        },
+        {
+            "guid": "guid-2",
+            "dm": "dm-2",
+            "capacity": "2048",
+            "serial": "serial-dm-2",
+            "paths": [
+                {"physdev": "sdc", "state": "active"},
+            ],
+            "connections": [],
+        },
+    ]
+    # Serials are read in one call.
+    assert system.supervdsm.calls == [["dm-1", "dm-2"]]
+
+
+def test_devices_cached(system, monitor):
+    monitor.devices()
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2"]
+
+
+def test_devices_not_modified(system, monitor):
+    devices = monitor.devices()
+    devices[0]["paths"].append({"physdev": "sdx"})
+    assert len(monitor.devices()[0]["paths"]) == 2
+
+
+def test_connections_not_cached(system, monitor):
+    monitor.devices()
+    system.sessions["sda"] = {"iqn": "iqn-1", "password": "password-2"}
+    devices = monitor.devices()
+    assert devices[0]["connections"] == [
+        {"iqn": "iqn-1", "password": "password-2"},
+    ]
+    assert system.read == ["guid-1", "guid-2"]
+
+
+def test_filter(system, monitor):
+    devices = monitor.devices(["guid-2"])
+    assert [d["guid"] for d in devices] == ["guid-2"]
+    assert system.read == ["guid-2"]
+
+
+@pytest.mark.parametrize("event_type", [
+    udev.MPATH_CHANGED,
+    udev.MPATH_REMOVED,
+])
+def test_event_invalidates(system, monitor, event_type):
+    monitor.devices()
+    monitor.handle(udev.MultipathEvent(event_type, "guid-1", None, None,
+                                       None))
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2", "guid-1"]
+
+
+def test_path_events_ignored(system, monitor):
+    monitor.devices()
+    monitor.handle(udev.MultipathEvent(udev.PATH_FAILED, "guid-1", "sda", 1,
+                                       10))
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2"]
+
+
+def test_resized(system, monitor):
+    monitor.devices()
+    system.devices["guid-2"][1] = 4096
+    devices = monitor.devices()
+    assert devices[1]["capacity"] == "4096"
+    assert system.read == ["guid-1", "guid-2", "guid-2"]
+
+
+def test_paths_changed(system, monitor):
+    monitor.devices()
+    system.devices["guid-2"][2] = ["sdc", "sdd"]
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2", "guid-2"]
+
+
+def test_device_added(system, monitor):
+    monitor.devices()
+    system.devices["guid-3"] = ["dm-3", 1024, ["sde"]]
+    devices = monitor.devices()
+    assert [d["guid"] for d in devices] == ["guid-1", "guid-2", "guid-3"]
+    assert system.read == ["guid-1", "guid-2", "guid-3"]
+
+
+def test_device_removed(system, monitor):
+    monitor.devices()
+    del system.devices["guid-1"]
+    devices = monitor.devices()
+    assert [d["guid"] for d in devices] == ["guid-2"]
+
+
+def test_not_started(system):
+    monitor = mpathinventory.Monitor()
+    monitor.devices()
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2", "guid-1", "guid-2"]
+
+
+def test_stopped(system, monitor):
+    monitor.devices()
+    monitor.stop()
+    monitor.devices()
+    assert system.read == ["guid-1", "guid-2", "guid-1", "guid-2"]
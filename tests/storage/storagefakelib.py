@@ -96,6 +96,7 @@ class FakeLVM(object):
                      vg_mda_free=None,
                      lv_count='0',
                      pv_count=str(len(devices)),
+                     seqno='1',
                      pv_name=pv_name,
                      writeable=True,
                      partial='OK')
@@ -235,7 +236,7 @@ class FakeLVM(object):
         md = deepcopy(pv)
         return real_lvm.PV(**md)
 
-    def getVG(self, vgName):
+    def getVG(self, vgName, stale_ok=False):
         if vgName not in self.vgmd:
             raise se.VolumeGroupDoesNotExist(vgName)
         vg_md = deepcopy(self.vgmd[vgName])
@@ -266,7 +267,7 @@ class FakeLVM(object):
         lv_md['attr'] = lv_attr
         return real_lvm.LV(**lv_md)
 
-    def getLV(self, vgName, lvName=None):
+    def getLV(self, vgName, lvName=None, stale_ok=False):
         if lvName is None:
             return [self._getLV(vgName, lv)
                     for vg, lv in self.lvmd if vg == vgName]
@@ -272,6 +272,30 @@ def test_hotunplug_monitor():
             valid_paths=4,
             dm_seqnum=11)
     ),
+    (
+        # Multipath device has been added
+        FakeDevice(
+            ACTION="add",
+            DM_UUID="mpath-fake-uuid-4"),
+        udev.MultipathEvent(
+            type=udev.MPATH_CHANGED,
+            mpath_uuid="fake-uuid-4",
+            path=None,
+            valid_paths=None,
+            dm_seqnum=None)
+    ),
+    (
+        # Multipath device table was reloaded
+        FakeDevice(
+            ACTION="change",
+            DM_UUID="mpath-fake-uuid-5"),
+        udev.MultipathEvent(
+            type=udev.MPATH_CHANGED,
+            mpath_uuid="fake-uuid-5",
+            path=None,
+            valid_paths=None,
+            dm_seqnum=None)
+    ),
     (
         # Multipath device has been removed
         FakeDevice(
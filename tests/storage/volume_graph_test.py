@@ -0,0 +1,100 @@
+#
+# Copyright 2018 Red Hat, Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+# Refer to the README and COPYING files for full details of the license
+#
+
+from __future__ import absolute_import
+from __future__ import division
+
+import pytest
+
+from vdsm.storage import constants as sc
+from vdsm.storage import exception as se
+from vdsm.storage import sd
+from vdsm.storage.volumegraph import VolumeGraph
+
+BLANK = sc.BLANK_UUID
+
+# Template "tmpl" in image "tmpl-img", used by images "img1" and "img2".
+# img1: tmpl <- base1 <- top1
+# img2: tmpl <- base2
+VOLUMES = {
+    "tmpl": sd.ImgsPar(("tmpl-img", "img1", "img2"), BLANK),
+    "base1": sd.ImgsPar(("img1",), "tmpl"),
+    "top1": sd.ImgsPar(("img1",), "base1"),
+    "base2": sd.ImgsPar(("img2",), "tmpl"),
+}
+
+
+@pytest.fixture
+def graph():
+    return VolumeGraph(VOLUMES)
+
+
+def test_leaf(graph):
+    assert graph.leaf("img1") == "top1"
+    assert graph.leaf("img2") == "base2"
+    assert graph.leaf("tmpl-img") == "tmpl"
+
+
+def test_chain(graph):
+    assert graph.chain("img1") == ["base1", "top1"]
+    assert graph.chain("img1", "base1") == ["base1"]
+    assert graph.chain("tmpl-img") == ["tmpl"]
+
+
+def test_children(graph):
+    assert sorted(graph.children("tmpl")) == ["base1", "base2"]
+    assert graph.children("base1") == ["top1"]
+    assert graph.children("top1") == []
+
+
+def test_template_users(graph):
+    assert graph.template_users("tmpl") == ["img1", "img2"]
+    assert graph.template_users("top1") == []
+
+
+def test_volumes(graph):
+    assert sorted(graph.volumes("img1")) == ["base1", "tmpl", "top1"]
+    assert graph.volumes("no-such-img") == []
+
+
+def test_missing_image(graph):
+    with pytest.raises(se.ImageIsNotLegalChain):
+        graph.chain("no-such-img")
+
+
+def test_two_leaves():
+    volumes = {
+        "base": sd.ImgsPar(("img",), BLANK),
+        "top1": sd.ImgsPar(("img",), "base"),
+        "top2": sd.ImgsPar(("img",), "base"),
+    }
+    graph = VolumeGraph(volumes)
+    with pytest.raises(se.ImageIsNotLegalChain):
+        graph.leaf("img")
+
+
+def test_loop():
+    volumes = {
+        "a": sd.ImgsPar(("img",), "b"),
+        "b": sd.ImgsPar(("img",), "a"),
+    }
+    graph = VolumeGraph(volumes)
+    with pytest.raises(se.ImageIsNotLegalChain):
+        graph.chain("img", "a")
@@ -679,12 +679,12 @@ class DataVerificationTests(TestCaseBase):
 
     def test_no_params(self):
         self.assertEqual(_schema.schema().get_args_dict(
-            'Host', 'getCapabilities'), None)
+            'Host', 'getHardwareInfo'), None)
 
     def test_single_param(self):
         complex_type = {'vmID': {'UUID': 'UUID'}}
         self.assertEqual(_schema.schema().get_args_dict(
-            'VM', 'getStats'), json.dumps(complex_type, indent=4))
+            'VM', 'getMigrationStatus'), json.dumps(complex_type, indent=4))
 
 
 shutil.rmtree(basedir)
@@ -21,8 +21,11 @@
 from __future__ import absolute_import
 from __future__ import division
 
+import threading
+
 from vdsm.common import xmlutils
 from vdsm.virt.domain_descriptor import (DomainDescriptor,
+                                         DomainDescriptorCache,
                                          MutableDomainDescriptor)
 from testlib import VdsmTestCase, XMLTestCase, permutations, expandPermutations
 
@@ -240,3 +243,71 @@ class DomainDescriptorTests(XMLTestCase):
         desc = DomainDescriptor(xml_data)
         reboot_config = desc.on_reboot_config()
         self.assertEqual(reboot_config, expected)
+
+
+class DomainDescriptorCacheTests(VdsmTestCase):
+
+    def setUp(self):
+        self.xml = SOME_DEVICES
+        self.fetches = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return self.xml
+
+    def test_initial_descriptor(self):
+        cache = DomainDescriptorCache(self.fetch, DomainDescriptor(NO_DEVICES))
+        self.assertEqual(NO_DEVICES, cache.get().xml)
+        self.assertEqual(0, self.fetches)
+
+    def test_fetch_once(self):
+        cache = DomainDescriptorCache(self.fetch)
+        self.assertEqual(SOME_DEVICES, cache.get().xml)
+        self.assertEqual(SOME_DEVICES, cache.get().xml)
+        self.assertEqual(1, self.fetches)
+
+    def test_invalidate(self):
+        cache = DomainDescriptorCache(self.fetch, DomainDescriptor(NO_DEVICES))
+        cache.invalidate()
+        cache.invalidate()
+        self.assertEqual(SOME_DEVICES, cache.get().xml)
+        self.assertEqual(1, self.fetches)
+
+    def test_invalidate_during_fetch(self):
+        def fetch():
+            # Domain modified after fetching the xml.
+            cache.invalidate()
+            return self.fetch()
+
+        cache = DomainDescriptorCache(fetch)
+        cache.get()
+        cache.get()
+        self.assertEqual(2, self.fetches)
+
+    def test_set(self):
+        cache = DomainDescriptorCache(self.fetch)
+        cache.invalidate()
+        cache.set(DomainDescriptor(EMPTY_DEVICES))
+        self.assertEqual(EMPTY_DEVICES, cache.get().xml)
+        self.assertEqual(0, self.fetches)
+
+    def test_fetch_error(self):
+        def fetch():
+            raise RuntimeError("domain is gone")
+
+        desc = DomainDescriptor(NO_DEVICES)
+        cache = DomainDescriptorCache(fetch, desc)
+        cache.invalidate()
+        self.assertRaises(RuntimeError, cache.get)
+        self.assertIs(desc, cache.last)
+
+    def test_wait_for_change(self):
+        cache = DomainDescriptorCache(self.fetch)
+        version = cache.version
+        self.assertFalse(cache.wait_for_change(version, 0.05))
+        t = threading.Timer(0.05, cache.invalidate)
+        t.start()
+        try:
+            self.assertTrue(cache.wait_for_change(version, 5))
+        finally:
+            t.join()
@@ -27,9 +27,11 @@ import threading
 import libvirt
 
 from vdsm.common import response
+from vdsm.virt.domain_descriptor import DomainDescriptorCache
 from vdsm.virt.vmdevices.storage import Drive, DISK_TYPE, BLOCK_THRESHOLD
 from vdsm.virt.vmdevices import hwclass
 from vdsm.virt import drivemonitor
+from vdsm.virt import sampling
 from vdsm.virt import vm
 from vdsm.virt import vmstatus
 from vdsm import utils
@@ -147,6 +149,7 @@ class DiskExtensionTestBase(VdsmTestCase):
             self.assertEqual(drive_obj.volumeID, volInfo['volumeID'])
 
 
+@expandPermutations
 class TestDiskExtensionWithPolling(DiskExtensionTestBase):
 
     def test_no_extension_allocation_below_watermark(self):
@@ -193,6 +196,65 @@ class TestDiskExtensionWithPolling(DiskExtensionTestBase):
         self.assertEqual(len(testvm.cif.irs.extensions), 1)
         self.check_extension(vdb, drives[1], testvm.cif.irs.extensions[0])
 
+    def test_bulk_block_info(self):
+        with make_env(
+                events_enabled=False,
+                drive_infos=self.DRIVE_INFOS) as (testvm, dom, drives):
+            vda = dom.block_info['/virtio/0']
+            vda['allocation'] = 0 * MB
+            vdb = dom.block_info['/virtio/1']
+            vdb['allocation'] = allocation_threshold_for_resize_mb(
+                vdb, drives[1]) + 1 * MB
+
+            extended = testvm.monitor_drives()
+
+        self.assertEqual(extended, True)
+        self.assertEqual(testvm._connection.bulk_stats_calls, 1)
+        self.assertEqual(dom.block_info_calls, 0)
+        self.check_extension(vdb, drives[1], testvm.cif.irs.extensions[0])
+
+    def test_bulk_block_info_failure(self):
+        with make_env(
+                events_enabled=False,
+                drive_infos=self.DRIVE_INFOS) as (testvm, dom, drives):
+            testvm._connection.errors['domainListGetStats'] = \
+                libvirt.libvirtError('fake error')
+            vda = dom.block_info['/virtio/0']
+            vda['allocation'] = 0 * MB
+            vdb = dom.block_info['/virtio/1']
+            vdb['allocation'] = allocation_threshold_for_resize_mb(
+                vdb, drives[1]) + 1 * MB
+
+            extended = testvm.monitor_drives()
+
+        self.assertEqual(extended, True)
+        self.assertEqual(dom.block_info_calls, 2)
+        self.check_extension(vdb, drives[1], testvm.cif.irs.extensions[0])
+
+    @permutations([
+        # stats_age, bulk_stats_calls
+        (0, 0),
+        (2, 0),
+        (15, 1),
+    ])
+    def test_bulk_block_info_from_stats_cache(self, stats_age, calls):
+        with make_env(
+                events_enabled=False,
+                drive_infos=self.DRIVE_INFOS) as (testvm, dom, drives):
+            vdb = dom.block_info['/virtio/1']
+            vdb['allocation'] = allocation_threshold_for_resize_mb(
+                vdb, drives[1]) + 1 * MB
+            stats = dom.block_stats(drives)
+            cache = FakeStatsCache(
+                sampling.StatsSample(stats, stats, 15, stats_age))
+
+            with MonkeyPatchScope([(sampling, 'stats_cache', cache)]):
+                extended = testvm.monitor_drives()
+
+        self.assertEqual(extended, True)
+        self.assertEqual(testvm._connection.bulk_stats_calls, calls)
+        self.assertEqual(dom.block_info_calls, 0)
+
     def test_extend_drive_allocation_equals_next_size(self):
         with make_env(
                 events_enabled=False,
@@ -567,6 +629,8 @@ class FakeVM(vm.Vm):
         self.cif = cif
         self.drive_monitor = drivemonitor.DriveMonitor(self, self.log)
         self._dom = dom
+        self._connection = FakeConnection(disks)
+        self._domain_cache = DomainDescriptorCache(self._fetch_domain_xml)
         self._devices = {hwclass.DISK: disks}
 
         # needed for pause()/cont()
@@ -593,17 +657,53 @@ class FakeVM(vm.Vm):
         pass
 
 
+class FakeStatsCache(object):
+
+    def __init__(self, sample):
+        self._sample = sample
+
+    def get(self, vmid):
+        return self._sample
+
+
+class FakeConnection(object):
+
+    def __init__(self, disks):
+        self._disks = disks
+        self.bulk_stats_calls = 0
+        self.errors = {}
+
+    @maybefail
+    def domainListGetStats(self, doms, stats=0, flags=0):
+        self.bulk_stats_calls += 1
+        return [(dom, dom.block_stats(self._disks)) for dom in doms]
+
+
 class FakeDomain(object):
 
+    connected = True
+
     def __init__(self):
         self._state = (libvirt.VIR_DOMAIN_RUNNING, )
+        self._dom = self
         self.block_info = {}
+        self.block_info_calls = 0
         self.errors = {}
         self.thresholds = {}
 
+    def block_stats(self, disks):
+        stats = {'block.count': len(disks)}
+        for idx, disk in enumerate(disks):
+            prefix = 'block.%d.' % idx
+            stats[prefix + 'name'] = disk.name
+            for key, value in self.block_info[disk.path].items():
+                stats[prefix + key] = value
+        return stats
+
     def blockInfo(self, path, flags):
         # TODO: support access by name
         # flags is ignored
+        self.block_info_calls += 1
         d = self.block_info[path]
         return d['capacity'], d['allocation'], d['physical']
 
@@ -446,17 +446,205 @@ class TestDrivemonitor(VdsmTestCase):
         self.assertEqual(found, expected)
 
 
+@expandPermutations
+class TestExtensionScheduling(VdsmTestCase):
+
+    log = logging.getLogger('test')
+
+    def test_on_block_threshold_no_history(self):
+        with make_env(events_enabled=True) as (mon, vm):
+            queue = drivemonitor.ExtensionQueue()
+            mon._queue = queue
+            vda = make_drive(self.log, index=0, iface='virtio')
+            vm.drives.append(vda)
+            excess = 64 * MB
+            free = vda.watermarkLimit - excess
+
+            mon.on_block_threshold('vda', vda.path, 2 * GB, excess)
+
+            self.assertEqual(vda.threshold_state,
+                             storage.BLOCK_THRESHOLD.EXCEEDED)
+            self.assertEqual(queue._entries[vm.id][0],
+                             free / drivemonitor._DEFAULT_WRITE_RATE)
+
+    def test_on_block_threshold_write_rate(self):
+        clock = FakeClock(100)
+        with make_env(events_enabled=True) as (mon, vm), \
+                MonkeyPatchScope([(drivemonitor, 'monotonic_time', clock)]):
+            queue = drivemonitor.ExtensionQueue()
+            mon._queue = queue
+            vda = make_drive(self.log, index=0, iface='virtio')
+            vm.drives.append(vda)
+
+            mon.should_extend_volume(vda, vda.volumeID, 10 * GB, 1 * GB,
+                                     3 * GB)
+            clock.now += 2
+            # Wrote 1 GiB in 2 seconds.
+            threshold = 2 * GB - 128 * MB
+            excess = 128 * MB
+            mon.on_block_threshold('vda', vda.path, threshold, excess)
+
+            free = vda.watermarkLimit - excess
+            self.assertEqual(queue._entries[vm.id][0], free / (512 * MB))
+
+    def test_remove_drive_write_rate(self):
+        clock = FakeClock(100)
+        with make_env(events_enabled=True) as (mon, vm), \
+                MonkeyPatchScope([(drivemonitor, 'monotonic_time', clock)]):
+            queue = drivemonitor.ExtensionQueue()
+            mon._queue = queue
+            vda = make_drive(self.log, index=0, iface='virtio')
+            vm.drives.append(vda)
+
+            mon.should_extend_volume(vda, vda.volumeID, 10 * GB, 1 * GB,
+                                     3 * GB)
+            mon.remove_drive(vda)
+            clock.now += 2
+            threshold = 2 * GB - 128 * MB
+            excess = 128 * MB
+            mon.on_block_threshold('vda', vda.path, threshold, excess)
+
+            free = vda.watermarkLimit - excess
+            self.assertEqual(queue._entries[vm.id][0],
+                             free / drivemonitor._DEFAULT_WRITE_RATE)
+
+    def test_on_block_threshold_unknown_drive(self):
+        with make_env(events_enabled=True) as (mon, vm):
+            queue = drivemonitor.ExtensionQueue()
+            mon._queue = queue
+
+            mon.on_block_threshold('vda', '/path/to/volume', 2 * GB, 0)
+
+            self.assertEqual(len(queue), 0)
+
+    @permutations([
+        # events_enabled, queued
+        (True, 1),
+        (False, 0),
+    ])
+    def test_enable_schedules(self, events_enabled, queued):
+        with make_env(events_enabled=events_enabled) as (mon, vm):
+            queue = drivemonitor.ExtensionQueue()
+            mon._queue = queue
+            mon.disable()
+            mon.enable()
+            self.assertEqual(len(queue), queued)
+
+
+class TestExtensionQueue(VdsmTestCase):
+
+    def test_order(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('low')
+        queue.put('slow', 60.0)
+        queue.put('fast', 1.0)
+        self.assertEqual([vm_id for vm_id, _ in queue.items()],
+                         ['fast', 'slow', 'low'])
+
+    def test_keep_most_urgent(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('a', 1.0)
+        queue.put('b', 10.0)
+        queue.put('a', 20.0)
+        self.assertEqual([vm_id for vm_id, _ in queue.items()], ['a', 'b'])
+
+    def test_discard(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('a')
+        [(vm_id, generation)] = queue.items()
+        queue.discard(vm_id, generation)
+        self.assertEqual(queue.items(), [])
+
+    def test_discard_queued_again(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('a')
+        [(vm_id, generation)] = queue.items()
+        queue.put('a', 1.0)
+        queue.discard(vm_id, generation)
+        self.assertEqual(len(queue), 1)
+
+    def test_reset(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('a', 1.0)
+        queue.put('b', 10.0)
+        for vm_id, generation in queue.items():
+            queue.reset(vm_id, generation)
+        queue.put('b', 20.0)
+        self.assertEqual([vm_id for vm_id, _ in queue.items()], ['b', 'a'])
+
+    def test_reset_queued_again(self):
+        queue = drivemonitor.ExtensionQueue()
+        queue.put('a', 10.0)
+        [(vm_id, generation)] = queue.items()
+        queue.put('a', 1.0)
+        queue.reset(vm_id, generation)
+        self.assertEqual(queue._entries['a'][0], 1.0)
+
+
+class TestBlockInfoFromStats(VdsmTestCase):
+
+    def test_complete(self):
+        stats = {
+            'block.count': 2,
+            'block.0.name': 'vda',
+            'block.0.capacity': 4096,
+            'block.0.allocation': 1024,
+            'block.0.physical': 2048,
+            'block.1.name': 'vdb',
+            'block.1.capacity': 8192,
+            'block.1.allocation': 0,
+            'block.1.physical': 1024,
+        }
+        self.assertEqual(drivemonitor.block_info_from_stats(stats), {
+            'vda': storage.BlockInfo(4096, 1024, 2048),
+            'vdb': storage.BlockInfo(8192, 0, 1024),
+        })
+
+    def test_incomplete(self):
+        stats = {
+            'block.count': 3,
+            'block.0.name': 'vda',
+            'block.0.capacity': 4096,
+            'block.0.allocation': 1024,
+            'block.0.physical': 2048,
+            # Missing physical
+            'block.1.name': 'vdb',
+            'block.1.capacity': 8192,
+            'block.1.allocation': 0,
+            # Missing name
+            'block.2.capacity': 8192,
+            'block.2.allocation': 0,
+            'block.2.physical': 1024,
+        }
+        self.assertEqual(drivemonitor.block_info_from_stats(stats), {
+            'vda': storage.BlockInfo(4096, 1024, 2048),
+        })
+
+    def test_empty(self):
+        self.assertEqual(drivemonitor.block_info_from_stats({}), {})
+
+
 class FakeVM(object):
 
     log = logging.getLogger('test')
 
     def __init__(self):
+        self.id = 'drive_monitor_vm'
         self.drives = []
 
     def getDiskDevices(self):
         return self.drives[:]
 
 
+class FakeClock(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 class FakeDomain(object):
     def __init__(self):
         self.thresholds = []
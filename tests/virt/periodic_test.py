@@ -30,6 +30,7 @@ from vdsm import schedule
 from vdsm import throttledlog
 from vdsm.common import exception
 from vdsm.common.time import monotonic_time
+from vdsm.virt import drivemonitor
 from vdsm.virt import migration
 from vdsm.virt import periodic
 from vdsm.virt import vmstatus
@@ -570,6 +571,15 @@ class _FakeVM(object):
         self.updated_drives.append(vmDrive)
 
 
+class _FakeDriveMonitor(object):
+
+    def __init__(self, needed=True):
+        self.needed = needed
+
+    def monitoring_needed(self):
+        return self.needed
+
+
 class _FakeDrive(object):
 
     def __init__(self, name, readonly=False):
@@ -586,3 +596,63 @@ class PeriodicActionTests(TestCaseBase):
         vm.disk_devices = [ro_drive, rw_drive]
         periodic.UpdateVolumes(vm)._execute()
         self.assertEqual([d.name for d in vm.updated_drives], [rw_drive.name])
+
+
+class DriveWatermarkVmsTests(TestCaseBase):
+
+    def setUp(self):
+        self.vms = {}
+        for vm_id in ('a', 'b', 'c'):
+            vm = _FakeVM(vm_id, vm_id)
+            vm.drive_monitor = _FakeDriveMonitor()
+            self.vms[vm_id] = vm
+        self.queue = drivemonitor.ExtensionQueue()
+        self.now = 0
+
+    def get_vms(self, events_enabled=True):
+        return periodic.DriveWatermarkVms(
+            lambda: self.vms, self.queue, events_enabled, 60,
+            clock=lambda: self.now)
+
+    def test_events_disabled(self):
+        get_vms = self.get_vms(events_enabled=False)
+        self.assertEqual(get_vms(), self.vms)
+        self.assertEqual(get_vms(), self.vms)
+
+    def test_scan_interval(self):
+        get_vms = self.get_vms()
+        self.assertEqual(sorted(get_vms()), ['a', 'b', 'c'])
+        self.now = 59
+        self.assertEqual(list(get_vms()), [])
+        self.now = 60
+        self.assertEqual(sorted(get_vms()), ['a', 'b', 'c'])
+
+    def test_queued_first(self):
+        get_vms = self.get_vms()
+        self.queue.put('c', 1.0)
+        self.queue.put('b', 10.0)
+        self.assertEqual(list(get_vms())[:2], ['c', 'b'])
+        self.now = 1
+        self.assertEqual(list(get_vms()), ['c', 'b'])
+
+    def test_reset_dispatched_priority(self):
+        get_vms = self.get_vms()
+        get_vms()
+        self.queue.put('a', 10.0)
+        self.queue.put('b', 1.0)
+        self.now = 1
+        self.assertEqual(list(get_vms()), ['b', 'a'])
+        self.queue.put('a', 5.0)
+        self.now = 2
+        self.assertEqual(list(get_vms()), ['a', 'b'])
+
+    def test_discard_not_needed(self):
+        get_vms = self.get_vms()
+        get_vms()
+        self.queue.put('a')
+        self.queue.put('b')
+        self.queue.put('gone')
+        self.vms['a'].drive_monitor.needed = False
+        self.now = 1
+        self.assertEqual(list(get_vms()), ['b'])
+        self.assertEqual([vm_id for vm_id, _ in self.queue.items()], ['b'])
@@ -146,6 +146,45 @@ class StatsCacheTests(TestCaseBase):
         res = self.cache.get_batch()
         self.assertIs(res, None)
 
+    def test_get_batch_values(self):
+        self._feed_cache((
+            ({'a': 'old', 'b': 'old'}, 1),
+            ({'a': 'new', 'b': 'new'}, 2),
+        ))
+        self.fake_monotonic_time.freeze(value=3)
+        res = self.cache.get_batch()
+        self.assertEqual(len(res), 2)
+        self.assertIn('a', res)
+        self.assertNotIn('c', res)
+        self.assertEqual(res['a'], ('old', 'new', FakeClock.STEP, 1))
+        self.assertEqual(dict(res), {
+            'a': ('old', 'new', FakeClock.STEP, 1),
+            'b': ('old', 'new', FakeClock.STEP, 1),
+        })
+
+    def test_get_batch_removed(self):
+        self._feed_cache((
+            ({'a': 'old', 'b': 'old'}, 1),
+            ({'a': 'new', 'b': 'new'}, 2),
+        ))
+        self.cache.remove('b')
+        res = self.cache.get_batch()
+        self.assertEqual(['a'], list(res.keys()))
+        self.assertRaises(KeyError, lambda: res['b'])
+
+    def test_left_last_sample(self):
+        self._feed_cache((
+            ({'a': 'foo', 'b': 'foo'}, 1),
+            ({'a': 'bar', 'b': 'bar'}, 2),
+            ({'a': 'baz'}, 3),
+            ({'a': 'baz'}, 4),
+        ))
+        self.fake_monotonic_time.freeze(value=10)
+        res = self.cache.get('b')
+        self.assertTrue(res.is_empty())
+        # 'b' was last seen in the sample taken at 2.
+        self.assertEqual(res.stats_age, 8)
+
     def test_get_missing(self):
         self._feed_cache((
             ({'a': 'foo'}, 1),
@@ -226,6 +265,123 @@ class StatsCacheTests(TestCaseBase):
             self.cache.put(*sample)
 
 
+def _history_sample(cpu_time, rx_bytes, rd_bytes):
+    return {
+        'cpu.time': cpu_time,
+        'net.count': 1,
+        'net.0.name': 'vnet0',
+        'net.0.rx.bytes': rx_bytes,
+        'net.0.tx.bytes': 0,
+        'block.count': 1,
+        'block.0.name': 'vda',
+        'block.0.rd.bytes': rd_bytes,
+        'block.0.wr.bytes': 0,
+    }
+
+
+class StatsHistoryTests(TestCaseBase):
+
+    INTERVAL = 15
+
+    def setUp(self):
+        self.fake_monotonic_time = FakeClock()
+        self.fake_monotonic_time.freeze(value=0)
+        self.history = sampling.StatsHistory((
+            ('raw', 0, 3),
+            ('1m', 60, 2),
+        ))
+        self.cache = sampling.StatsCache(clock=self.fake_monotonic_time,
+                                         history=self.history)
+
+    def test_disabled(self):
+        cache = sampling.StatsCache(clock=self.fake_monotonic_time)
+        self.assertIsNone(cache.get_history('a'))
+
+    def test_empty(self):
+        self.assertEqual(self.cache.get_history('a'),
+                         {'raw': [], '1m': []})
+
+    def test_unknown_resolution(self):
+        with self.assertRaises(ValueError):
+            self.cache.get_history('a', '5m')
+
+    def test_raw(self):
+        # 10% cpu, 1000 bytes/s received, 2000 bytes/s read.
+        self._feed(4)
+        self.fake_monotonic_time.freeze(value=50)
+        raw = self.cache.get_history('a', 'raw')['raw']
+        # Only the last 3 rates are kept.
+        self.assertEqual([p['age'] for p in raw], [35, 20, 5])
+        for point in raw:
+            self.assertEqual(point['cpu'], 10)
+            self.assertEqual(point['netRx'], 1000)
+            self.assertEqual(point['netTx'], 0)
+            self.assertEqual(point['diskRead'], 2000)
+            self.assertEqual(point['diskWrite'], 0)
+
+    def test_downsampled(self):
+        # Samples at 0, 15, ... 135; rates at 15, 30, ... 135.
+        self._feed(10)
+        self.fake_monotonic_time.freeze(value=150)
+        history = self.cache.get_history('a')
+        # The period ending at 120 is complete, the period ending at 180 is
+        # not reported yet.
+        self.assertEqual([p['age'] for p in history['1m']], [90, 30])
+        for point in history['1m']:
+            self.assertEqual(point['cpu'], 10)
+            self.assertEqual(point['netRx'], 1000)
+
+    def test_weighted_average(self):
+        self.cache.put({'a': _history_sample(0, 0, 0)}, 0)
+        # 10 seconds at 1000 bytes/s, 30 seconds at 3000 bytes/s.
+        self.cache.put({'a': _history_sample(0, 10000, 0)}, 10)
+        self.cache.put({'a': _history_sample(0, 100000, 0)}, 40)
+        self.cache.put({'a': _history_sample(0, 100000, 0)}, 70)
+        self.fake_monotonic_time.freeze(value=70)
+        points = self.cache.get_history('a', '1m')['1m']
+        self.assertEqual(len(points), 1)
+        self.assertEqual(points[0]['netRx'], 2500)
+
+    def test_remove(self):
+        self._feed(3)
+        self.cache.remove('a')
+        self.assertEqual(self.cache.get_history('a', 'raw'), {'raw': []})
+
+    def _feed(self, count):
+        for i in range(count):
+            ts = i * self.INTERVAL
+            sample = _history_sample(
+                cpu_time=ts * 10 ** 8,
+                rx_bytes=ts * 1000,
+                rd_bytes=ts * 2000)
+            self.cache.put({'a': sample}, ts)
+
+
+class CpuSampleTests(TestCaseBase):
+
+    _PROC_STAT = [
+        'cpu  4350684 14521 1120299 20687999 677480 197238 48056 0 1383 0\n',
+        'cpu0 1082143 1040 335283 19253788 628168 104752 21570 0 351 0\n',
+        'cpu1 1010362 2065 294113 474697 18915 41743 9793 0 308 0\n',
+        'cpu3 961889 4603 207289 486787 11732 20192 6916 0 511 0\n',
+        'intr 114930548 113199788 3 0 5 263 0 4 [... lots more numbers ...]\n',
+        'ctxt 690239751\n',
+        'btime 1395249141\n',
+    ]
+
+    def test_total_cpu_sample(self):
+        sample = sampling.TotalCpuSample(self._PROC_STAT)
+        self.assertEqual(sample.user, 4350684 + 14521)
+        self.assertEqual(sample.sys, 1120299)
+        self.assertEqual(sample.idle, 20687999)
+
+    def test_cpu_core_sample(self):
+        sample = sampling.CpuCoreSample(self._PROC_STAT)
+        self.assertEqual(sample.cores, (0, 1, 3))
+        self.assertEqual(list(sample.user), [1082143, 1010362, 961889])
+        self.assertEqual(list(sample.sys), [335283, 294113, 207289])
+
+
 class NumaNodeMemorySampleTests(TestCaseBase):
 
     def _monkeyPatchedMemorySample(self, freeMemory, totalMemory):
@@ -59,6 +59,7 @@ from vdsm.virt import vmstats
 from vdsm.virt import vmstatus
 from vdsm.virt import xmlconstants
 from vdsm.virt.domain_descriptor import DomainDescriptor
+from vdsm.virt.domain_descriptor import DomainDescriptorCache
 from vdsm.virt.vm import HotunplugTimeout
 from vdsm.virt.vmdevices import hwclass
 from vdsm.virt.vmdevices import lease
@@ -1149,6 +1150,25 @@ class TestWaitForRemoval(TestCaseBase):
         testvm._waitForDeviceRemoval(device)
         self.assertEqual(testvm._dom.xmldesc_fetched, 3)
 
+    # The xml is fetched again only when a device removed event invalidates
+    # the domain xml, before hotunplug_check_interval expires.
+    @MonkeyPatch(vm, "config", make_config([
+        ("vars", "hotunplug_timeout", "10"),
+        ("vars", "hotunplug_check_interval", "10")
+    ]))
+    def test_removed_on_event(self):
+        testvm = FakeVm(WaitForRemovalFakeVmDom(self.FILE_DRIVE_XML,
+                                                times_to_match=1))
+        event = threading.Timer(0.1, testvm._updateDomainDescriptor)
+        event.start()
+        try:
+            start = time.time()
+            testvm._waitForDeviceRemoval(self.drive_file)
+            self.assertLess(time.time() - start, 5)
+        finally:
+            event.join()
+        self.assertEqual(testvm._dom.xmldesc_fetched, 2)
+
 
 class WaitForRemovalFakeVmDom(object):
 
@@ -1572,6 +1592,7 @@ class FakeVm(vm.Vm):
 
     def __init__(self, dom):
         self._dom = dom
+        self._domain_cache = DomainDescriptorCache(self._fetch_domain_xml)
 
 
 class FreezingTests(TestCaseBase):
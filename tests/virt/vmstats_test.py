@@ -600,6 +600,70 @@ class CpuStatsTests(VmStatsTestCase):
         self.assertEqual(stats, expected)
 
 
+@expandPermutations
+class RatesTests(VmStatsTestCase):
+
+    INTERVAL = 10.  # seconds.
+
+    def test_rates(self):
+        first = {
+            'cpu.time': 10 ** 9,
+            'net.count': 1,
+            'net.0.name': 'vnet0',
+            'net.0.rx.bytes': 1000,
+            'net.0.tx.bytes': 2000,
+            'block.count': 2,
+            'block.0.name': 'vda',
+            'block.0.rd.bytes': 0,
+            'block.0.wr.bytes': 0,
+            'block.1.name': 'vdb',
+            'block.1.rd.bytes': 0,
+            'block.1.wr.bytes': 0,
+        }
+        # Block devices swapped indexes.
+        last = {
+            'cpu.time': 3 * 10 ** 9,
+            'net.count': 1,
+            'net.0.name': 'vnet0',
+            'net.0.rx.bytes': 11000,
+            'net.0.tx.bytes': 42000,
+            'block.count': 2,
+            'block.0.name': 'vdb',
+            'block.0.rd.bytes': 10000,
+            'block.0.wr.bytes': 0,
+            'block.1.name': 'vda',
+            'block.1.rd.bytes': 20000,
+            'block.1.wr.bytes': 50000,
+        }
+        self.assertEqual(
+            vmstats.rates(first, last, self.INTERVAL),
+            (20.0, 1000.0, 4000.0, 3000.0, 5000.0))
+
+    def test_rates_missing_devices(self):
+        first = {'cpu.time': 0}
+        last = {
+            'cpu.time': 0,
+            'net.count': 1,
+            'net.0.name': 'vnet0',
+            'net.0.rx.bytes': 1000,
+        }
+        self.assertEqual(
+            vmstats.rates(first, last, self.INTERVAL),
+            (0.0, 0.0, 0.0, 0.0, 0.0))
+
+    def test_rates_missing_cpu(self):
+        self.assertIsNone(vmstats.rates({}, {}, self.INTERVAL))
+
+    @permutations([
+        # interval
+        (-1,),
+        (0,),
+    ])
+    def test_rates_bad_interval(self, interval):
+        sample = {'cpu.time': 0}
+        self.assertIsNone(vmstats.rates(sample, sample, interval))
+
+
 class BalloonStatsTests(VmStatsTestCase):
 
     def test_missing_data(self):
@@ -636,6 +700,87 @@ class BalloonStatsTests(VmStatsTestCase):
         self.assertIn('balloon.current', log.messages[0][1])
 
 
+class ProduceTests(VmStatsTestCase):
+
+    def setUp(self):
+        super(ProduceTests, self).setUp()
+        nic = FakeNic(name='vnet0', model='virtio',
+                      mac_addr='00:1a:4a:16:01:51',
+                      is_hostdevice=False)
+        self.vm = FakeVM(nics=(nic,))
+        self.first_sample, self.last_sample = copy.deepcopy(self.samples)
+        self.first_sample['balloon.available'] = 2048
+        self.last_sample['balloon.available'] = 2048
+
+    def produce(self, **kw):
+        return vmstats.produce(self.vm, self.first_sample, self.last_sample,
+                               self.interval, **kw)
+
+    def test_all_groups(self):
+        stats = self.produce()
+        self.assertStatsHaveKeys(
+            stats, ('cpuUser', 'cpuSys', 'cpuUsage', 'vcpuCount',
+                    'network', 'balloonInfo', 'ioTune', 'memoryStats'))
+
+    def test_cpu_only(self):
+        stats = self.produce(groups=[vmstats.CPU])
+        self.assertEqual(
+            sorted(stats), ['cpuSys', 'cpuUsage', 'cpuUser', 'vcpuCount'])
+
+    def test_no_groups(self):
+        self.assertEqual(self.produce(groups=[]), {})
+
+    def test_memo_same_samples(self):
+        memo = vmstats.StatsMemo()
+        stats1 = self.produce(memo=memo)
+        stats2 = self.produce(memo=memo)
+        self.assertEqual(stats1, stats2)
+        # Computed only from the samples, reused.
+        self.assertIs(stats1['memoryStats'], stats2['memoryStats'])
+        # Depends on the vm state, computed again.
+        self.assertIsNot(stats1['network'], stats2['network'])
+        self.assertIsNot(stats1['balloonInfo'], stats2['balloonInfo'])
+
+    def test_memo_new_samples(self):
+        memo = vmstats.StatsMemo()
+        stats1 = self.produce(memo=memo)
+        self.last_sample = copy.deepcopy(self.last_sample)
+        stats2 = self.produce(memo=memo)
+        self.assertIsNot(stats1['memoryStats'], stats2['memoryStats'])
+
+
+class StatsMemoTests(TestCaseBase):
+
+    def test_compute_once(self):
+        memo = vmstats.StatsMemo()
+        first, last = {}, {}
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'cpuUser': len(calls)}
+
+        self.assertEqual(memo.get('cpu', first, last, compute),
+                         {'cpuUser': 1})
+        self.assertEqual(memo.get('cpu', first, last, compute),
+                         {'cpuUser': 1})
+        self.assertEqual(len(calls), 1)
+
+    def test_drop_on_new_samples(self):
+        memo = vmstats.StatsMemo()
+        first, last = {}, {}
+        memo.get('cpu', first, last, lambda: {'cpuUser': 1})
+        memo.get('memory', first, last, lambda: {'memoryStats': {}})
+
+        new_last = {}
+        self.assertEqual(memo.get('cpu', first, new_last,
+                                  lambda: {'cpuUser': 2}),
+                         {'cpuUser': 2})
+        self.assertEqual(memo.get('cpu', first, last,
+                                  lambda: {'cpuUser': 3}),
+                         {'cpuUser': 3})
+
+
 # helpers
 
 def _ensure_delta(stats_before, stats_after, key, delta):
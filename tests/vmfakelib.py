@@ -401,10 +401,9 @@ class SampleWindow:
 class CpuCoreSample(object):
 
     def __init__(self, samples):
-        self._samples = samples
-
-    def getCoreSample(self, key):
-        return self._samples.get(key)
+        self.cores = tuple(sorted(samples))
+        self.user = [samples[core]['user'] for core in self.cores]
+        self.sys = [samples[core]['sys'] for core in self.cores]
 
 
 class HostSample(object):